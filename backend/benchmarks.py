@@ -0,0 +1,279 @@
+"""
+Performance benchmarks against a running Vitta backend.
+
+Usage:
+    python benchmarks.py health-under-import [--base-url http://localhost:8000] [--rows 50000]
+    python benchmarks.py pnl [--rows 100000]
+    python benchmarks.py balance-sheet [--rows 100000] [--accounts 40]
+    python benchmarks.py rule-matcher [--rows 100000] [--rules 500]
+
+Each API benchmark registers a throwaway user, so point it at a local or staging
+database rather than production. rule-matcher runs in-process and needs no server.
+"""
+import argparse
+import io
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import pandas as pd
+
+
+def request(base_url, method, path, token=None, body=None, content_type="application/json"):
+    headers = {"Content-Type": content_type} if body is not None else {}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    if isinstance(body, dict):
+        body = json.dumps(body).encode()
+    req = urllib.request.Request(f"{base_url}/api{path}", data=body, method=method, headers=headers)
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        return json.loads(resp.read() or b"null")
+
+
+def multipart(filename, contents):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + contents + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def create_user(base_url):
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    auth = request(base_url, "POST", "/auth/register", body={"name": "Benchmark", "email": email, "password": "benchmark-pass"})
+    return auth["access_token"]
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return {"n": len(samples)}
+    cuts = statistics.quantiles(samples, n=100)
+    return {
+        "n": len(samples),
+        "p50_ms": round(cuts[49] * 1000, 1),
+        "p95_ms": round(cuts[94] * 1000, 1),
+        "p99_ms": round(cuts[98] * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def sample_latency(base_url, path, stop, samples, token=None):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            request(base_url, "GET", path, token)
+        except urllib.error.URLError:
+            continue
+        samples.append(time.perf_counter() - started)
+
+
+def measure(base_url, path, clients, until, token=None):
+    """Hit `path` from `clients` threads until `until()` returns; returns the latency samples"""
+    stop = threading.Event()
+    samples = []
+    threads = [threading.Thread(target=sample_latency, args=(base_url, path, stop, samples, token)) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    until()
+    stop.set()
+    for t in threads:
+        t.join()
+    return samples
+
+
+def statement_xlsx(rows):
+    df = pd.DataFrame({
+        "Txn Date": [f"{(i % 28) + 1:02d}-03-2024" for i in range(rows)],
+        "Description": [f"UPI/{i:08d}/Benchmark payee {i % 500}" for i in range(rows)],
+        "Dr Amount": [round(10 + (i % 997) * 1.25, 2) for i in range(rows)],
+        "Cr Amount": [None] * rows,
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def statement_csv(rows, groups):
+    """A dated, categorised statement spread over a year; the Group column picks the category"""
+    df = pd.DataFrame({
+        "Date": [f"{(i % 28) + 1:02d}-{(i % 12) + 1:02d}-2024" for i in range(rows)],
+        "Description": [f"NEFT/{i:08d}/Benchmark entry" for i in range(rows)],
+        "Debit": [round(10 + (i % 997) * 1.25, 2) if i % 3 else None for i in range(rows)],
+        "Credit": [None if i % 3 else round(100 + (i % 991) * 2.5, 2) for i in range(rows)],
+        "Group": [groups[i % len(groups)] for i in range(rows)],
+    })
+    return df.to_csv(index=False).encode()
+
+
+def import_statement(base_url, token, account_id, filename, contents):
+    """Import a statement as a background job and wait for it; returns the job"""
+    body, content_type = multipart(filename, contents)
+    job = request(
+        base_url, "POST", f"/import/csv?account_id={account_id}&force_balance=true&background=true",
+        token, body, content_type
+    )
+    while True:
+        status = request(base_url, "GET", f"/import/jobs/{job['job_id']}", token)
+        if status["status"] in ("completed", "failed"):
+            return status
+        time.sleep(1)
+
+
+def pnl(args):
+    """Latency of the Schedule III P&L on a ledger of --rows categorised transactions"""
+    token = create_user(args.base_url)
+    heads = [
+        ("Bench Sales", "income", "Revenue from Operations"), ("Bench Interest", "income", None),
+        ("Bench Salaries", "expense", "Employee Benefits"), ("Bench Loan Interest", "expense", "Finance Costs"),
+        ("Bench Depreciation", "expense", "Depreciation"), ("Bench Materials", "expense", "Cost of Materials"),
+        ("Bench Rent", "expense", None),
+    ]
+    for name, type, head in heads:
+        request(args.base_url, "POST", "/categories", token, {"name": name, "type": type, "schedule_iii_head": head})
+    account = request(args.base_url, "POST", "/accounts", token, {
+        "account_name": "Benchmark", "account_type": "Bank", "opening_balance": 0,
+        "opening_balance_date": "01-01-2024",
+    })
+    print(f"Importing a {args.rows}-row statement...")
+    started = time.perf_counter()
+    job = import_statement(args.base_url, token, account["id"], "statement.csv", statement_csv(args.rows, [h[0] for h in heads]))
+    import_seconds = round(time.perf_counter() - started, 2)
+
+    full_year = measure(args.base_url, "/reports/pnl", args.clients, lambda: time.sleep(args.baseline_seconds), token)
+    one_quarter = measure(
+        args.base_url, "/reports/pnl?date_from=01-04-2024&date_to=30-06-2024", args.clients,
+        lambda: time.sleep(args.baseline_seconds), token
+    )
+
+    print(json.dumps({
+        "rows": args.rows,
+        "import_status": job["status"],
+        "import_seconds": import_seconds,
+        "pnl_full_year": percentiles(full_year),
+        "pnl_one_quarter": percentiles(one_quarter),
+    }, indent=2))
+
+
+def balance_sheet(args):
+    """Latency of the balance sheet with --rows transactions spread over --accounts accounts"""
+    token = create_user(args.base_url)
+    rows_per_account = max(args.rows // args.accounts, 1)
+    contents = statement_csv(rows_per_account, ["Benchmark"])
+    print(f"Importing {rows_per_account} rows into each of {args.accounts} accounts...")
+    started = time.perf_counter()
+    for i in range(args.accounts):
+        account = request(args.base_url, "POST", "/accounts", token, {
+            "account_name": f"Benchmark {i}", "account_type": ("Bank", "Cash", "Card")[i % 3],
+            "opening_balance": 1000 * i, "opening_balance_date": "01-01-2024",
+        })
+        import_statement(args.base_url, token, account["id"], "statement.csv", contents)
+    import_seconds = round(time.perf_counter() - started, 2)
+
+    latest = measure(args.base_url, "/reports/balance-sheet", args.clients, lambda: time.sleep(args.baseline_seconds), token)
+    mid_year = measure(
+        args.base_url, "/reports/balance-sheet?as_of_date=30-06-2024", args.clients,
+        lambda: time.sleep(args.baseline_seconds), token
+    )
+
+    print(json.dumps({
+        "rows": rows_per_account * args.accounts,
+        "accounts": args.accounts,
+        "import_seconds": import_seconds,
+        "balance_sheet_today": percentiles(latest),
+        "balance_sheet_mid_year": percentiles(mid_year),
+    }, indent=2))
+
+
+def rule_matcher(args):
+    """Descriptions categorised per second: compiled RuleMatcher vs testing every keyword with `in`"""
+    from server import RuleMatcher
+
+    payees = [f"merchant{i:05d}" for i in range(args.rules * 2)]
+    rules = [{"keyword": payees[i * 2].upper(), "category_id": f"cat-{i % 40}"} for i in range(args.rules)]
+    descriptions = [f"UPI/{i:012d}/{payees[i % len(payees)]}/Payment from phone" for i in range(args.rows)]
+
+    def linear(description):
+        desc_lower = description.lower()
+        for rule in rules:
+            if rule['keyword'].lower() in desc_lower:
+                return rule['category_id']
+        return None
+
+    started = time.perf_counter()
+    matcher = RuleMatcher(rules)
+    compile_seconds = time.perf_counter() - started
+
+    timings = {}
+    for name, match in (("linear", linear), ("compiled", matcher.match)):
+        started = time.perf_counter()
+        results = [match(d) for d in descriptions]
+        timings[name] = (time.perf_counter() - started, results)
+    assert timings["linear"][1] == timings["compiled"][1], "matchers disagree"
+
+    print(json.dumps({
+        "rows": args.rows,
+        "rules": args.rules,
+        "matched": sum(1 for r in timings["compiled"][1] if r),
+        "compile_ms": round(compile_seconds * 1000, 1),
+        "linear_rows_per_second": round(args.rows / timings["linear"][0]),
+        "compiled_rows_per_second": round(args.rows / timings["compiled"][0]),
+    }, indent=2))
+
+
+def health_under_import(args):
+    """p99 latency of /health on its own and while a large Excel statement is imported"""
+    token = create_user(args.base_url)
+    account = request(args.base_url, "POST", "/accounts", token, {
+        "account_name": "Benchmark", "account_type": "Bank", "opening_balance": 0,
+        "opening_balance_date": "01-03-2024",
+    })
+    print(f"Building a {args.rows}-row Excel statement...")
+    contents = statement_xlsx(args.rows)
+
+    baseline = measure(args.base_url, "/health", args.clients, lambda: time.sleep(args.baseline_seconds))
+
+    result = {}
+    def run_import():
+        body, content_type = multipart("statement.xlsx", contents)
+        started = time.perf_counter()
+        result["response"] = request(
+            args.base_url, "POST", f"/import/csv?account_id={account['id']}&force_balance=true",
+            token, body, content_type
+        )
+        result["seconds"] = round(time.perf_counter() - started, 2)
+    under_import = measure(args.base_url, "/health", args.clients, run_import)
+
+    print(json.dumps({
+        "rows": args.rows,
+        "import_seconds": result.get("seconds"),
+        "imported": (result.get("response") or {}).get("count"),
+        "health_idle": percentiles(baseline),
+        "health_during_import": percentiles(under_import),
+    }, indent=2))
+
+
+BENCHMARKS = {
+    "health-under-import": health_under_import,
+    "pnl": pnl,
+    "balance-sheet": balance_sheet,
+    "rule-matcher": rule_matcher,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vitta backend benchmarks")
+    parser.add_argument("benchmark", choices=list(BENCHMARKS))
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--accounts", type=int, default=40)
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=4, help="concurrent request threads")
+    parser.add_argument("--baseline-seconds", type=float, default=5, help="how long each latency sample runs")
+    args = parser.parse_args()
+    sys.exit(BENCHMARKS[args.benchmark](args))
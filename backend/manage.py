@@ -0,0 +1,33 @@
+import asyncio
+import sys
+
+from server import ensure_indexes, apply_migrations, rebuild_balance_snapshots, rebuild_monthly_rollups
+
+
+async def migrate():
+    await ensure_indexes()
+    await apply_migrations()
+    print("Indexes ensured and migrations applied.")
+
+
+async def rebuild_snapshots():
+    await rebuild_balance_snapshots()
+    print("Account balance snapshots rebuilt.")
+
+
+async def rebuild_rollups():
+    await rebuild_monthly_rollups()
+    print("Monthly rollups rebuilt.")
+
+
+COMMANDS = {
+    "migrate": migrate,
+    "rebuild-snapshots": rebuild_snapshots,
+    "rebuild-rollups": rebuild_rollups,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f"Usage: python manage.py [{'|'.join(COMMANDS)}]")
+        sys.exit(1)
+    asyncio.run(COMMANDS[sys.argv[1]]())
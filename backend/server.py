@@ -4,6 +4,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, UpdateMany, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
@@ -12,6 +14,14 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
 import asyncio
+import time
+from collections import OrderedDict, deque
+from bisect import bisect_left
+from functools import partial
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 # --- FIX FOR PASSLIB/BCRYPT COMPATIBILITY ---
 import bcrypt
 # Some versions of passlib look for __about__.__version__ which is missing in bcrypt 4.x
@@ -23,10 +33,15 @@ if not hasattr(bcrypt, "__about__"):
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 import pandas as pd
+import numpy as np
 import io
 import PyPDF2
 import re
 import json
+import base64
+import hashlib
+import gzip
+import zlib
 from bson import ObjectId
 
 ROOT_DIR = Path(__file__).parent
@@ -65,6 +80,52 @@ if not SECRET_KEY or SECRET_KEY == "your-secret-key-change-in-production":
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Startup migrations run one process at a time under a lease; a worker that dies
+# mid-migration frees the lock when its lease runs out
+MIGRATION_LOCK_SECONDS = int(get_env("MIGRATION_LOCK_SECONDS", "1800"))
+# Balance snapshot maintenance takes a per-account lease shared by all worker processes
+SNAPSHOT_LOCK_SECONDS = float(get_env("SNAPSHOT_LOCK_SECONDS", "30"))
+
+# Authenticated user cache (see get_current_user)
+USER_CACHE_TTL_SECONDS = float(get_env("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(get_env("USER_CACHE_MAX_SIZE", "10000"))
+# When enabled, the profile claims signed into the token are trusted as-is and
+# the users collection is only read for tokens issued before claims existed.
+# Profile edits then show up after the next login.
+AUTH_TRUST_TOKEN_CLAIMS = str(get_env("AUTH_TRUST_TOKEN_CLAIMS", "false")).lower() in ("1", "true", "yes")
+
+# Per-user result caches (dashboard etc.), dropped on every write by that user
+DASHBOARD_CACHE_TTL_SECONDS = float(get_env("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+# Command palette typeahead tables (see TypeaheadIndex), built on first use per user.
+# Ledger writes don't drop them; a table older than the refresh age keeps answering
+# while a replacement is built in the background
+TYPEAHEAD_CACHE_TTL_SECONDS = float(get_env("TYPEAHEAD_CACHE_TTL_SECONDS", "900"))
+TYPEAHEAD_REFRESH_SECONDS = float(get_env("TYPEAHEAD_REFRESH_SECONDS", "60"))
+TYPEAHEAD_CACHE_MAX_USERS = int(get_env("TYPEAHEAD_CACHE_MAX_USERS", "500"))
+# Compiled automation-rule matchers are rebuilt when rules change in this process;
+# the TTL bounds how long another worker process can keep using an outdated one
+RULE_MATCHER_CACHE_TTL_SECONDS = float(get_env("RULE_MATCHER_CACHE_TTL_SECONDS", "300"))
+# Audit entries are queued and written in batches (see AuditLogWriter); entries
+# arriving while the queue is full are dropped and counted
+AUDIT_QUEUE_MAX_SIZE = int(get_env("AUDIT_QUEUE_MAX_SIZE", "10000"))
+AUDIT_FLUSH_BATCH_SIZE = int(get_env("AUDIT_FLUSH_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL_MS = int(get_env("AUDIT_FLUSH_INTERVAL_MS", "250"))
+
+# Full backup export: documents serialised per streamed chunk
+EXPORT_CHUNK_SIZE = int(get_env("EXPORT_CHUNK_SIZE", "1000"))
+
+# Statement import: rows written per insert_many batch
+IMPORT_CHUNK_SIZE = int(get_env("IMPORT_CHUNK_SIZE", "1000"))
+# Background import jobs: asyncio workers per process
+IMPORT_WORKERS = int(get_env("IMPORT_WORKERS", "2"))
+# Process pool for pandas/PyPDF2 parsing, so large files never run on the event loop.
+# 0 workers parses in a thread of the server process instead (no timeout/memory cap).
+IMPORT_PROCESS_WORKERS = int(get_env("IMPORT_PROCESS_WORKERS", "1"))
+IMPORT_PARSE_TIMEOUT_SECONDS = float(get_env("IMPORT_PARSE_TIMEOUT_SECONDS", "120"))
+IMPORT_PARSE_MEMORY_MB = int(get_env("IMPORT_PARSE_MEMORY_MB", "1024"))  # per worker, 0 = unlimited
+# Jobs that report no progress for this long are treated as lost (e.g. server restart)
+IMPORT_JOB_STALE_SECONDS = int(get_env("IMPORT_JOB_STALE_SECONDS", "900"))
+
 # ==================== ERROR HANDLING ====================
 
 class VittaException(HTTPException):
@@ -168,6 +229,77 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def user_token_claims(user: User) -> dict:
+    """Token payload for a user: subject plus the signed profile claims"""
+    return {
+        "sub": user.id,
+        "usr": {
+            "name": user.name,
+            "email": user.email,
+            "business_name": user.business_name,
+            "created_at": user.created_at.isoformat()
+        }
+    }
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+user_cache = TTLCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+_user_loads: Dict[str, asyncio.Future] = {}
+
+def invalidate_user_cache(user_id: str):
+    """Drop a cached user; call after any change to the users document (profile, password, deletion)"""
+    user_cache.invalidate(user_id)
+
+# Caches of per-user query results, keyed by user id
+user_result_caches: List[TTLCache] = []
+
+def user_result_cache(ttl: float, maxsize: int = USER_CACHE_MAX_SIZE) -> TTLCache:
+    cache = TTLCache(maxsize, ttl)
+    user_result_caches.append(cache)
+    return cache
+
+def invalidate_user_caches(user_id: str):
+    """Drop a user's cached results; called from log_action and from writes that are not audit-logged"""
+    for cache in user_result_caches:
+        cache.invalidate(user_id)
+
+async def _load_user(user_id: str) -> Optional[User]:
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+    if user is None:
+        return None
+    if isinstance(user.get('created_at'), str):
+        user['created_at'] = datetime.fromisoformat(user['created_at'])
+    return User(**user)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     try:
@@ -178,14 +310,27 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    if AUTH_TRUST_TOKEN_CLAIMS and payload.get("usr"):
+        user = User(id=user_id, **payload["usr"])
+        user_cache.set(user_id, user)
+        return user
+    
+    # Concurrent requests for the same cold user share one database lookup
+    load = _user_loads.get(user_id)
+    if load is None:
+        load = asyncio.ensure_future(_load_user(user_id))
+        _user_loads[user_id] = load
+        load.add_done_callback(lambda _: _user_loads.pop(user_id, None))
+    user = await asyncio.shield(load)
     if user is None:
         raise AuthError("User associated with this session no longer exists.")
     
-    if isinstance(user.get('created_at'), str):
-        user['created_at'] = datetime.fromisoformat(user['created_at'])
-    
-    return User(**user)
+    user_cache.set(user_id, user)
+    return user
 
 
 class ClientCreate(BaseModel):
@@ -396,6 +541,7 @@ class AuditLog(BaseModel):
     action: str  # create, update, delete, login, export
     resource: str # invoice, transaction, account, category, user
     resource_id: Optional[str] = None
+    related_ids: List[str] = []  # resource_id plus linked clients, invoices, accounts, transactions
     details: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     ip_address: Optional[str] = None
@@ -415,73 +561,107 @@ class AutomationRule(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
-@api_router.get("/dashboard/stats")
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    # 1. Revenue (Paid Invoices this month)
-    today = datetime.now()
-    month_pattern = f"^{today.year}-{today.month:02d}" # YYYY-MM prefix for ISO
-    
-    # PAID Invoices in current month
-    paid_invoices = await db.invoices.find({
-        "user_id": current_user.id,
-        "status": "paid",
-        "paid_at": {"$regex": month_pattern}
-    }).to_list(1000)
-    month_revenue = sum(inv.get('grand_total', inv.get('total', 0)) for inv in paid_invoices)
-    
-    # 2. Receivables (Sent/Overdue Invoices)
-    receivable_invoices = await db.invoices.find({
-        "user_id": current_user.id,
-        "status": {"$in": ["sent", "overdue"]}
-    }).to_list(1000)
-    total_receivable = sum(inv.get('balance_due', 0) for inv in receivable_invoices)
-    
-    # 3. Expenses (Debit Transactions this month)
-    # Transactions use DD-MM-YYYY, so we need a different pattern
-    txn_month_pattern = f"-{today.month:02d}-{today.year}"
-    debit_txns = await db.transactions.find({
-        "user_id": current_user.id,
-        "type": "debit",
-        "date": {"$regex": txn_month_pattern}
-    }).to_list(1000)
-    month_expenses = sum(t['amount'] for t in debit_txns)
-    
-    # 4. Cash Balance (All Accounts)
-    accounts = await db.accounts.find({"user_id": current_user.id}).to_list(100)
-    total_cash = sum(a.get('balance', 0) for a in accounts)
-    
-    # 5. Recent Activity (Audit Logs)
-    recent_logs = await db.audit_logs.find({"user_id": current_user.id})\
+dashboard_cache = user_result_cache(DASHBOARD_CACHE_TTL_SECONDS)
+
+async def _dashboard_invoice_stats(user_id: str, month_start: str, next_month_start: str) -> dict:
+    # Revenue, receivables and the outstanding list in one pass over the user's invoices
+    open_statuses = {"$in": ["sent", "overdue"]}
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$facet": {
+            # PAID Invoices in current month
+            "revenue": [
+                {"$match": {"status": "paid", "paid_at": {"$gte": month_start, "$lt": next_month_start}}},
+                {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$grand_total", {"$ifNull": ["$total", 0]}]}}}}
+            ],
+            # Receivables (Sent/Overdue Invoices)
+            "receivable": [
+                {"$match": {"status": open_statuses}},
+                {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$balance_due", 0]}}}}
+            ],
+            "outstanding": [
+                {"$match": {"status": open_statuses}},
+                {"$sort": {"due_date": 1}},
+                {"$limit": 5},
+                {"$lookup": {"from": "clients", "localField": "client_id", "foreignField": "id", "as": "client"}},
+                {"$addFields": {"client_name": {"$ifNull": [{"$arrayElemAt": ["$client.name", 0]}, "Unknown"]}}},
+                {"$project": {"_id": 0, "client": 0}}
+            ]
+        }}
+    ]
+    result = (await db.invoices.aggregate(pipeline).to_list(1))[0]
+    return {
+        "revenue_month": result["revenue"][0]["total"] if result["revenue"] else 0,
+        "receivable_total": result["receivable"][0]["total"] if result["receivable"] else 0,
+        "outstanding_list": result["outstanding"]
+    }
+
+async def _dashboard_transaction_stats(user_id: str, month_from: int, month_to: int) -> dict:
+    # Expenses (Debit Transactions this month) and the overall count, on the txn_date index
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$facet": {
+            "expenses": [
+                {"$match": {"type": "debit", "txn_date": {"$gte": month_from, "$lte": month_to}}},
+                {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+            ],
+            "count": [{"$count": "n"}]
+        }}
+    ]
+    result = (await db.transactions.aggregate(pipeline).to_list(1))[0]
+    return {
+        "expense_month": result["expenses"][0]["total"] if result["expenses"] else 0,
+        "transaction_count": result["count"][0]["n"] if result["count"] else 0
+    }
+
+async def _dashboard_cash_total(user_id: str) -> float:
+    # Cash Balance (All Accounts)
+    result = await db.accounts.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$balance", 0]}}}}
+    ]).to_list(1)
+    return result[0]["total"] if result else 0
+
+async def _dashboard_recent_activity(user_id: str) -> List[dict]:
+    # Recent Activity (Audit Logs)
+    recent_logs = await db.audit_logs.find({"user_id": user_id}, {"_id": 0})\
                                      .sort("timestamp", -1)\
                                      .limit(10)\
                                      .to_list(10)
     for log in recent_logs:
-        log.pop("_id", None)
         if isinstance(log.get('timestamp'), str):
             log['timestamp'] = datetime.fromisoformat(log['timestamp'])
-            
-    # 6. Outstanding List
-    outstanding_invoices = await db.invoices.find({
-        "user_id": current_user.id,
-        "status": {"$in": ["sent", "overdue"]}
-    }).sort("due_date", 1).limit(5).to_list(5)
+    return recent_logs
+
+@api_router.get("/dashboard/stats")
+async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
+    cached = dashboard_cache.get(current_user.id)
+    if cached is not None:
+        return cached
     
-    for inv in outstanding_invoices:
-        inv.pop('_id', None)
-        client = await db.clients.find_one({"id": inv.get('client_id')}, {"name": 1, "_id": 0})
-        inv['client_name'] = client['name'] if client else 'Unknown'
-        
-    txn_count = await db.transactions.count_documents({"user_id": current_user.id})
+    today = datetime.now()
+    month_start = f"{today.year}-{today.month:02d}"  # YYYY-MM prefix of ISO paid_at
+    next_month_start = f"{today.year + 1}-01" if today.month == 12 else f"{today.year}-{today.month + 1:02d}"
+    month_key = today.year * 10000 + today.month * 100
+    
+    invoice_stats, txn_stats, cash_total, recent_logs = await asyncio.gather(
+        _dashboard_invoice_stats(current_user.id, month_start, next_month_start),
+        _dashboard_transaction_stats(current_user.id, month_key + 1, month_key + 31),
+        _dashboard_cash_total(current_user.id),
+        _dashboard_recent_activity(current_user.id)
+    )
     
-    return {
-        "revenue_month": month_revenue,
-        "receivable_total": total_receivable,
-        "expense_month": month_expenses,
-        "cash_total": total_cash,
+    stats = {
+        "revenue_month": invoice_stats["revenue_month"],
+        "receivable_total": invoice_stats["receivable_total"],
+        "expense_month": txn_stats["expense_month"],
+        "cash_total": cash_total,
         "recent_activity": recent_logs,
-        "outstanding_list": outstanding_invoices,
-        "transaction_count": txn_count
+        "outstanding_list": invoice_stats["outstanding_list"],
+        "transaction_count": txn_stats["transaction_count"]
     }
+    dashboard_cache.set(current_user.id, stats)
+    return stats
 
 # ==================== CLIENT RESOURCE ROUTES ====================
 
@@ -502,31 +682,167 @@ async def get_client_payments(id: str, current_user: User = Depends(get_current_
     }, {"_id": 0}).sort("date", -1).to_list(100)
     return docs
 
-@api_router.get("/clients/{id}/activity")
-async def get_client_activity(id: str, current_user: User = Depends(get_current_user)):
-    # Activity related to client (either via resource_id or description keyword)
-    docs = await db.audit_logs.find({
-        "user_id": current_user.id,
-        "$or": [
-            {"resource_id": id},
-            {"details": {"$regex": id}}
-        ]
-    }, {"_id": 0}).sort("timestamp", -1).limit(50).to_list(50)
-    return docs
+def encode_activity_cursor(entry: dict) -> str:
+    # Older entries may store the timestamp as an ISO string; the cursor keeps the stored type
+    timestamp = entry["timestamp"]
+    is_date = isinstance(timestamp, datetime)
+    raw = json.dumps([timestamp.isoformat() if is_date else str(timestamp), is_date, entry["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-async def log_action(user_id: str, action: str, resource: str, details: str, resource_id: str = None):
+def decode_activity_cursor(cursor: str) -> tuple:
     try:
-        log_entry = AuditLog(
-            user_id=user_id,
-            action=action,
-            resource=resource,
-            resource_id=resource_id,
-            details=details
-        )
-        await db.audit_logs.insert_one(log_entry.model_dump())
-    except Exception as e:
-        import logging
-        logging.error(f"Failed to log action: {e}")
+        timestamp, is_date, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp) if is_date else str(timestamp), str(entry_id)
+    except Exception:
+        raise ValidationError("Invalid activity cursor", "INVALID_CURSOR")
+
+def activity_before(cursor: tuple) -> dict:
+    """Match audit entries that sort strictly before the (timestamp, id) cursor, newest first"""
+    timestamp, entry_id = cursor
+    clauses = [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "id": {"$lt": entry_id}}
+    ]
+    if isinstance(timestamp, datetime):
+        # BSON orders strings below dates, so string timestamps follow every dated entry
+        clauses.append({"timestamp": {"$type": "string"}})
+    return {"$or": clauses}
+
+@api_router.get("/clients/{id}/activity")
+async def get_client_activity(
+    id: str,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Audit entries that involve the client (its own edits, invoices, payments), newest first.
+    Pass the returned next_cursor to fetch the following (older) page.
+    """
+    limit = max(1, min(limit, 200))
+    query = {"user_id": current_user.id, "related_ids": id}
+    if cursor:
+        query.update(activity_before(decode_activity_cursor(cursor)))
+    docs = await db.audit_logs.find(query, {"_id": 0})\
+                              .sort([("timestamp", -1), ("id", -1)])\
+                              .limit(limit + 1)\
+                              .to_list(limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    return {
+        "activity": docs,
+        "next_cursor": encode_activity_cursor(docs[-1]) if has_more else None,
+        "has_more": has_more,
+        "limit": limit
+    }
+
+class AuditLogWriter:
+    """
+    Write-behind audit log. log() only enqueues; a background task writes batches with
+    insert_many once `batch_size` entries are waiting or `interval` seconds after the first
+    one arrived. The queue is bounded: when the database falls behind, new entries are
+    dropped (and counted) rather than holding up requests. stop() flushes what is queued.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, interval: float):
+        self.max_size = max(1, max_size)
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def log(self, entry: dict):
+        if self._task is None:
+            self._queue = asyncio.Queue(self.max_size)
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Audit log queue full, {self.dropped} entries dropped so far")
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if batch[0] is not None and self._queue.qsize() + 1 < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            closing = None in batch
+            await self._write([entry for entry in batch if entry is not None])
+            if closing:
+                return
+
+    async def _write(self, batch: List[dict]):
+        if not batch:
+            return
+        self._in_flight = len(batch)
+        try:
+            await db.audit_logs.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} audit log entries: {e}")
+        finally:
+            self._in_flight = 0
+        # The dashboard lists recent activity and may have been cached before this batch landed
+        for user_id in {entry['user_id'] for entry in batch}:
+            dashboard_cache.invalidate(user_id)
+
+    async def stop(self, timeout: float = 10):
+        """Flush everything queued so far and stop the writer task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        self._full.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Audit log flush timed out with {self._queue.qsize()} entries pending")
+        self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "pending": (self._queue.qsize() if self._queue else 0) + self._in_flight,
+            "written": self.written,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+audit_writer = AuditLogWriter(AUDIT_QUEUE_MAX_SIZE, AUDIT_FLUSH_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_MS / 1000)
+
+async def log_action(user_id: str, action: str, resource: str, details: str, resource_id: str = None,
+                     related_ids: Optional[List[Optional[str]]] = None):
+    """related_ids: other records the action touches, so it shows up on their timelines"""
+    invalidate_user_caches(user_id)
+    if resource in TYPEAHEAD_RESOURCES:
+        invalidate_typeahead(user_id)
+    # Same shape as AuditLog.model_dump(), built directly since this runs on nearly every write
+    audit_writer.log({
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "action": action,
+        "resource": resource,
+        "resource_id": resource_id,
+        "related_ids": list(dict.fromkeys(i for i in (resource_id, *(related_ids or ())) if i)),
+        "details": details,
+        "timestamp": datetime.now(timezone.utc),
+        "ip_address": None
+    })
 
 class TransactionUpdate(BaseModel):
     account_id: Optional[str] = None
@@ -690,15 +1006,23 @@ async def seed_data(current_user: User = Depends(get_current_user)):
             })
             total_balance -= amt
 
-    await db.transactions.insert_many(transactions)
+    for txn in transactions:
+        stamp_ledger_fields(txn)
+    written, _ = await insert_ledger_rows(transactions)
+    await apply_ledger_changes(current_user.id, added=written)
     await db.accounts.update_one({"id": account_id}, {"$set": {"balance": total_balance}})
+    invalidate_user_caches(current_user.id)
     
     return {"status": "success", "message": "6 months of realistic financial history generated."}
 
 
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "environment": "production" if "render" in str(os.environ.get("HOSTNAME", "")) else "local"}
+    return {
+        "status": "healthy",
+        "environment": "production" if "render" in str(os.environ.get("HOSTNAME", "")) else "local",
+        "audit_log": audit_writer.metrics()
+    }
 
 
 # ==================== SCHEDULE III REPORTS ====================
@@ -713,18 +1037,28 @@ async def get_schedule_iii_pnl(
     Statement of Profit and Loss (Schedule III)
     """
     query = {"user_id": current_user.id}
-    if date_from and date_to:
-        query["date"] = {"$gte": date_from, "$lte": date_to}
-        
-    transactions = await db.transactions.find(query).to_list(100000)
-    
-    # Revenue from Operations, Other Income
-    income_categories = await db.categories.find({"user_id": current_user.id, "type": "income"}).to_list(1000)
-    # Expenses (Employee Benefits, Finance costs, etc)
-    expense_categories = await db.categories.find({"user_id": current_user.id, "type": "expense"}).to_list(1000)
+    date_cond = txn_date_range(date_from, date_to)
+    if date_cond:
+        query["txn_date"] = date_cond
     
-    income_map = {c["id"]: c for c in income_categories if "id" in c}
-    expense_map = {c["id"]: c for c in expense_categories if "id" in c}
+    # Sum per category first, then join each category (an income category wins over an
+    # expense one with the same id) and sum again per type and Schedule III head
+    heads = await db.transactions.aggregate([
+        {"$match": query},
+        {"$group": {"_id": "$category_id", "total": {"$sum": "$amount"}}},
+        {"$lookup": {"from": "categories", "localField": "_id", "foreignField": "id", "as": "category"}},
+        {"$addFields": {"category": {"$arrayElemAt": [{"$concatArrays": [
+            {"$filter": {"input": "$category", "cond": {"$and": [
+                {"$eq": ["$$this.user_id", current_user.id]}, {"$eq": ["$$this.type", category_type]}
+            ]}}}
+            for category_type in ("income", "expense")
+        ]}, 0]}}},
+        {"$match": {"category.type": {"$in": ["income", "expense"]}}},
+        {"$group": {
+            "_id": {"type": "$category.type", "head": {"$ifNull": ["$category.schedule_iii_head", None]}},
+            "total": {"$sum": "$total"}
+        }}
+    ], allowDiskUse=True).to_list(None)
     
     # Aggregation
     revenue_ops = 0
@@ -736,29 +1070,14 @@ async def get_schedule_iii_pnl(
     depreciation = 0
     other_expenses = 0
     
-    # Helper for date parsing
-    def parse_date(d_str):
-        if not d_str: return None
-        try: return datetime.strptime(d_str, "%d-%m-%Y").date()
-        except: return None
-
-    start_date = parse_date(date_from)
-    end_date = parse_date(date_to)
-
-    for tx in transactions:
-        tx_date = parse_date(tx.get("date"))
-        if start_date and tx_date and tx_date < start_date: continue
-        if end_date and tx_date and tx_date > end_date: continue
-
-        amount = tx["amount"]
-        cid = tx.get("category_id")
+    for row in heads:
+        amount = row["total"]
+        head = row["_id"]["head"]
         
-        if cid in income_map:
-            head = income_map[cid].get("schedule_iii_head", "Other Income")
+        if row["_id"]["type"] == "income":
             if head == "Revenue from Operations": revenue_ops += amount
             else: other_income += amount
-        elif cid in expense_map:
-            head = expense_map[cid].get("schedule_iii_head", "Other Expenses")
+        else:
             if head == "Employee Benefits": employee_benefits += amount
             elif head == "Finance Costs": finance_costs += amount
             elif head == "Depreciation": depreciation += amount
@@ -803,27 +1122,15 @@ async def get_schedule_iii_bs(
     """
     accounts = await db.accounts.find({"user_id": current_user.id}).to_list(100)
     
+    # Account balances as of the date, from the daily balance snapshots
+    target_key = (date_key(as_of_date) if as_of_date else None) or int(datetime.now().strftime("%Y%m%d"))
+    snapshots = await balances_as_of(current_user.id, [a["id"] for a in accounts], target_key)
+    for a in accounts:
+        a["balance"] = snapshot_balance(a, snapshots)
+    
     cash_equivalents = sum(a.get("balance", 0) for a in accounts if a.get("account_type") in ["Bank", "Cash"])
     short_term_borrowings = sum(abs(a.get("balance", 0)) for a in accounts if a.get("account_type") == "Card" and a.get("balance", 0) < 0)
     
-    # Calculate Equity from all time P&L
-    # For a robust BS, we need transactions up to as_of_date
-    def parse_dt(d_str):
-        if not d_str: return datetime.now().date()
-        try: return datetime.strptime(d_str, "%d-%m-%Y").date()
-        except: return datetime.now().date()
-
-    target_date = parse_dt(as_of_date)
-    
-    all_txns = await db.transactions.find({"user_id": current_user.id}).to_list(100000)
-    
-    total_inc = 0
-    total_exp = 0
-    for t in all_txns:
-        t_date = parse_dt(t.get("date"))
-        if t_date > target_date: continue
-        
-        if t["type"] == "credit": total_inc += t["amount"]
     # Current Assets
     # 1. Cash and Equivalents
     cash_equivalents = sum(a.get('balance', 0) for a in accounts)
@@ -952,17 +1259,38 @@ def amount_to_words(num):
         res += " and " + get_words(paisa) + " Paisa"
     return res + " Only"
 
-async def generate_invoice_number(user_id: str):
+async def reserve_invoice_numbers(user_id: str, count: int) -> List[str]:
+    """
+    Atomically reserve a block of `count` consecutive invoice numbers for the current
+    fiscal year from the user's invoice_counters document.
+    """
     today = datetime.now()
     fy_start = today.year if today.month >= 4 else today.year - 1
     fy_end = fy_start + 1
     year = f"{fy_start}-{str(fy_end)[-2:]}"
     
-    count = await db.invoices.count_documents({
-        "user_id": user_id,
-        "invoice_number": {"$regex": f"^{year}"}
-    })
-    return f"{year}/INV/{str(count + 1).zfill(4)}"
+    key = {"user_id": user_id, "fiscal_year": year}
+    counter = await db.invoice_counters.find_one_and_update(
+        key, {"$inc": {"seq": count}}, return_document=ReturnDocument.AFTER
+    )
+    if counter is None:
+        # First number of the year: continue after the invoices numbered before the counter existed
+        existing = await db.invoices.count_documents({
+            "user_id": user_id,
+            "invoice_number": {"$regex": f"^{re.escape(year)}"}
+        })
+        try:
+            await db.invoice_counters.insert_one({**key, "seq": existing})
+        except DuplicateKeyError:
+            pass # a concurrent request seeded it first
+        counter = await db.invoice_counters.find_one_and_update(
+            key, {"$inc": {"seq": count}}, return_document=ReturnDocument.AFTER
+        )
+    last = counter["seq"]
+    return [f"{year}/INV/{str(n).zfill(4)}" for n in range(last - count + 1, last + 1)]
+
+async def generate_invoice_number(user_id: str):
+    return (await reserve_invoice_numbers(user_id, 1))[0]
 
 def normalize_date(date_str):
     if not date_str or not isinstance(date_str, str):
@@ -993,6 +1321,615 @@ def normalize_date(date_str):
             
     return date_str # Return as is if no format works
 
+def date_key(date_str) -> Optional[int]:
+    """
+    Sortable YYYYMMDD integer for a display date (e.g. "14-03-2024" -> 20240314).
+    Returns None when the date cannot be parsed.
+    """
+    normalized = normalize_date(date_str)
+    if not normalized or not isinstance(normalized, str):
+        return None
+    try:
+        return int(datetime.strptime(normalized, "%d-%m-%Y").strftime("%Y%m%d"))
+    except ValueError:
+        return None
+
+def key_date(key: int) -> str:
+    """Display date for a YYYYMMDD key (20240314 -> "14-03-2024")"""
+    return f"{key % 100:02d}-{key // 100 % 100:02d}-{key // 10000:04d}"
+
+def month_end_key(yyyymm: int) -> int:
+    """YYYYMMDD key of the last day of a YYYYMM month"""
+    year, month = divmod(yyyymm, 100)
+    next_month = datetime(year + month // 12, month % 12 + 1, 1)
+    return int((next_month - timedelta(days=1)).strftime("%Y%m%d"))
+
+# Display fields that make up a transaction's dedup_hash
+DEDUP_FIELDS = ("date", "amount", "type", "description")
+
+def txn_content_hash(date: str, amount: float, type: str, description: str) -> str:
+    """Content fingerprint used to recognise a statement line that was already imported"""
+    raw = "\x1f".join([str(date), f"{float(amount):.2f}", str(type), str(description)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def stamp_ledger_fields(txn: dict, current: Optional[dict] = None) -> dict:
+    """
+    Derive the indexed ledger fields of a transaction from its display fields.
+    Works on full documents as well as partial $set payloads; pass the stored
+    document as `current` so dedup_hash can be derived from a partial update.
+    """
+    if "date" in txn:
+        # Unparseable dates sort first, as the old epoch fallback did
+        txn["txn_date"] = date_key(txn["date"]) or 0
+    if "type" in txn:
+        # Opening balance rows lead their day in the ledger
+        txn["sort_prio"] = 0 if txn["type"] == "opening" else 1
+    merged = {**(current or {}), **txn}
+    if any(k in txn for k in DEDUP_FIELDS) and all(merged.get(k) is not None for k in DEDUP_FIELDS):
+        txn["dedup_hash"] = txn_content_hash(*(merged[k] for k in DEDUP_FIELDS))
+    return txn
+
+def repeat_dedup_hash(txn: dict) -> str:
+    """dedup_hash for a deliberate repeat of an existing transaction (e.g. two identical manual entries)"""
+    return f"{txn['dedup_hash']}:{txn['id']}"
+
+def is_dedup_collision(err: dict) -> bool:
+    """Whether a bulk write error is the unique dedup_hash index rejecting a row (not e.g. a reused id)"""
+    if err.get("code") != 11000:
+        return False
+    key_pattern = err.get("keyPattern")
+    return "dedup_hash" in key_pattern if key_pattern else "dedup_hash" in err.get("errmsg", "")
+
+async def insert_ledger_rows(docs: List[dict], skip_duplicates: bool = False) -> tuple:
+    """
+    Insert stamped transactions with insert-ignore semantics on dedup_hash.
+    Rows whose content already exists in the account are dropped when
+    skip_duplicates is set (statement imports) and otherwise kept as repeats.
+    Returns (written_docs, duplicates_skipped).
+    """
+    if not docs:
+        return [], 0
+    try:
+        await db.transactions.insert_many(docs, ordered=False)
+        return list(docs), 0
+    except BulkWriteError as e:
+        failed = {err["index"]: err for err in e.details.get("writeErrors", [])}
+    
+    written = [doc for i, doc in enumerate(docs) if i not in failed]
+    repeats = []
+    duplicates = 0
+    for i, err in failed.items():
+        if not is_dedup_collision(err):
+            logging.error(f"Error inserting transaction: {err.get('errmsg')}")
+        elif skip_duplicates:
+            duplicates += 1
+        else:
+            # Keeps the _id insert_many assigned (never stored), so ledger order is unchanged
+            doc = docs[i]
+            doc["dedup_hash"] = repeat_dedup_hash(doc)
+            repeats.append(doc)
+    if repeats:
+        try:
+            await db.transactions.insert_many(repeats, ordered=False)
+            written.extend(repeats)
+        except BulkWriteError as e:
+            repeat_failed = {err["index"]: err for err in e.details.get("writeErrors", [])}
+            for err in repeat_failed.values():
+                logging.error(f"Error inserting repeated transaction: {err.get('errmsg')}")
+            written.extend(doc for i, doc in enumerate(repeats) if i not in repeat_failed)
+    return written, duplicates
+
+# Ledger order is (txn_date, sort_prio, _id). The ObjectId tie-breaker follows insertion
+# order, so rows of one day keep their statement order (the uuid `id` is random).
+LEDGER_SORT = [("txn_date", 1), ("sort_prio", 1), ("_id", 1)]
+
+def encode_ledger_cursor(txn: dict) -> str:
+    raw = json.dumps([txn.get("txn_date", 0), txn.get("sort_prio", 1), str(txn["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_ledger_cursor(cursor: str) -> tuple:
+    try:
+        txn_date, sort_prio, oid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(txn_date), int(sort_prio), ObjectId(oid)
+    except Exception:
+        raise ValidationError("Invalid ledger cursor", "INVALID_CURSOR")
+
+def ledger_before(cursor: tuple) -> dict:
+    """Match ledger rows that sort strictly before the (txn_date, sort_prio, _id) cursor"""
+    txn_date, sort_prio, oid = cursor
+    return {"$or": [
+        {"txn_date": {"$lt": txn_date}},
+        {"txn_date": txn_date, "sort_prio": {"$lt": sort_prio}},
+        {"txn_date": txn_date, "sort_prio": sort_prio, "_id": {"$lt": oid}}
+    ]}
+
+def signed_amount(txn: dict) -> float:
+    return txn["amount"] if txn["type"] in ["credit", "opening"] else -txn["amount"]
+
+# MongoDB expression mirroring signed_amount
+SIGNED_AMOUNT_EXPR = {"$cond": [{"$in": ["$type", ["credit", "opening"]]}, "$amount", {"$multiply": ["$amount", -1]}]}
+
+def txn_date_range(date_from: Optional[str] = None, date_to: Optional[str] = None) -> dict:
+    """Build a txn_date range condition ({} when no usable bound is given)."""
+    cond = {}
+    from_key = date_key(date_from) if date_from else None
+    to_key = date_key(date_to) if date_to else None
+    if from_key is not None:
+        cond["$gte"] = from_key
+    if to_key is not None:
+        cond["$lte"] = to_key
+    return cond
+
+def build_transaction_query(
+    user_id: str,
+    account_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+    type: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    reference: Optional[str] = None
+) -> dict:
+    query = {"user_id": user_id}
+    if account_id:
+        query["account_id"] = account_id
+    if category_id:
+        query["category_id"] = category_id
+    if type:
+        query["type"] = type
+
+    date_cond = txn_date_range(date_from, date_to)
+    if date_cond:
+        query["txn_date"] = date_cond
+
+    if reference:
+        ref_regex = {"$regex": re.escape(reference), "$options": "i"}
+        query["$or"] = [
+            {"reference_number": ref_regex},
+            {"cheque_number": ref_regex}
+        ]
+    return query
+
+# ==================== BALANCE SNAPSHOTS ====================
+# account_balance_snapshots holds one document per (account_id, date) with the
+# running totals at the end of that day:
+#   closing_balance - opening + credits - debits
+#   inflow / outflow - cumulative credits / debits (opening rows excluded)
+# so "balance as of X" is the latest snapshot with date <= X.
+
+LATEST_DATE_KEY = 99991231
+
+_snapshot_locks: Dict[str, asyncio.Lock] = {}
+
+@asynccontextmanager
+async def _snapshot_lock(account_id: str, poll_seconds: float = 0.05):
+    """
+    Serialise snapshot maintenance per account across worker processes. New days are
+    seeded from the previous snapshot, so a carry-forward $inc from another worker landing
+    between that read and the insert would be lost. The lease lives in snapshot_locks
+    (unique on id) and runs out after SNAPSHOT_LOCK_SECONDS if its holder dies; the
+    in-process lock keeps this process's own requests from polling the database.
+    """
+    if account_id not in _snapshot_locks:
+        _snapshot_locks[account_id] = asyncio.Lock()
+    async with _snapshot_locks[account_id]:
+        owner = str(uuid.uuid4())
+        while True:
+            now = time.time()
+            try:
+                await db.snapshot_locks.find_one_and_update(
+                    {"id": account_id, "locked_until": {"$lt": now}},
+                    {"$set": {"owner": owner, "locked_until": now + SNAPSHOT_LOCK_SECONDS}},
+                    upsert=True
+                )
+                break
+            except DuplicateKeyError:
+                await asyncio.sleep(poll_seconds)
+        try:
+            yield
+        finally:
+            await db.snapshot_locks.update_one({"id": account_id, "owner": owner}, {"$set": {"locked_until": 0}})
+
+def _snapshot_deltas(added, removed) -> Dict[str, Dict[int, List[float]]]:
+    """Net (balance, inflow, outflow) change per account and day"""
+    deltas: Dict[str, Dict[int, List[float]]] = {}
+    for txns, sign in ((added, 1), (removed, -1)):
+        for txn in txns:
+            day = txn.get("txn_date") or 0
+            delta = deltas.setdefault(txn["account_id"], {}).setdefault(day, [0.0, 0.0, 0.0])
+            delta[0] += sign * signed_amount(txn)
+            if txn["type"] == "credit":
+                delta[1] += sign * txn["amount"]
+            elif txn["type"] == "debit":
+                delta[2] += sign * txn["amount"]
+    return deltas
+
+async def apply_ledger_changes(user_id: str, added: List[dict] = (), removed: List[dict] = ()):
+    """
+    Fold inserted and removed transactions into the daily balance snapshots and
+    the monthly rollups. An update is a removal of the old document plus an
+    addition of the new one.
+    """
+    invalidate_user_caches(user_id)
+    await apply_rollup_changes(user_id, added, removed)
+    for account_id, days in _snapshot_deltas(added, removed).items():
+        days = {d: v for d, v in days.items() if any(v)}
+        if not days:
+            continue
+        async with _snapshot_lock(account_id):
+            existing = await db.account_balance_snapshots.find(
+                {"account_id": account_id, "date": {"$in": list(days)}}, {"date": 1, "_id": 0}
+            ).to_list(None)
+            existing_days = {s["date"] for s in existing}
+
+            # New days start from the previous day's totals (as they stood before this change);
+            # the account lock keeps other workers' $inc from landing between read and insert
+            new_days = []
+            for day in sorted(d for d in days if d not in existing_days):
+                prev = await db.account_balance_snapshots.find_one(
+                    {"account_id": account_id, "date": {"$lt": day}}, sort=[("date", -1)]
+                )
+                new_days.append(UpdateOne(
+                    {"account_id": account_id, "date": day},
+                    {"$setOnInsert": {
+                        "user_id": user_id,
+                        "closing_balance": prev["closing_balance"] if prev else 0.0,
+                        "inflow": prev["inflow"] if prev else 0.0,
+                        "outflow": prev["outflow"] if prev else 0.0
+                    }},
+                    upsert=True
+                ))
+            if new_days:
+                try:
+                    await db.account_balance_snapshots.bulk_write(new_days, ordered=False)
+                except BulkWriteError as e:
+                    # Only a rebuild running alongside can create the day first; its totals stand
+                    if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                        raise
+
+            # Each day's change carries forward into every later snapshot
+            await db.account_balance_snapshots.bulk_write([
+                UpdateMany(
+                    {"account_id": account_id, "date": {"$gte": day}},
+                    {"$inc": {"closing_balance": bal, "inflow": inflow, "outflow": outflow}}
+                ) for day, (bal, inflow, outflow) in sorted(days.items())
+            ], ordered=True)
+
+async def rebuild_balance_snapshots(user_id: Optional[str] = None, account_ids: Optional[List[str]] = None):
+    """Recompute snapshots from the transactions (all users when no filter is given)"""
+    match = {}
+    if user_id:
+        match["user_id"] = user_id
+    if account_ids is not None:
+        match["account_id"] = {"$in": account_ids}
+
+    daily = await db.transactions.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"account_id": "$account_id", "date": {"$ifNull": ["$txn_date", 0]}},
+            "user_id": {"$first": "$user_id"},
+            "net": {"$sum": SIGNED_AMOUNT_EXPR},
+            "inflow": {"$sum": {"$cond": [{"$eq": ["$type", "credit"]}, "$amount", 0]}},
+            "outflow": {"$sum": {"$cond": [{"$eq": ["$type", "debit"]}, "$amount", 0]}}
+        }},
+        {"$sort": {"_id.account_id": 1, "_id.date": 1}}
+    ], allowDiskUse=True).to_list(None)
+
+    await db.account_balance_snapshots.delete_many(match)
+
+    docs = []
+    running = {}
+    for row in daily:
+        account_id = row["_id"]["account_id"]
+        bal, inflow, outflow = running.get(account_id, (0.0, 0.0, 0.0))
+        bal, inflow, outflow = bal + row["net"], inflow + row["inflow"], outflow + row["outflow"]
+        running[account_id] = (bal, inflow, outflow)
+        docs.append({
+            "account_id": account_id,
+            "user_id": row["user_id"],
+            "date": row["_id"]["date"],
+            "closing_balance": bal,
+            "inflow": inflow,
+            "outflow": outflow
+        })
+    for i in range(0, len(docs), 1000):
+        await db.account_balance_snapshots.insert_many(docs[i:i + 1000])
+    logger.info(f"Rebuilt {len(docs)} balance snapshots for {len(running)} accounts")
+
+def snapshot_balance(account: dict, snapshots: Dict[str, dict]) -> float:
+    """Account balance as the reports define it: opening balance plus credits minus debits"""
+    snap = snapshots.get(account["id"], {})
+    return account.get("opening_balance", 0) + snap.get("inflow", 0.0) - snap.get("outflow", 0.0)
+
+async def balances_as_of(user_id: str, account_ids: List[str], as_of: int = LATEST_DATE_KEY) -> Dict[str, dict]:
+    """Closing balance and cumulative inflow/outflow per account of the user as of a YYYYMMDD key"""
+    rows = await db.account_balance_snapshots.aggregate([
+        {"$match": {"user_id": user_id, "account_id": {"$in": account_ids}, "date": {"$lte": as_of}}},
+        {"$sort": {"account_id": 1, "date": -1}},
+        {"$group": {
+            "_id": "$account_id",
+            "closing_balance": {"$first": "$closing_balance"},
+            "inflow": {"$first": "$inflow"},
+            "outflow": {"$first": "$outflow"}
+        }}
+    ]).to_list(None)
+    return {r["_id"]: r for r in rows}
+
+# ==================== MONTHLY ROLLUPS ====================
+
+# monthly_rollups holds {user_id, yyyymm, category_id, type, total, count}: the sum and
+# number of a user's transactions per month, category and type (opening rows included)
+YYYYMM_EXPR = {"$floor": {"$divide": [{"$ifNull": ["$txn_date", 0]}, 100]}}
+
+def _rollup_deltas(added, removed) -> Dict[tuple, List[float]]:
+    """Net (total, count) change per (yyyymm, category_id, type)"""
+    deltas: Dict[tuple, List[float]] = {}
+    for txns, sign in ((added, 1), (removed, -1)):
+        for txn in txns:
+            key = ((txn.get("txn_date") or 0) // 100, txn.get("category_id"), txn["type"])
+            delta = deltas.setdefault(key, [0.0, 0])
+            delta[0] += sign * txn["amount"]
+            delta[1] += sign
+    return deltas
+
+async def apply_rollup_changes(user_id: str, added: List[dict] = (), removed: List[dict] = ()):
+    ops = [
+        UpdateOne(
+            {"user_id": user_id, "yyyymm": yyyymm, "category_id": category_id, "type": type},
+            {"$inc": {"total": total, "count": count}},
+            upsert=True
+        )
+        for (yyyymm, category_id, type), (total, count) in _rollup_deltas(added, removed).items()
+        if total or count
+    ]
+    if ops:
+        await db.monthly_rollups.bulk_write(ops, ordered=False)
+
+async def retract_account_rollups(user_id: str, account_ids: List[str]):
+    """Take an account's transactions out of the rollups; call before deleting them"""
+    rows = await db.transactions.aggregate([
+        {"$match": {"user_id": user_id, "account_id": {"$in": account_ids}}},
+        {"$group": {
+            "_id": {"yyyymm": YYYYMM_EXPR, "category_id": {"$ifNull": ["$category_id", None]}, "type": "$type"},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1}
+        }}
+    ]).to_list(None)
+    ops = [
+        UpdateOne(
+            {"user_id": user_id, "yyyymm": int(r["_id"]["yyyymm"]), "category_id": r["_id"]["category_id"], "type": r["_id"]["type"]},
+            {"$inc": {"total": -r["total"], "count": -r["count"]}}
+        ) for r in rows
+    ]
+    if ops:
+        await db.monthly_rollups.bulk_write(ops, ordered=False)
+
+async def rebuild_monthly_rollups(user_id: Optional[str] = None):
+    """Recompute the rollups from the transactions (all users when no user is given)"""
+    match = {"user_id": user_id} if user_id else {}
+    rows = await db.transactions.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "yyyymm": YYYYMM_EXPR,
+                "category_id": {"$ifNull": ["$category_id", None]},
+                "type": "$type"
+            },
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1}
+        }}
+    ], allowDiskUse=True).to_list(None)
+    
+    await db.monthly_rollups.delete_many(match)
+    docs = [{**r["_id"], "yyyymm": int(r["_id"]["yyyymm"]), "total": r["total"], "count": r["count"]} for r in rows]
+    for i in range(0, len(docs), 1000):
+        await db.monthly_rollups.insert_many(docs[i:i + 1000])
+    logger.info(f"Rebuilt {len(docs)} monthly rollups")
+
+async def monthly_rollups(user_id: str, match: Optional[dict] = None) -> List[dict]:
+    return await db.monthly_rollups.find(
+        {"user_id": user_id, "count": {"$gt": 0}, **(match or {})}, {"_id": 0}
+    ).to_list(None)
+
+# ==================== IMPORT JOBS ====================
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+# Parses only start once a worker is free, so queueing time never counts against the timeout
+_parse_slots: Optional[asyncio.Semaphore] = None
+
+def _init_parse_worker(memory_mb: int):
+    """Cap the address space of a parse worker; oversized files then fail with MemoryError"""
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logging.warning(f"Parse worker memory cap not applied: {e}")
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool for CPU-bound file parsing, created on first use when IMPORT_PROCESS_WORKERS > 0"""
+    global _parse_pool, _parse_slots
+    if _parse_pool is None and IMPORT_PROCESS_WORKERS > 0:
+        _parse_slots = asyncio.Semaphore(IMPORT_PROCESS_WORKERS)
+        # spawn: forking a process that holds the Motor client's threads is unsafe
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=IMPORT_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parse_worker,
+            initargs=(IMPORT_PARSE_MEMORY_MB,)
+        )
+    return _parse_pool
+
+def _discard_parse_pool(pool: ProcessPoolExecutor):
+    global _parse_pool
+    if _parse_pool is pool:
+        _parse_pool = None
+    # A running task cannot be cancelled, so stop the workers themselves
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def run_parser(fn, *args):
+    """Run a synchronous file parser off the event loop (in the process pool when configured)"""
+    pool = get_parse_pool()
+    loop = asyncio.get_running_loop()
+    if pool is None:
+        return await loop.run_in_executor(None, fn, *args)
+    
+    async with _parse_slots:
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), IMPORT_PARSE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            _discard_parse_pool(pool)
+            raise ValueError(f"File took longer than {IMPORT_PARSE_TIMEOUT_SECONDS:g}s to parse. Try splitting it into smaller files.")
+        except MemoryError:
+            raise ValueError(f"File needs more than {IMPORT_PARSE_MEMORY_MB} MB to parse. Try splitting it into smaller files.")
+        except BrokenProcessPool:
+            _discard_parse_pool(pool)
+            raise ValueError("File parser stopped unexpectedly. Try splitting it into smaller files.")
+
+def read_sheet(contents: bytes, filename: str) -> pd.DataFrame:
+    """Read an uploaded CSV/Excel sheet, with stripped lower-case column names"""
+    if filename.lower().endswith('.csv'):
+        # Retry on any parse failure, not just decoding, as the invoice importer always did
+        for encoding in (None, 'latin-1', 'cp1252'):
+            try:
+                df = pd.read_csv(io.BytesIO(contents), encoding=encoding)
+                break
+            except Exception:
+                if encoding == 'cp1252':
+                    raise
+    else:
+        df = pd.read_excel(io.BytesIO(contents))
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df
+
+class ImportJob:
+    """
+    A queued background job and its progress, mirrored to the import_jobs collection.
+    `runner` is called as runner(user, job=self, **options); file imports bind their upload first.
+    """
+
+    PROGRESS_INTERVAL = 1.0  # seconds between progress writes
+
+    def __init__(self, kind: str, runner, user: User, options: dict, filename: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.runner = runner
+        self.filename = filename
+        self.user = user
+        self.options = options
+        self.status = "queued"
+        self.rows_parsed = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = 0
+        self._last_saved = 0.0
+
+    def progress(self) -> dict:
+        return {
+            "status": self.status,
+            "rows_parsed": self.rows_parsed,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    async def save(self, **fields):
+        self._last_saved = time.monotonic()
+        await db.import_jobs.update_one({"id": self.id}, {"$set": {**self.progress(), **fields}})
+
+    async def report(self, force: bool = False, **counters):
+        """Update progress counters (absolute values); persisted at most once per PROGRESS_INTERVAL"""
+        for name, value in counters.items():
+            setattr(self, name, value)
+        if force or time.monotonic() - self._last_saved >= self.PROGRESS_INTERVAL:
+            await self.save()
+
+    async def run(self):
+        self.status = "running"
+        await self.save(started_at=datetime.now(timezone.utc).isoformat())
+        outcome = {}
+        try:
+            result = await self.runner(self.user, job=self, **self.options)
+            if isinstance(result, JSONResponse):
+                # Runners answer some rejections (e.g. balance mismatch) with a response instead of raising
+                self.status = "failed"
+                outcome = {"status_code": result.status_code, "error": json.loads(result.body)}
+            else:
+                self.status = "completed"
+                outcome = {"result": result}
+        except HTTPException as e:
+            self.status = "failed"
+            outcome = {"status_code": e.status_code, "error": e.detail}
+        except Exception as e:
+            logger.error(f"Import job {self.id} ({self.kind}) failed: {e}")
+            self.status = "failed"
+            outcome = {"status_code": 500, "error": str(e)}
+        finally:
+            self.runner = None  # releases the bound upload
+        await self.save(finished_at=datetime.now(timezone.utc).isoformat(), **outcome)
+
+class ImportJobQueue:
+    """In-process asyncio queue drained by IMPORT_WORKERS worker tasks; started on first submit"""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def submit(self, job: ImportJob) -> ImportJob:
+        await db.import_jobs.insert_one({
+            "id": job.id,
+            "user_id": job.user.id,
+            "kind": job.kind,
+            "filename": job.filename,
+            **job.progress(),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        })
+        if not self._tasks:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        await self._queue.put(job)
+        return job
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await job.run()
+            except Exception as e:
+                logger.error(f"Import worker error on job {job.id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+import_queue = ImportJobQueue(IMPORT_WORKERS)
+
+async def submit_job(kind: str, runner, user: User, background: bool = False, filename: Optional[str] = None, **options):
+    """Run runner(user, **options) inline, or queue it and answer 202 with a job id to poll when background is set"""
+    if not background:
+        return await runner(user, **options)
+    job = await import_queue.submit(ImportJob(kind, runner, user, options, filename))
+    return JSONResponse(status_code=202, content={
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/import/jobs/{job.id}"
+    })
+
+async def submit_import(kind: str, runner, contents: bytes, filename: str, user: User, background: bool = False, **options):
+    """Run a file import, runner(contents, filename, user, job=None, **options), through submit_job"""
+    return await submit_job(kind, partial(runner, contents, filename), user, background, filename=filename, **options)
+
+
 # ==================== AUTH ROUTES ====================
 
 @api_router.get("/")
@@ -1047,7 +1984,7 @@ async def register(user_data: UserCreate):
         await db.categories.insert_one(cat_dict)
     
     # Create token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data=user_token_claims(user))
     
     return TokenResponse(access_token=access_token, user=user)
 
@@ -1075,7 +2012,7 @@ async def login(user_data: UserLogin):
         user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
     
     user = User(**user_doc)
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data=user_token_claims(user))
     
     return TokenResponse(access_token=access_token, user=user)
 
@@ -1090,6 +2027,7 @@ async def update_profile(update_data: UserUpdate, current_user: User = Depends(g
     update_dict = update_data.model_dump(exclude_unset=True)
     if update_dict:
         await db.users.update_one({"id": current_user.id}, {"$set": update_dict})
+        invalidate_user_cache(current_user.id)
     
     updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0, "password_hash": 0})
     if isinstance(updated_user.get('created_at'), str):
@@ -1106,6 +2044,7 @@ async def update_password(password_data: PasswordUpdate, current_user: User = De
     
     new_hash = get_password_hash(password_data.new_password)
     await db.users.update_one({"id": current_user.id}, {"$set": {"password_hash": new_hash}})
+    invalidate_user_cache(current_user.id)
     
     return {"message": "Password updated successfully"}
 
@@ -1232,23 +2171,12 @@ async def bulk_delete_items(payload: dict, current_user: User = Depends(get_curr
     await log_action(current_user.id, "delete", "item", f"Bulk deleted {len(item_ids)} items")
     return {"message": f"Successfully deleted {len(item_ids)} items"}
 
-@api_router.post("/items/import")
-async def import_items(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
-):
-    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
-        raise HTTPException(status_code=400, detail="Only Excel and CSV files are supported")
-    
+async def import_items_file(contents: bytes, filename: str, current_user: User, job: Optional[ImportJob] = None):
+    """Create items from an uploaded sheet"""
     try:
-        contents = await file.read()
-        if file.filename.lower().endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(contents))
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-        
-        # Normalize columns
-        df.columns = [str(c).strip().lower() for c in df.columns]
+        df = await run_parser(read_sheet, contents, filename)
+        if job:
+            await job.report(rows_parsed=len(df))
         
         # Column mapping
         col_map = {
@@ -1302,7 +2230,9 @@ async def import_items(
         
         if items_to_create:
             await db.items.insert_many(items_to_create)
-            await log_action(current_user.id, "import", "items", f"Imported {len(items_to_create)} items from {file.filename}")
+            if job:
+                await job.report(inserted=len(items_to_create))
+            await log_action(current_user.id, "import", "items", f"Imported {len(items_to_create)} items from {filename}")
             return {"message": f"Successfully imported {len(items_to_create)} items"}
         else:
             return {"message": "No valid items found. Ensure 'Item Name' or 'Name' column exists."}
@@ -1310,6 +2240,18 @@ async def import_items(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
+@api_router.post("/items/import")
+async def import_items(
+    file: UploadFile = File(...),
+    background: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(status_code=400, detail="Only Excel and CSV files are supported")
+    
+    contents = await file.read()
+    return await submit_import("items", import_items_file, contents, file.filename, current_user, background)
+
 # ==================== BANK ACCOUNT ROUTES ====================
 
 @api_router.post("/accounts", response_model=BankAccount)
@@ -1343,7 +2285,9 @@ async def create_account(account_data: BankAccountCreate, current_user: User = D
     )
     opening_txn_dict = opening_txn.model_dump()
     opening_txn_dict['created_at'] = opening_txn_dict['created_at'].isoformat()
-    await db.transactions.insert_one(opening_txn_dict)
+    stamp_ledger_fields(opening_txn_dict)
+    written, _ = await insert_ledger_rows([opening_txn_dict])
+    await apply_ledger_changes(current_user.id, added=written)
 
     await log_action(current_user.id, "create", "account", f"Created account: {account.account_name} ({account.account_type})", account.id)
 
@@ -1361,31 +2305,11 @@ async def get_accounts(current_user: User = Depends(get_current_user)):
 
 @api_router.get("/accounts/summary")
 async def get_accounts_summary(current_user: User = Depends(get_current_user)):
-    # Aggregation to get inflow (credit) and outflow (debit) per account
-    pipeline = [
-        {"$match": {"user_id": current_user.id}},
-        {
-            "$group": {
-                "_id": "$account_id",
-                "inflow": {
-                    "$sum": {
-                        "$cond": [{"$eq": ["$type", "credit"]}, "$amount", 0]
-                    }
-                },
-                "outflow": {
-                    "$sum": {
-                        "$cond": [{"$eq": ["$type", "debit"]}, "$amount", 0]
-                    }
-                }
-            }
-        }
-    ]
-    
-    summary_results = await db.transactions.aggregate(pipeline).to_list(1000)
-    summary_map = {item["_id"]: item for item in summary_results}
-    
     accounts = await db.accounts.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
     
+    # Inflow (credit) and outflow (debit) per account from the latest balance snapshot
+    summary_map = await balances_as_of(current_user.id, [acc["id"] for acc in accounts])
+    
     for acc in accounts:
         acc_id = acc["id"]
         inflow = summary_map.get(acc_id, {}).get("inflow", 0.0)
@@ -1403,7 +2327,9 @@ async def get_accounts_summary(current_user: User = Depends(get_current_user)):
 async def delete_account(account_id: str, current_user: User = Depends(get_current_user)):
     account = await db.accounts.find_one({"id": account_id, "user_id": current_user.id})
     # Delete all transactions first
+    await retract_account_rollups(current_user.id, [account_id])
     await db.transactions.delete_many({"account_id": account_id, "user_id": current_user.id})
+    await db.account_balance_snapshots.delete_many({"account_id": account_id, "user_id": current_user.id})
     result = await db.accounts.delete_one({"id": account_id, "user_id": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Account not found")
@@ -1418,29 +2344,20 @@ async def bulk_delete_accounts(payload: dict, current_user: User = Depends(get_c
         raise HTTPException(status_code=400, detail="No account IDs provided")
     
     # Delete accounts and their transactions
+    await retract_account_rollups(current_user.id, account_ids)
     await db.transactions.delete_many({"account_id": {"$in": account_ids}, "user_id": current_user.id})
+    await db.account_balance_snapshots.delete_many({"account_id": {"$in": account_ids}, "user_id": current_user.id})
     await db.accounts.delete_many({"id": {"$in": account_ids}, "user_id": current_user.id})
     
-    await log_action(current_user.id, "delete", "account", f"Bulk deleted {len(account_ids)} accounts")
+    await log_action(current_user.id, "delete", "account", f"Bulk deleted {len(account_ids)} accounts", related_ids=account_ids)
     return {"message": f"Successfully deleted {len(account_ids)} accounts and their transactions"}
 
-@api_router.post("/accounts/import")
-async def import_accounts(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
-):
-    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
-        raise HTTPException(status_code=400, detail="Only Excel and CSV files are supported")
-    
+async def import_accounts_file(contents: bytes, filename: str, current_user: User, job: Optional[ImportJob] = None):
+    """Create bank accounts and their opening transactions from an uploaded sheet"""
     try:
-        contents = await file.read()
-        if file.filename.lower().endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(contents))
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-        
-        # Normalize columns
-        df.columns = [str(c).strip().lower() for c in df.columns]
+        df = await run_parser(read_sheet, contents, filename)
+        if job:
+            await job.report(rows_parsed=len(df))
         
         # Fetch all clients to map names to IDs
         all_clients = await db.clients.find({"user_id": current_user.id}).to_list(None)
@@ -1529,7 +2446,7 @@ async def import_accounts(
                 accounts_to_create.append(acc_data)
                 
                 # Create Opening Transaction
-                transactions_to_create.append({
+                transactions_to_create.append(stamp_ledger_fields({
                     "id": str(uuid.uuid4()),
                     "user_id": current_user.id,
                     "account_id": acc_id,
@@ -1538,12 +2455,15 @@ async def import_accounts(
                     "amount": acc_data['opening_balance'],
                     "type": "opening",
                     "created_at": datetime.now(timezone.utc).isoformat()
-                })
+                }))
         
         if accounts_to_create:
             await db.accounts.insert_many(accounts_to_create)
+            if job:
+                await job.report(inserted=len(accounts_to_create))
             if transactions_to_create:
-                await db.transactions.insert_many(transactions_to_create)
+                written, _ = await insert_ledger_rows(transactions_to_create)
+                await apply_ledger_changes(current_user.id, added=written)
             
             await log_action(current_user.id, "import", "accounts", f"Imported {len(accounts_to_create)} accounts and opening transactions")
             return {"message": f"Successfully imported {len(accounts_to_create)} accounts"}
@@ -1553,6 +2473,18 @@ async def import_accounts(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
+@api_router.post("/accounts/import")
+async def import_accounts(
+    file: UploadFile = File(...),
+    background: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(status_code=400, detail="Only Excel and CSV files are supported")
+    
+    contents = await file.read()
+    return await submit_import("accounts", import_accounts_file, contents, file.filename, current_user, background)
+
 @api_router.put("/accounts/{account_id}")
 async def update_account(account_id: str, account_data: BankAccountUpdate, current_user: User = Depends(get_current_user)):
     existing_account = await db.accounts.find_one({"id": account_id, "user_id": current_user.id})
@@ -1574,14 +2506,22 @@ async def update_account(account_id: str, account_data: BankAccountUpdate, curre
             update_dict["balance"] = existing_account["balance"] + ob_diff
             
         # Update/Create opening transaction
+        old_opening = await db.transactions.find_one({"account_id": account_id, "type": "opening"})
         await db.transactions.update_one(
             {"account_id": account_id, "type": "opening"},
-            {"$set": {
+            {"$set": stamp_ledger_fields({
                 "amount": new_ob,
-                "date": new_ob_date
-            }},
+                "date": new_ob_date,
+                "type": "opening"
+            }, current=old_opening)},
             upsert=True # In case it was missing
         )
+        new_opening = await db.transactions.find_one({"account_id": account_id, "type": "opening"})
+        await apply_ledger_changes(
+            current_user.id,
+            added=[new_opening],
+            removed=[old_opening] if old_opening else []
+        )
 
     result = await db.accounts.update_one(
         {"id": account_id, "user_id": current_user.id},
@@ -1657,26 +2597,15 @@ async def bulk_delete_clients(payload: dict, current_user: User = Depends(get_cu
         raise HTTPException(status_code=400, detail="No client IDs provided")
     
     await db.clients.delete_many({"id": {"$in": client_ids}, "user_id": current_user.id})
-    await log_action(current_user.id, "delete", "client", f"Bulk deleted {len(client_ids)} clients")
+    await log_action(current_user.id, "delete", "client", f"Bulk deleted {len(client_ids)} clients", related_ids=client_ids)
     return {"message": f"Successfully deleted {len(client_ids)} clients"}
 
-@api_router.post("/clients/import")
-async def import_clients(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
-):
-    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
-        raise HTTPException(status_code=400, detail="Only Excel and CSV files are supported")
-    
+async def import_clients_file(contents: bytes, filename: str, current_user: User, job: Optional[ImportJob] = None):
+    """Create clients from an uploaded sheet"""
     try:
-        contents = await file.read()
-        if file.filename.lower().endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(contents))
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-        
-        # Normalize columns
-        df.columns = [str(c).strip().lower() for c in df.columns]
+        df = await run_parser(read_sheet, contents, filename)
+        if job:
+            await job.report(rows_parsed=len(df))
         
         # Column mapping
         col_map = {
@@ -1728,7 +2657,9 @@ async def import_clients(
         
         if clients_to_create:
             await db.clients.insert_many(clients_to_create)
-            await log_action(current_user.id, "import", "clients", f"Imported {len(clients_to_create)} clients from {file.filename}")
+            if job:
+                await job.report(inserted=len(clients_to_create))
+            await log_action(current_user.id, "import", "clients", f"Imported {len(clients_to_create)} clients from {filename}")
             return {"message": f"Successfully imported {len(clients_to_create)} clients"}
         else:
             return {"message": "No valid clients found. Ensure 'Client Name' or 'Name' column exists."}
@@ -1736,6 +2667,18 @@ async def import_clients(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
+@api_router.post("/clients/import")
+async def import_clients(
+    file: UploadFile = File(...),
+    background: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(status_code=400, detail="Only Excel and CSV files are supported")
+    
+    contents = await file.read()
+    return await submit_import("clients", import_clients_file, contents, file.filename, current_user, background)
+
 # ==================== CATEGORY ROUTES ====================
 
 @api_router.post("/categories", response_model=Category)
@@ -1802,12 +2745,8 @@ async def create_transaction(transaction_data: TransactionCreate, current_user:
     # --- PHASE 2.6: Automation Rules ---
     # Auto-categorize if category is not provided
     if not transaction_data.category_id:
-        rules = await db.automation_rules.find({"user_id": current_user.id, "is_active": True}).to_list(100)
-        desc_lower = transaction_data.description.lower()
-        for rule in rules:
-            if rule['keyword'].lower() in desc_lower:
-                transaction_data.category_id = rule['category_id']
-                break
+        matcher = await get_rule_matcher(current_user.id)
+        transaction_data.category_id = matcher.match(transaction_data.description)
 
     transaction = Transaction(
         user_id=current_user.id,
@@ -1819,8 +2758,11 @@ async def create_transaction(transaction_data: TransactionCreate, current_user:
     
     transaction_dict = transaction.model_dump()
     transaction_dict['created_at'] = transaction_dict['created_at'].isoformat()
+    stamp_ledger_fields(transaction_dict)
     
-    await db.transactions.insert_one(transaction_dict)
+    written, _ = await insert_ledger_rows([transaction_dict])
+    if not written:
+        raise DatabaseError("Failed to save the transaction")
     
     # Update account balance
     balance_inc = transaction_data.amount if transaction.type == "credit" else -transaction_data.amount
@@ -1828,12 +2770,14 @@ async def create_transaction(transaction_data: TransactionCreate, current_user:
         {"id": transaction_data.account_id},
         {"$inc": {"balance": balance_inc}}
     )
+    await apply_ledger_changes(current_user.id, added=[transaction_dict])
     
     # --- PHASE 2.5: Audit Logging ---
     await log_action(
         current_user.id, "create", "transaction", 
         f"Created {transaction.type} transaction: {transaction.description} for ₹{transaction.amount}",
-        transaction.id
+        transaction.id,
+        [transaction_dict.get("account_id"), transaction_dict.get("client_id"), transaction_dict.get("invoice_id")]
     )
     
     return transaction
@@ -1850,59 +2794,14 @@ async def get_transactions(
     page_size: str = "50",
     current_user: User = Depends(get_current_user)
 ):
-    query = {"user_id": current_user.id}
-    
-    if account_id:
-        query["account_id"] = account_id
-    if category_id:
-        query["category_id"] = category_id
-    if type:
-        query["type"] = type
-    
-    # Fix for large in-memory sort: Push sorting to MongoDB using Aggregation
-    pipeline = [
-        {"$match": query},
-        {
-            "$addFields": {
-                "parsed_date": {
-                    "$dateFromString": {
-                        "dateString": "$date",
-                        "format": "%d-%m-%Y",
-                        "onError": {"$toRFC0402": "1970-01-01T00:00:00Z"}
-                    }
-                },
-                "sort_prio": {"$cond": [{"$eq": ["$type", "opening"]}, 0, 1]}
-            }
-        },
-        {"$sort": {"parsed_date": 1, "sort_prio": 1}}
-    ]
-    transactions_raw = await db.transactions.aggregate(pipeline).to_list(None)
+    query = build_transaction_query(
+        current_user.id, account_id, category_id, type, date_from, date_to, reference
+    )
     
-    transactions = []
-    for t in transactions_raw:
-        t.pop("_id", None)
-        t.pop("parsed_date", None)
-        t.pop("sort_prio", None)
-        transactions.append(t)
-        
-    def get_date_obj(date_str):
-        try:
-            return datetime.strptime(date_str, '%d-%m-%Y')
-        except:
-            return datetime.min
-
-    # Apply date filters in memory if provided
-    if date_from:
-        df_obj = get_date_obj(normalize_date(date_from))
-        transactions = [t for t in transactions if get_date_obj(t['date']) >= df_obj]
-    if date_to:
-        dt_obj = get_date_obj(normalize_date(date_to))
-        transactions = [t for t in transactions if get_date_obj(t['date']) <= dt_obj]
-    if reference:
-        ref_lower = reference.lower()
-        transactions = [t for t in transactions if 
-                        (t.get('reference_number') and ref_lower in t['reference_number'].lower()) or 
-                        (t.get('cheque_number') and ref_lower in t['cheque_number'].lower())]
+    # Filtering and sorting run in MongoDB on the indexed txn_date key
+    transactions = await db.transactions.find(query, {"_id": 0})\
+                                        .sort(LEDGER_SORT)\
+                                        .to_list(None)
 
     for txn in transactions:
         if isinstance(txn.get('created_at'), str):
@@ -1958,39 +2857,79 @@ async def get_transactions_count(
     reference: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    query = {"user_id": current_user.id}
-    if account_id: query["account_id"] = account_id
-    if category_id: query["category_id"] = category_id
-    if type: query["type"] = type
-    
-    # Since date filtering and reference filtering are currently in-memory (due to DD-MM-YYYY format),
-    # we have to fetch all and filter in memory if those filters are provided.
-    # Otherwise, we can use db.count_documents.
-    
-    if not (date_from or date_to or reference):
-        count = await db.transactions.count_documents(query)
-        return {"total": count}
-    
-    # If complex filters are used, we follow the same logic as get_transactions
-    transactions = await db.transactions.find(query, {"id": 1, "date": 1, "reference_number": 1, "cheque_number": 1}).to_list(10000)
-    
-    def get_date_obj(date_str):
-        try: return datetime.strptime(date_str, '%d-%m-%Y')
-        except: return datetime.min
-
-    if date_from:
-        df_obj = get_date_obj(normalize_date(date_from))
-        transactions = [t for t in transactions if get_date_obj(t['date']) >= df_obj]
-    if date_to:
-        dt_obj = get_date_obj(normalize_date(date_to))
-        transactions = [t for t in transactions if get_date_obj(t['date']) <= dt_obj]
-    if reference:
-        ref_lower = reference.lower()
-        transactions = [t for t in transactions if 
-                        (t.get('reference_number') and ref_lower in t['reference_number'].lower()) or 
-                        (t.get('cheque_number') and ref_lower in t['cheque_number'].lower())]
-    
-    return {"total": len(transactions)}
+    query = build_transaction_query(
+        current_user.id, account_id, category_id, type, date_from, date_to, reference
+    )
+    count = await db.transactions.count_documents(query)
+    return {"total": count}
+
+@api_router.get("/transactions/ledger")
+async def get_transactions_ledger(
+    account_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+    type: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    reference: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Keyset-paginated ledger, newest first, with server-side running balances.
+    Pass the returned next_cursor to fetch the following (older) page.
+    """
+    limit = max(1, min(limit, 500))
+    if account_id and not await db.accounts.find_one({"id": account_id, "user_id": current_user.id}, {"_id": 1}):
+        raise NotFoundError("Account")
+    base_query = build_transaction_query(
+        current_user.id, account_id, category_id, type, date_from, date_to, reference
+    )
+    position = decode_ledger_cursor(cursor) if cursor else None
+    query = {"$and": [base_query, ledger_before(position)]} if position else base_query
+
+    # Balance after the newest row of this page = every matching row before the cursor
+    if set(base_query) == {"user_id", "account_id"}:
+        # Whole-account ledger: the day's balance snapshot plus the rows of the cursor's day
+        as_of = position[0] - 1 if position else LATEST_DATE_KEY
+        snapshots = await balances_as_of(current_user.id, [account_id], as_of)
+        running = snapshots.get(account_id, {}).get("closing_balance", 0.0)
+        tail_query = {"$and": [base_query, {"txn_date": position[0]}, ledger_before(position)]} if position else None
+    else:
+        running = 0.0
+        tail_query = query
+    if tail_query:
+        balance_rows = await db.transactions.aggregate([
+            {"$match": tail_query},
+            {"$group": {"_id": None, "balance": {"$sum": SIGNED_AMOUNT_EXPR}}}
+        ]).to_list(1)
+        running += balance_rows[0]["balance"] if balance_rows else 0
+
+    page = await db.transactions.find(query)\
+                                .sort([(field, -1) for field, _ in LEDGER_SORT])\
+                                .limit(limit + 1)\
+                                .to_list(limit + 1)
+    has_more = len(page) > limit
+    page = page[:limit]
+    next_cursor = encode_ledger_cursor(page[-1]) if has_more else None
+    for txn in page:
+        txn.pop("_id")
+
+    closing_balance = running
+    for txn in page:
+        txn["running_balance"] = running
+        running -= signed_amount(txn)
+        if isinstance(txn.get('created_at'), str):
+            txn['created_at'] = datetime.fromisoformat(txn['created_at'])
+
+    return {
+        "transactions": page,
+        "opening_balance": running,
+        "closing_balance": closing_balance,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "limit": limit
+    }
 
 @api_router.put("/transactions/{transaction_id}", response_model=Transaction)
 async def update_transaction(
@@ -2007,7 +2946,30 @@ async def update_transaction(
     if not update_dict:
         raise HTTPException(status_code=400, detail="No update data provided")
     
-    # Handle balance change if amount or type or account_id changes
+    if "date" in update_dict:
+        update_dict["date"] = normalize_date(update_dict["date"])
+    stamp_ledger_fields(update_dict, current=existing_txn)
+
+    try:
+        await db.transactions.update_one(
+            {"id": transaction_id, "user_id": current_user.id},
+            {"$set": update_dict}
+        )
+    except DuplicateKeyError as e:
+        if not is_dedup_collision({"code": e.code, "errmsg": str(e), **(e.details or {})}):
+            raise
+        # The edit (or a move to another account) made it identical to another transaction;
+        # keep it as a repeat, hashed from its content rather than any earlier repeat suffix
+        merged = {**existing_txn, **update_dict}
+        if all(merged.get(k) is not None for k in DEDUP_FIELDS):
+            merged["dedup_hash"] = txn_content_hash(*(merged[k] for k in DEDUP_FIELDS))
+        update_dict["dedup_hash"] = repeat_dedup_hash(merged)
+        await db.transactions.update_one(
+            {"id": transaction_id, "user_id": current_user.id},
+            {"$set": update_dict}
+        )
+    
+    # Move the balance once the transaction write has gone through
     if "amount" in update_dict or "type" in update_dict or "account_id" in update_dict:
         old_amount = existing_txn["amount"]
         old_type = existing_txn["type"]
@@ -2024,18 +2986,15 @@ async def update_transaction(
         # 2. Apply new impact to new account
         new_inc = new_amount if new_type in ["credit", "opening"] else -new_amount
         await db.accounts.update_one({"id": new_account_id}, {"$inc": {"balance": new_inc}})
-
-    if "date" in update_dict:
-        update_dict["date"] = normalize_date(update_dict["date"])
-
-    await db.transactions.update_one(
-        {"id": transaction_id, "user_id": current_user.id},
-        {"$set": update_dict}
-    )
     
-    await log_action(current_user.id, "update", "transaction", f"Updated transaction: {existing_txn['description']}", transaction_id)
+    await log_action(
+        current_user.id, "update", "transaction", f"Updated transaction: {existing_txn['description']}", transaction_id,
+        [existing_txn.get("account_id"), update_dict.get("account_id"),
+         existing_txn.get("client_id"), existing_txn.get("invoice_id")]
+    )
     
     transaction = await db.transactions.find_one({"id": transaction_id}, {"_id": 0})
+    await apply_ledger_changes(current_user.id, added=[transaction], removed=[existing_txn])
     if isinstance(transaction.get('created_at'), str):
         transaction['created_at'] = datetime.fromisoformat(transaction['created_at'])
     
@@ -2064,7 +3023,11 @@ async def delete_transaction(transaction_id: str, current_user: User = Depends(g
         )
     
     await db.transactions.delete_one({"id": transaction_id})
-    await log_action(current_user.id, "delete", "transaction", f"Deleted transaction: {transaction['description']}", transaction_id)
+    await apply_ledger_changes(current_user.id, removed=[transaction])
+    await log_action(
+        current_user.id, "delete", "transaction", f"Deleted transaction: {transaction['description']}", transaction_id,
+        [transaction.get("account_id"), transaction.get("client_id"), transaction.get("invoice_id")]
+    )
     return {"message": "Transaction deleted successfully"}
 
 @api_router.post("/transactions/bulk-delete")
@@ -2090,6 +3053,7 @@ async def bulk_delete_transactions(payload: dict, current_user: User = Depends(g
         await db.accounts.update_one({"id": txn["account_id"]}, {"$inc": {"balance": inc}})
     
     await db.transactions.delete_many({"id": {"$in": ids_to_delete}})
+    await apply_ledger_changes(current_user.id, removed=transactions_to_delete)
     
     await log_action(current_user.id, "delete", "transaction", f"Bulk deleted {len(ids_to_delete)} transactions", None)
     return {"message": f"Successfully deleted {len(ids_to_delete)} transactions"}
@@ -2102,100 +3066,347 @@ async def bulk_update_category(payload: dict, current_user: User = Depends(get_c
     if not transaction_ids or not category_id:
         raise HTTPException(status_code=400, detail="Transaction IDs and Category ID are required")
     
+    previous = await db.transactions.find(
+        {"id": {"$in": transaction_ids}, "user_id": current_user.id},
+        {"_id": 0, "account_id": 1, "txn_date": 1, "type": 1, "amount": 1, "category_id": 1}
+    ).to_list(None)
     await db.transactions.update_many(
         {"id": {"$in": transaction_ids}, "user_id": current_user.id},
         {"$set": {"category_id": category_id}}
     )
+    await apply_ledger_changes(
+        current_user.id,
+        added=[{**txn, "category_id": category_id} for txn in previous],
+        removed=previous
+    )
     
     await log_action(current_user.id, "update", "transaction", f"Bulk updated category for {len(transaction_ids)} transactions", None)
     return {"message": f"Successfully updated category for {len(transaction_ids)} transactions"}
 
+# Text-indexed fields per searchable collection, with their relevance weights
+SEARCH_FIELDS = {
+    "transactions": {"description": 10, "ledger_name": 5, "reference_number": 3, "cheque_number": 3, "notes": 1},
+    "clients": {"name": 10, "business_type": 3, "notes": 1},
+    "accounts": {"account_name": 10, "bank_name": 5, "account_number": 3},
+    "categories": {"name": 10},
+}
+SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def search_terms(q: str) -> str:
+    """
+    Plain words for a $text query. Quotes and leading '-' are $text operators,
+    so only word tokens from the user's input are passed through.
+    """
+    return " ".join(SEARCH_TOKEN_RE.findall(q))
+
+async def search_collection(collection: str, user_id: str, terms: str, limit: int) -> List[dict]:
+    return await db[collection].find(
+        {"user_id": user_id, "$text": {"$search": terms}},
+        {"_id": 0, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(limit)
+
 @api_router.get("/search")
 async def global_search(q: str, current_user: User = Depends(get_current_user)):
     if not q or len(q) < 2:
         return {"results": []}
     
-    regex_query = {"$regex": q, "$options": "i"}
+    terms = search_terms(q)
+    if not terms:
+        return {"results": []}
     limit = 10
     
-    results = []
+    transactions, clients, accounts, categories = await asyncio.gather(*(
+        search_collection(collection, current_user.id, terms, limit) for collection in SEARCH_FIELDS
+    ))
     
-    # 1. Search Transactions
-    transactions = await db.transactions.find({
-        "user_id": current_user.id,
-        "$or": [
-            {"description": regex_query},
-            {"ledger_name": regex_query},
-            {"notes": regex_query},
-            {"reference_number": regex_query},
-            {"cheque_number": regex_query}
-        ]
-    }, {"_id": 0}).limit(limit).to_list(limit)
+    results = []
     
+    # 1. Transactions
     for t in transactions:
         results.append({
             "type": "transaction",
             "title": t["description"],
             "subtitle": f"{t['date']} · {t['type'].capitalize()} · ₹{t['amount']}",
             "id": t["id"],
+            "score": t.pop("score"),
             "data": t
         })
         
-    # 2. Search Clients
-    clients = await db.clients.find({
-        "user_id": current_user.id,
-        "$or": [
-            {"name": regex_query},
-            {"business_type": regex_query},
-            {"notes": regex_query}
-        ]
-    }, {"_id": 0}).limit(limit).to_list(limit)
-    
+    # 2. Clients
     for c in clients:
         results.append({
             "type": "client",
             "title": c["name"],
-            "subtitle": f"{c['business_type'] or 'Client'} · {c['country']}",
+            "subtitle": f"{c.get('business_type') or 'Client'} · {c.get('country', '')}",
             "id": c["id"],
+            "score": c.pop("score"),
             "data": c
         })
         
-    # 3. Search Accounts
-    accounts = await db.accounts.find({
-        "user_id": current_user.id,
-        "$or": [
-            {"account_name": regex_query},
-            {"bank_name": regex_query},
-            {"account_number": regex_query}
-        ]
-    }, {"_id": 0}).limit(limit).to_list(limit)
-    
+    # 3. Accounts
     for a in accounts:
         results.append({
             "type": "account",
             "title": a["account_name"],
-            "subtitle": f"{a['account_type']} · {a['bank_name'] or ''}",
+            "subtitle": f"{a['account_type']} · {a.get('bank_name') or ''}",
             "id": a["id"],
+            "score": a.pop("score"),
             "data": a
         })
         
-    # 4. Search Categories
-    categories = await db.categories.find({
-        "user_id": current_user.id,
-        "name": regex_query
-    }, {"_id": 0}).limit(limit).to_list(limit)
-    
+    # 4. Categories
     for cat in categories:
         results.append({
             "type": "category",
             "title": cat["name"],
             "subtitle": f"{cat['type'].capitalize()} Group",
             "id": cat["id"],
+            "score": cat.pop("score"),
             "data": cat
         })
-        
+    
+    # Best matches first across all collections (stable, so ties keep the order above)
+    results.sort(key=lambda r: r["score"], reverse=True)
     return {"results": results}
 
+# ==================== TYPEAHEAD ====================
+
+class TypeaheadIndex:
+    """
+    Sorted prefix table over a user's names and numbers. Every word start of every term
+    is a key (the rest of the lowercased term from there), so a prefix lookup is a
+    bisect into the keys plus a short forward scan.
+    """
+
+    def __init__(self, entries: List[tuple]):
+        # entries: (type, title, subtitle, id, terms)
+        table = []
+        for ref, entry in enumerate(entries):
+            for term in entry[4]:
+                term = term.lower()
+                for word in SEARCH_TOKEN_RE.finditer(term):
+                    table.append((term[word.start():], ref, word.start() > 0))
+        table.sort()
+        self.keys = [key for key, _, _ in table]
+        self.refs = [(ref, mid_term) for _, ref, mid_term in table]
+        self.entries = entries
+
+    def search(self, prefix: str, limit: int = 10) -> List[dict]:
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        matches = {}
+        pos = bisect_left(self.keys, prefix)
+        # Look at a few more candidates than needed so term starts can outrank mid-term hits
+        while pos < len(self.keys) and len(matches) < limit * 5 and self.keys[pos].startswith(prefix):
+            ref, mid_term = self.refs[pos]
+            matches[ref] = min(matches.get(ref, True), mid_term)
+            pos += 1
+        ranked = sorted(matches, key=lambda ref: (matches[ref], len(self.entries[ref][1]), self.entries[ref][1]))
+        return [
+            {"type": type, "title": title, "subtitle": subtitle, "id": id}
+            for type, title, subtitle, id, _ in (self.entries[ref] for ref in ranked[:limit])
+        ]
+
+# Not a user_result_cache: a rebuild costs three scans of the ledger, too much to pay after
+# every write. Holds {"build", "started", "refresh"} per user (see get_typeahead_index).
+typeahead_cache = TTLCache(TYPEAHEAD_CACHE_MAX_USERS, TYPEAHEAD_CACHE_TTL_SECONDS)
+
+# Audit-logged resources whose names are typeahead entries; log_action drops the table for these
+TYPEAHEAD_RESOURCES = {"client", "clients", "account", "accounts", "category", "restore"}
+
+def invalidate_typeahead(user_id: str):
+    typeahead_cache.invalidate(user_id)
+
+async def _distinct_values(user_id: str, field: str) -> List[dict]:
+    return await db.transactions.aggregate([
+        {"$match": {"user_id": user_id, field: {"$nin": [None, ""]}}},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+    ], allowDiskUse=True).to_list(None)
+
+async def build_typeahead_index(user_id: str) -> TypeaheadIndex:
+    clients, accounts, categories, ledgers, references, cheques = await asyncio.gather(
+        db.clients.find({"user_id": user_id}, {"_id": 0, "id": 1, "name": 1, "business_type": 1}).to_list(None),
+        db.accounts.find({"user_id": user_id}, {"_id": 0, "id": 1, "account_name": 1, "account_number": 1, "account_type": 1, "bank_name": 1}).to_list(None),
+        db.categories.find({"user_id": user_id}, {"_id": 0, "id": 1, "name": 1, "type": 1}).to_list(None),
+        _distinct_values(user_id, "ledger_name"),
+        _distinct_values(user_id, "reference_number"),
+        _distinct_values(user_id, "cheque_number"),
+    )
+    entries = []
+    for c in clients:
+        entries.append(("client", c["name"], c.get("business_type") or "Client", c["id"], [c["name"]]))
+    for a in accounts:
+        terms = [a["account_name"]] + ([str(a["account_number"])] if a.get("account_number") else [])
+        entries.append(("account", a["account_name"], f"{a['account_type']} · {a.get('bank_name') or ''}", a["id"], terms))
+    for cat in categories:
+        entries.append(("category", cat["name"], f"{cat['type'].capitalize()} Group", cat["id"], [cat["name"]]))
+    for type, label, rows in (("ledger", "Ledger", ledgers), ("reference", "Reference", references), ("cheque", "Cheque", cheques)):
+        for row in rows:
+            value = str(row["_id"])
+            entries.append((type, value, f"{label} · {row['count']} transaction{'s' if row['count'] != 1 else ''}", None, [value]))
+    # Sorting the table is CPU-bound for large ledgers; keep it off the event loop
+    return await asyncio.to_thread(TypeaheadIndex, entries)
+
+def _typeahead_refreshed(user_id: str, entry: dict, refresh: asyncio.Future):
+    entry["refresh"] = None
+    if refresh.cancelled() or refresh.exception() is not None:
+        logger.warning(f"Typeahead refresh failed for {user_id}: {None if refresh.cancelled() else refresh.exception()}")
+        return
+    # Swap in the new table unless the entry was dropped meanwhile
+    if typeahead_cache.get(user_id) is entry:
+        entry["build"] = refresh
+        typeahead_cache.set(user_id, entry)
+
+async def get_typeahead_index(user_id: str) -> TypeaheadIndex:
+    """
+    The user's typeahead table, built on first use and shared by concurrent callers.
+    The cache holds the build task, so an invalidation mid-build makes the next request
+    start a fresh one. Once a table is TYPEAHEAD_REFRESH_SECONDS old it is rebuilt in
+    the background and the old one answers until the new one is ready.
+    """
+    entry = typeahead_cache.get(user_id)
+    if entry is None:
+        entry = {"build": asyncio.ensure_future(build_typeahead_index(user_id)), "started": time.monotonic(), "refresh": None}
+        typeahead_cache.set(user_id, entry)
+    elif entry["build"].done() and entry["refresh"] is None and time.monotonic() - entry["started"] > TYPEAHEAD_REFRESH_SECONDS:
+        entry["started"] = time.monotonic()
+        entry["refresh"] = asyncio.ensure_future(build_typeahead_index(user_id))
+        entry["refresh"].add_done_callback(lambda refresh: _typeahead_refreshed(user_id, entry, refresh))
+    build = entry["build"]
+    try:
+        return await asyncio.shield(build)
+    except Exception:
+        if typeahead_cache.get(user_id) is entry:
+            typeahead_cache.invalidate(user_id)
+        raise
+
+@api_router.get("/search/typeahead")
+async def typeahead_search(q: str, limit: int = 10, current_user: User = Depends(get_current_user)):
+    """Prefix matches over client, account and category names, account numbers and ledger/reference/cheque values"""
+    index = await get_typeahead_index(current_user.id)
+    return {"results": index.search(q, max(1, min(limit, 50)))}
+
+# ==================== INVOICE TAX ENGINE ====================
+
+INVOICE_LINE_FIELDS = ("quantity", "rate", "discount_percent", "tax_rate")
+
+def invoice_line_taxes(quantity, rate, discount_percent, tax_rate, inter_state) -> Dict[str, np.ndarray]:
+    """
+    Taxable value, GST split and line total for a batch of invoice lines (array
+    arguments, one entry per line). Each line goes through the same float operations,
+    in the same order, as the per-item calculation, so results match it exactly.
+    """
+    quantity, rate, discount_percent, tax_rate = (
+        np.asarray(v, dtype=np.float64) for v in (quantity, rate, discount_percent, tax_rate)
+    )
+    inter_state = np.broadcast_to(np.asarray(inter_state, dtype=bool), quantity.shape)
+    
+    # Taxable value: (Qty * Rate) - Discount
+    base_value = quantity * rate
+    taxable_value = base_value - (base_value * discount_percent / 100)
+    
+    # Inter-state supplies carry IGST, intra-state ones CGST + SGST at half the rate each
+    zero = np.zeros_like(taxable_value)
+    igst_rate = np.where(inter_state, tax_rate, zero)
+    half_rate = np.where(inter_state, zero, tax_rate / 2)
+    igst_amount = np.where(inter_state, taxable_value * (igst_rate / 100), zero)
+    half_amount = np.where(inter_state, zero, taxable_value * (half_rate / 100))
+    
+    return {
+        "taxable_value": taxable_value,
+        "cgst_rate": half_rate,
+        "cgst_amount": half_amount,
+        "sgst_rate": half_rate,
+        "sgst_amount": half_amount,
+        "igst_rate": igst_rate,
+        "igst_amount": igst_amount,
+        "total_amount": taxable_value + half_amount + half_amount + igst_amount,
+    }
+
+def invoice_totals(lines: List[dict]) -> dict:
+    """
+    Invoice-level totals and HSN summary from computed lines. Sums run line by line,
+    like the original loops, so rounding of grand_total and round_off is unchanged.
+    """
+    subtotal = 0
+    cgst_total = 0
+    sgst_total = 0
+    igst_total = 0
+    hsn_map = {} # hsn -> {taxable, cgst, sgst, igst, rate}
+    
+    for line in lines:
+        subtotal += line["taxable_value"]
+        cgst_total += line["cgst_amount"]
+        sgst_total += line["sgst_amount"]
+        igst_total += line["igst_amount"]
+        
+        hsn = line["hsn_sac"]
+        if hsn not in hsn_map:
+            hsn_map[hsn] = {"taxable": 0, "cgst": 0, "sgst": 0, "igst": 0, "rate": line["tax_rate"]}
+        
+        hsn_map[hsn]["taxable"] += line["taxable_value"]
+        hsn_map[hsn]["cgst"] += line["cgst_amount"]
+        hsn_map[hsn]["sgst"] += line["sgst_amount"]
+        hsn_map[hsn]["igst"] += line["igst_amount"]
+    
+    total_tax = cgst_total + sgst_total + igst_total
+    total_raw = subtotal + total_tax
+    grand_total = round(total_raw)
+    return {
+        "hsn_summary": [
+            {
+                "hsn_sac": h,
+                "taxable_value": v["taxable"],
+                "tax_rate": v["rate"],
+                "cgst_amount": v["cgst"],
+                "sgst_amount": v["sgst"],
+                "igst_amount": v["igst"],
+                "total_tax": v["cgst"] + v["sgst"] + v["igst"]
+            } for h, v in hsn_map.items()
+        ],
+        "subtotal": subtotal,
+        "cgst_total": cgst_total,
+        "sgst_total": sgst_total,
+        "igst_total": igst_total,
+        "total_tax": total_tax,
+        "grand_total": grand_total,
+        "round_off": grand_total - total_raw,
+    }
+
+def compute_invoice_batch(invoices: List[dict], my_state: Optional[str]) -> List[dict]:
+    """
+    Price a batch of invoices in one vectorised pass. Each invoice is a dict with
+    `place_of_supply` and `items` (dicts with hsn_sac and INVOICE_LINE_FIELDS); the
+    items are filled in with their computed fields and the invoice totals returned in order.
+    """
+    items = [item for inv in invoices for item in inv["items"]]
+    if not items:
+        return [invoice_totals([]) for _ in invoices]
+    inter_state = [inv["place_of_supply"] != my_state for inv in invoices for _ in inv["items"]]
+    columns = invoice_line_taxes(
+        *([item[field] for item in items] for field in INVOICE_LINE_FIELDS), inter_state
+    )
+    computed = {name: values.tolist() for name, values in columns.items()}
+    for i, item in enumerate(items):
+        for name, values in computed.items():
+            item[name] = values[i]
+    return [invoice_totals(inv["items"]) for inv in invoices]
+
+def apply_invoice_taxes(invoice: Invoice, my_state: Optional[str]):
+    """Recalculate an invoice's lines, HSN summary and totals server-side"""
+    items = [item.model_dump() for item in invoice.items]
+    totals = compute_invoice_batch([{"place_of_supply": invoice.place_of_supply, "items": items}], my_state)[0]
+    invoice.items = [InvoiceItem(**item) for item in items]
+    invoice.hsn_summary = [HSNSummary(**h) for h in totals["hsn_summary"]]
+    invoice.subtotal = totals["subtotal"]
+    invoice.cgst_total = totals["cgst_total"]
+    invoice.sgst_total = totals["sgst_total"]
+    invoice.igst_total = totals["igst_total"]
+    invoice.total_tax = totals["total_tax"]
+    invoice.grand_total = totals["grand_total"]
+    invoice.round_off = totals["round_off"]
+
 # ─────────────────────────────────────────────────────────────────────────────
 # ══ INVOICES ══
 # ─────────────────────────────────────────────────────────────────────────────
@@ -2219,75 +3430,7 @@ async def create_invoice(invoice: Invoice, current_user: User = Depends(get_curr
     my_state = profile.get("state") if profile else None
     
     # Recalculate Taxes and Totals Server-side for accuracy
-    subtotal = 0
-    cgst_total = 0
-    sgst_total = 0
-    igst_total = 0
-    hsn_map = {} # hsn -> {taxable, cgst, sgst, igst, rate}
-    
-    for item in invoice.items:
-        # Calculate taxable value: (Qty * Rate) - Discount
-        base_value = item.quantity * item.rate
-        item.taxable_value = base_value - (base_value * item.discount_percent / 100)
-        
-        # Determine Tax Type (CGST/SGST vs IGST)
-        is_inter_state = invoice.place_of_supply != my_state
-        
-        if is_inter_state:
-            item.igst_rate = item.tax_rate
-            item.igst_amount = item.taxable_value * (item.igst_rate / 100)
-            item.cgst_rate = 0
-            item.cgst_amount = 0
-            item.sgst_rate = 0
-            item.sgst_amount = 0
-        else:
-            item.igst_rate = 0
-            item.igst_amount = 0
-            item.cgst_rate = item.tax_rate / 2
-            item.cgst_amount = item.taxable_value * (item.cgst_rate / 100)
-            item.sgst_rate = item.tax_rate / 2
-            item.sgst_amount = item.taxable_value * (item.sgst_rate / 100)
-            
-        item.total_amount = item.taxable_value + item.cgst_amount + item.sgst_amount + item.igst_amount
-        
-        # Accumulate totals
-        subtotal += item.taxable_value
-        cgst_total += item.cgst_amount
-        sgst_total += item.sgst_amount
-        igst_total += item.igst_amount
-        
-        # Update HSN Summary
-        hsn = item.hsn_sac
-        if hsn not in hsn_map:
-            hsn_map[hsn] = {"taxable": 0, "cgst": 0, "sgst": 0, "igst": 0, "rate": item.tax_rate}
-        
-        hsn_map[hsn]["taxable"] += item.taxable_value
-        hsn_map[hsn]["cgst"] += item.cgst_amount
-        hsn_map[hsn]["sgst"] += item.sgst_amount
-        hsn_map[hsn]["igst"] += item.igst_amount
-
-    # Build HSN Summary List
-    invoice.hsn_summary = [
-        HSNSummary(
-            hsn_sac=h, 
-            taxable_value=v["taxable"], 
-            tax_rate=v["rate"],
-            cgst_amount=v["cgst"],
-            sgst_amount=v["sgst"],
-            igst_amount=v["igst"],
-            total_tax=v["cgst"] + v["sgst"] + v["igst"]
-        ) for h, v in hsn_map.items()
-    ]
-    
-    invoice.subtotal = subtotal
-    invoice.cgst_total = cgst_total
-    invoice.sgst_total = sgst_total
-    invoice.igst_total = igst_total
-    invoice.total_tax = cgst_total + sgst_total + igst_total
-    
-    total_raw = subtotal + invoice.total_tax
-    invoice.grand_total = round(total_raw)
-    invoice.round_off = invoice.grand_total - total_raw
+    apply_invoice_taxes(invoice, my_state)
     def amount_to_words(amount):
         """Convert a numerical amount to Indian currency words."""
         try:
@@ -2315,6 +3458,7 @@ async def create_invoice(invoice: Invoice, current_user: User = Depends(get_curr
     invoice_dict = invoice.model_dump(exclude={"id"})
     invoice_dict['created_at'] = invoice_dict['created_at'].isoformat() if isinstance(invoice_dict.get('created_at'), datetime) else invoice_dict.get('created_at')
     invoice_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
+    invoice_dict['invoice_date_key'] = date_key(invoice.invoice_date) or 0
     
     # Ensure payment tracking fields exist
     invoice_dict['amount_paid'] = 0.0
@@ -2322,7 +3466,7 @@ async def create_invoice(invoice: Invoice, current_user: User = Depends(get_curr
     
     await db.invoices.insert_one(invoice_dict)
     
-    await log_action(current_user.id, "create", "invoice", f"Created invoice: {invoice.invoice_number}", invoice.id)
+    await log_action(current_user.id, "create", "invoice", f"Created invoice: {invoice.invoice_number}", invoice.id, [invoice.client_id])
     return invoice
 
 @api_router.get("/invoices")
@@ -2422,300 +3566,208 @@ async def get_invoice_summary(current_user: User = Depends(get_current_user)):
     }
 
 
-@api_router.post("/invoices/import")
-async def import_invoices(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
-):
-    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
-        raise HTTPException(status_code=400, detail="Only Excel and CSV files are supported")
-    
+# Header aliases per invoice sheet field, in order of preference
+INVOICE_SHEET_COLUMNS = {
+    'invoice_number': ['invoice number', 'invoice no', 'bill no', 'number', 'id', 'inv no'],
+    'invoice_date': ['invoice date', 'date', 'bill date', 'issued date'],
+    'due_date': ['due date', 'expiry date', 'payment date'],
+    'client_name': ['client name', 'client', 'customer', 'customer name', 'billed to', 'entity'],
+    'place_of_supply': ['place of supply', 'pos', 'state', 'supply state'],
+    'billing_address': ['billing address', 'address', 'client address'],
+    'shipping_address': ['shipping address', 'shipping'],
+    'status': ['status', 'payment status', 'invoice status'],
+    'item_name': ['item name', 'item', 'description', 'particulars', 'product'],
+    'hsn_sac': ['hsn', 'sac', 'hsn/sac', 'code'],
+    'quantity': ['quantity', 'qty', 'units', 'count'],
+    'unit': ['unit', 'uom', 'measure'],
+    'rate': ['rate', 'price', 'unit price', 'amount/unit'],
+    'tax_rate': ['tax rate', 'gst rate', 'tax %', 'gst %', 'tax'],
+    'discount': ['discount', 'discount %', 'off %']
+}
+
+def _sheet_column(df: pd.DataFrame, field: str) -> Optional[pd.Series]:
+    """The first column present for a field's aliases"""
+    for alias in INVOICE_SHEET_COLUMNS[field]:
+        if alias in df.columns:
+            return df[alias]
+    return None
+
+def _sheet_text(df: pd.DataFrame, field: str, default: str) -> pd.Series:
+    col = _sheet_column(df, field)
+    if col is None:
+        return pd.Series(default, index=df.index, dtype=object)
+    return col.map(str).where(col.notna(), default)
+
+def _sheet_number(df: pd.DataFrame, field: str, default: float, strip: tuple = ()) -> pd.Series:
+    col = _sheet_column(df, field)
+    if col is None:
+        return pd.Series(default, index=df.index, dtype=np.float64)
+    if not pd.api.types.is_numeric_dtype(col):
+        col = col.astype(str)
+        for symbol in strip:
+            col = col.str.replace(symbol, '', regex=False)
+        col = col.str.strip()
+    return pd.to_numeric(col, errors='coerce').astype(np.float64).fillna(default)
+
+def _sheet_date(df: pd.DataFrame, field: str, default: pd.Series) -> pd.Series:
+    """DD-MM-YYYY per row; each distinct cell value is parsed once"""
+    col = _sheet_column(df, field)
+    if col is None:
+        return default
+    def parse(val):
+        if pd.isna(val) or val == '':
+            return None
+        try:
+            if isinstance(val, (datetime, pd.Timestamp)):
+                return val.strftime("%d-%m-%Y")
+            return pd.to_datetime(str(val)).strftime("%d-%m-%Y")
+        except Exception:
+            return None
+    parsed = {val: parse(val) for val in col.dropna().unique()}
+    return col.map(parsed).where(lambda d: d.notna(), default)
+
+async def import_invoices_file(contents: bytes, filename: str, current_user: User, job: Optional[ImportJob] = None):
+    """Create invoices (one per invoice number, or per row) from an uploaded sheet"""
     try:
-        contents = await file.read()
-        if file.filename.lower().endswith('.csv'):
-            try:
-                df = pd.read_csv(io.BytesIO(contents))
-            except:
-                try:
-                    df = pd.read_csv(io.BytesIO(contents), encoding='latin-1')
-                except:
-                    df = pd.read_csv(io.BytesIO(contents), encoding='cp1252')
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-        
-        # Normalize columns
-        df.columns = [str(c).strip().lower() for c in df.columns]
+        df = await run_parser(read_sheet, contents, filename)
+        if job:
+            await job.report(rows_parsed=len(df))
+        df = df.reset_index(drop=True)
         
         # Fetch all clients to map names to IDs
         all_clients = await db.clients.find({"user_id": current_user.id}).to_list(None)
         client_map = {c['name'].lower(): str(c['id']) for c in all_clients}
         
-        # Fuzzy column mapping
-        col_map = {
-            'invoice_number': ['invoice number', 'invoice no', 'bill no', 'number', 'id', 'inv no'],
-            'invoice_date': ['invoice date', 'date', 'bill date', 'issued date'],
-            'due_date': ['due date', 'expiry date', 'payment date'],
-            'client_name': ['client name', 'client', 'customer', 'customer name', 'billed to', 'entity'],
-            'place_of_supply': ['place of supply', 'pos', 'state', 'supply state'],
-            'billing_address': ['billing address', 'address', 'client address'],
-            'shipping_address': ['shipping address', 'shipping'],
-            'status': ['status', 'payment status', 'invoice status'],
-            'item_name': ['item name', 'item', 'description', 'particulars', 'product'],
-            'hsn_sac': ['hsn', 'sac', 'hsn/sac', 'code'],
-            'quantity': ['quantity', 'qty', 'units', 'count'],
-            'unit': ['unit', 'uom', 'measure'],
-            'rate': ['rate', 'price', 'unit price', 'amount/unit'],
-            'tax_rate': ['tax rate', 'gst rate', 'tax %', 'gst %', 'tax'],
-            'discount': ['discount', 'discount %', 'off %']
-        }
-        
         # Pre-fetch company profile for tax logic
         profile = await db.company_profiles.find_one({"user_id": current_user.id})
         my_state = profile.get("state") if profile else "Gujarat" # Fallback if no profile
         
-        invoice_id_col = None
-        for alias in col_map['invoice_number']:
+        # Resolve every column once for the whole sheet
+        today = datetime.now().strftime("%d-%m-%Y")
+        client_ids = pd.Series(None, index=df.index, dtype=object)
+        for alias in INVOICE_SHEET_COLUMNS['client_name']:
             if alias in df.columns:
-                invoice_id_col = alias
-                break
-                
-        if invoice_id_col:
+                names = df[alias].map(str).str.strip().str.lower()
+                client_ids = client_ids.where(client_ids.notna(), names.map(client_map))
+        invoice_dates = _sheet_date(df, 'invoice_date', pd.Series(today, index=df.index, dtype=object))
+        due_dates = _sheet_date(df, 'due_date', invoice_dates)
+        places = _sheet_text(df, 'place_of_supply', my_state)
+        addresses = _sheet_text(df, 'billing_address', "Imported Address")
+        status_col = _sheet_column(df, 'status')
+        if status_col is not None:
+            status_text = status_col.map(str).str.lower()
+            statuses = pd.Series(
+                np.where(status_text.str.contains('paid', regex=False), "paid",
+                         np.where(status_text.str.contains('sent', regex=False), "sent", "draft")),
+                index=df.index
+            )
+        else:
+            statuses = pd.Series("draft", index=df.index)
+        
+        item_rows = pd.DataFrame({
+            "name": _sheet_text(df, 'item_name', "Imported Item"),
+            "hsn_sac": _sheet_text(df, 'hsn_sac', "9983"), # Default SAC for services
+            "quantity": _sheet_number(df, 'quantity', 1.0),
+            "rate": _sheet_number(df, 'rate', 0.0, strip=('₹', ',')),
+            "tax_rate": _sheet_number(df, 'tax_rate', 18.0, strip=('%',)),
+            "discount_percent": _sheet_number(df, 'discount', 0.0),
+        }).to_dict('records')
+        
+        invoice_id_col = _sheet_column(df, 'invoice_number')
+        if invoice_id_col is not None:
             # Group by invoice number for multi-item invoices
-            grouped = df.groupby(invoice_id_col)
+            groups = df.groupby(invoice_id_col).indices
         else:
             # Each row is a separate invoice
-            df['_row_idx'] = range(len(df))
-            grouped = df.groupby('_row_idx')
-            
+            groups = {i: [i] for i in range(len(df))}
+        
+        # Skip invoices with no matching client when there is no default client either
+        default_client_id = str(all_clients[0]['id']) if all_clients else None
+        invoice_groups = []
+        for name, positions in groups.items():
+            first = positions[0]
+            client_id = client_ids.iat[first]
+            if pd.isna(client_id):
+                client_id = default_client_id
+            if not client_id:
+                continue
+            inv_no = str(name) if invoice_id_col is not None else "AUTO"
+            invoice_groups.append((inv_no, client_id, first, positions))
+        
+        # Reserve invoice numbers for all unnumbered invoices in one go
+        unnumbered = sum(1 for inv_no, *_ in invoice_groups if inv_no in ("AUTO", "nan", ""))
+        reserved = iter(await reserve_invoice_numbers(current_user.id, unnumbered) if unnumbered else [])
+        
         invoices_to_create = []
+        created_at = datetime.now(timezone.utc).isoformat()
+        for inv_no, client_id, first, positions in invoice_groups:
+            if inv_no in ("AUTO", "nan", ""):
+                inv_no = next(reserved)
+            inv_date = invoice_dates.iat[first]
+            invoices_to_create.append({
+                "id": str(uuid.uuid4()),
+                "user_id": current_user.id,
+                "client_id": client_id,
+                "invoice_number": inv_no,
+                "invoice_type": "Tax Invoice",
+                "invoice_date": inv_date,
+                "invoice_date_key": date_key(inv_date) or 0,
+                "due_date": due_dates.iat[first],
+                "place_of_supply": places.iat[first],
+                "billing_address": addresses.iat[first],
+                # Taxes are computed for the whole file at once below
+                "items": [
+                    {
+                        "item_id": str(uuid.uuid4()),
+                        "name": item_rows[i]["name"],
+                        "description": None,
+                        "hsn_sac": item_rows[i]["hsn_sac"],
+                        "quantity": item_rows[i]["quantity"],
+                        "unit": "PCS",
+                        "rate": item_rows[i]["rate"],
+                        "tax_rate": item_rows[i]["tax_rate"],
+                        "discount_percent": item_rows[i]["discount_percent"],
+                    } for i in positions
+                ],
+                "status": statuses.iat[first],
+                "created_at": created_at
+            })
         
-        for name, group in grouped:
-            first_row = group.iloc[0]
+        # Tax Calculations
+        for invoice_doc, totals in zip(invoices_to_create, compute_invoice_batch(invoices_to_create, my_state)):
+            grand_total = totals["grand_total"]
+            invoice_doc.update(totals)
+            invoice_doc.update({
+                "grand_total_words": amount_to_words(grand_total),
+                "amount_paid": float(grand_total) if invoice_doc["status"] == "paid" else 0.0,
+                "balance_due": 0.0 if invoice_doc["status"] == "paid" else float(grand_total),
+            })
             
-            # Find Client ID
-            target_client_id = None
-            for alias in col_map['client_name']:
-                if alias in df.columns:
-                    val = str(first_row[alias]).strip().lower()
-                    if val in client_map:
-                        target_client_id = client_map[val]
-                        break
+        if invoices_to_create:
+            for i in range(0, len(invoices_to_create), IMPORT_CHUNK_SIZE):
+                await db.invoices.insert_many(invoices_to_create[i:i + IMPORT_CHUNK_SIZE])
+                if job:
+                    await job.report(inserted=min(i + IMPORT_CHUNK_SIZE, len(invoices_to_create)))
+            await log_action(current_user.id, "import", "invoice", f"Bulk imported {len(invoices_to_create)} invoices")
+            return {"message": f"Successfully imported {len(invoices_to_create)} invoices"}
+        else:
+            return {"message": "No valid invoice rows found or client matching failed."}
             
-            # Skip if no client found and no defaults available
-            if not target_client_id:
-                if all_clients:
-                    target_client_id = str(all_clients[0]['id'])
-                else: 
-                    # If user has no clients, we can't create an invoice
-                    continue
+    except Exception as e:
+        logger.error(f"Invoice Import Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
-            # Basic metadata
-            inv_no = str(name) if invoice_id_col else "AUTO"
-            if inv_no == "AUTO" or inv_no == "nan" or not inv_no:
-                 inv_no = await generate_invoice_number(current_user.id)
-            
-            # Extract Date
-            inv_date = datetime.now().strftime("%d-%m-%Y")
-            for alias in col_map['invoice_date']:
-                if alias in df.columns:
-                    val = first_row[alias]
-                    if not pd.isna(val) and val != '':
-                         try:
-                             if isinstance(val, (datetime, pd.Timestamp)):
-                                 inv_date = val.strftime("%d-%m-%Y")
-                             else:
-                                 inv_date = pd.to_datetime(str(val)).strftime("%d-%m-%Y")
-                         except: pass
-                    break
-            
-            due_date = inv_date
-            for alias in col_map['due_date']:
-                if alias in df.columns:
-                    val = first_row[alias]
-                    if not pd.isna(val) and val != '':
-                         try:
-                             if isinstance(val, (datetime, pd.Timestamp)):
-                                 due_date = val.strftime("%d-%m-%Y")
-                             else:
-                                 due_date = pd.to_datetime(str(val)).strftime("%d-%m-%Y")
-                         except: pass
-                    break
-            
-            pos = my_state
-            for alias in col_map['place_of_supply']:
-                if alias in df.columns:
-                    val = first_row[alias]
-                    if not pd.isna(val):
-                        pos = str(val)
-                    break
-            
-            billing_address = "Imported Address"
-            for alias in col_map['billing_address']:
-                if alias in df.columns:
-                    val = first_row[alias]
-                    if not pd.isna(val):
-                        billing_address = str(val)
-                    break
-            
-            status = "draft"
-            for alias in col_map['status']:
-                if alias in df.columns:
-                    s_val = str(first_row[alias]).lower()
-                    if 'paid' in s_val: status = "paid"
-                    elif 'sent' in s_val: status = "sent"
-                    break
-            
-            # Create Items list for this invoice
-            invoice_items = []
-            for _, row in group.iterrows():
-                item_name = "Imported Item"
-                for alias in col_map['item_name']:
-                    if alias in df.columns:
-                        val = row[alias]
-                        if not pd.isna(val): item_name = str(val)
-                        break
-                
-                hsn = "9983" # Default SAC for services
-                for alias in col_map['hsn_sac']:
-                    if alias in df.columns:
-                        val = row[alias]
-                        if not pd.isna(val): hsn = str(val)
-                        break
-                
-                qty = 1.0
-                for alias in col_map['quantity']:
-                    if alias in df.columns:
-                        try: qty = float(row[alias])
-                        except: pass
-                        break
-                
-                rate = 0.0
-                for alias in col_map['rate']:
-                    if alias in df.columns:
-                        try: 
-                            r_val = str(row[alias]).replace('₹', '').replace(',', '').strip()
-                            rate = float(r_val)
-                        except: pass
-                        break
-                
-                tax_rate = 18.0
-                for alias in col_map['tax_rate']:
-                    if alias in df.columns:
-                        try: 
-                            t_val = str(row[alias]).replace('%', '').strip()
-                            tax_rate = float(t_val)
-                        except: pass
-                        break
-                
-                discount = 0.0
-                for alias in col_map['discount']:
-                    if alias in df.columns:
-                        try: discount = float(row[alias])
-                        except: pass
-                        break
-                
-                # Create Item
-                it_id = str(uuid.uuid4())
-                item_obj = InvoiceItem(
-                    item_id=it_id,
-                    name=item_name,
-                    hsn_sac=hsn,
-                    quantity=qty,
-                    unit="PCS",
-                    rate=rate,
-                    tax_rate=tax_rate,
-                    discount_percent=discount,
-                    taxable_value=0, 
-                    total_amount=0 
-                )
-                invoice_items.append(item_obj)
-            
-            # Tax Calculations
-            is_inter_state = pos != my_state
-            it_subtotal = 0
-            it_cgst = 0
-            it_sgst = 0
-            it_igst = 0
-            it_hsn_map = {}
-            
-            for it in invoice_items:
-                base = it.quantity * it.rate
-                it.taxable_value = base - (base * it.discount_percent / 100)
-                
-                if is_inter_state:
-                    it.igst_rate = it.tax_rate
-                    it.igst_amount = it.taxable_value * (it.igst_rate / 100)
-                    it.cgst_amount = it.sgst_amount = 0
-                else:
-                    it.cgst_rate = it.tax_rate / 2
-                    it.sgst_rate = it.tax_rate / 2
-                    it.cgst_amount = it.taxable_value * (it.cgst_rate / 100)
-                    it.sgst_amount = it.taxable_value * (it.sgst_rate / 100)
-                    it.igst_amount = 0
-                
-                it.total_amount = it.taxable_value + it.cgst_amount + it.sgst_amount + it.igst_amount
-                it_subtotal += it.taxable_value
-                it_cgst += it.cgst_amount
-                it_sgst += it.sgst_amount
-                it_igst += it.igst_amount
-                
-                # Group for HSN Summary
-                h = it.hsn_sac
-                if h not in it_hsn_map:
-                    it_hsn_map[h] = {"taxable": 0, "tax": 0, "rate": it.tax_rate}
-                it_hsn_map[h]["taxable"] += it.taxable_value
-                it_hsn_map[h]["tax"] += (it.cgst_amount + it.sgst_amount + it.igst_amount)
-
-            hsn_summary = [
-                HSNSummary(
-                    hsn_sac=h, 
-                    taxable_value=v["taxable"], 
-                    tax_rate=v["rate"],
-                    total_tax=v["tax"]
-                ) for h, v in it_hsn_map.items()
-            ]
-            
-            total_tax = it_cgst + it_sgst + it_igst
-            grand_total = round(it_subtotal + total_tax)
-            round_off = grand_total - (it_subtotal + total_tax)
-            
-            invoice_doc = {
-                "id": str(uuid.uuid4()),
-                "user_id": current_user.id,
-                "client_id": target_client_id,
-                "invoice_number": inv_no,
-                "invoice_type": "Tax Invoice",
-                "invoice_date": inv_date,
-                "due_date": due_date,
-                "place_of_supply": pos,
-                "billing_address": billing_address,
-                "items": [it.model_dump() for it in invoice_items],
-                "hsn_summary": [h.model_dump() for h in hsn_summary],
-                "subtotal": it_subtotal,
-                "total_tax": total_tax,
-                "cgst_total": it_cgst,
-                "sgst_total": it_sgst,
-                "igst_total": it_igst,
-                "round_off": round_off,
-                "grand_total": grand_total,
-                "grand_total_words": amount_to_words(grand_total),
-                "status": status,
-                "amount_paid": float(grand_total) if status == "paid" else 0.0,
-                "balance_due": 0.0 if status == "paid" else float(grand_total),
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }
-            invoices_to_create.append(invoice_doc)
-            
-        if invoices_to_create:
-            await db.invoices.insert_many(invoices_to_create)
-            await log_action(current_user.id, "import", "invoice", f"Bulk imported {len(invoices_to_create)} invoices")
-            return {"message": f"Successfully imported {len(invoices_to_create)} invoices"}
-        else:
-            return {"message": "No valid invoice rows found or client matching failed."}
-            
-    except Exception as e:
-        logger.error(f"Invoice Import Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+@api_router.post("/invoices/import")
+async def import_invoices(
+    file: UploadFile = File(...),
+    background: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(status_code=400, detail="Only Excel and CSV files are supported")
+    
+    contents = await file.read()
+    return await submit_import("invoices", import_invoices_file, contents, file.filename, current_user, background)
 
 @api_router.get("/invoices/{id}")
 
@@ -2756,80 +3808,21 @@ async def update_invoice(id: str, data: Invoice, current_user: User = Depends(ge
     profile = await db.company_profiles.find_one({"user_id": current_user.id})
     my_state = profile.get("state") if profile else None
     
-    subtotal = 0
-    cgst_total = 0
-    sgst_total = 0
-    igst_total = 0
-    hsn_map = {}
-    
-    for item in data.items:
-        base_value = item.quantity * item.rate
-        item.taxable_value = base_value - (base_value * item.discount_percent / 100)
-        
-        is_inter_state = data.place_of_supply != my_state
-        
-        if is_inter_state:
-            item.igst_rate = item.tax_rate
-            item.igst_amount = item.taxable_value * (item.igst_rate / 100)
-            item.cgst_rate = 0
-            item.cgst_amount = 0
-            item.sgst_rate = 0
-            item.sgst_amount = 0
-        else:
-            item.igst_rate = 0
-            item.igst_amount = 0
-            item.cgst_rate = item.tax_rate / 2
-            item.cgst_amount = item.taxable_value * (item.cgst_rate / 100)
-            item.sgst_rate = item.tax_rate / 2
-            item.sgst_amount = item.taxable_value * (item.sgst_rate / 100)
-            
-        item.total_amount = item.taxable_value + item.cgst_amount + item.sgst_amount + item.igst_amount
-        
-        subtotal += item.taxable_value
-        cgst_total += item.cgst_amount
-        sgst_total += item.sgst_amount
-        igst_total += item.igst_amount
-        
-        hsn = item.hsn_sac
-        if hsn not in hsn_map:
-            hsn_map[hsn] = {"taxable": 0, "cgst": 0, "sgst": 0, "igst": 0, "rate": item.tax_rate}
-        
-        hsn_map[hsn]["taxable"] += item.taxable_value
-        hsn_map[hsn]["cgst"] += item.cgst_amount
-        hsn_map[hsn]["sgst"] += item.sgst_amount
-        hsn_map[hsn]["igst"] += item.igst_amount
-
-    data.hsn_summary = [
-        HSNSummary(
-            hsn_sac=h, 
-            taxable_value=v["taxable"], 
-            tax_rate=v["rate"],
-            cgst_amount=v["cgst"],
-            sgst_amount=v["sgst"],
-            igst_amount=v["igst"],
-            total_tax=v["cgst"] + v["sgst"] + v["igst"]
-        ) for h, v in hsn_map.items()
-    ]
-    
-    data.subtotal = subtotal
-    data.cgst_total = cgst_total
-    data.sgst_total = sgst_total
-    data.igst_total = igst_total
-    data.total_tax = cgst_total + sgst_total + igst_total
-    
-    total_raw = subtotal + data.total_tax
-    data.grand_total = round(total_raw)
-    data.round_off = data.grand_total - total_raw
+    apply_invoice_taxes(data, my_state)
     data.grand_total_words = amount_to_words(data.grand_total)
     
     update_data = data.model_dump(exclude={"id", "created_at", "amount_paid", "balance_due"}, exclude_unset=True)
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    update_data['invoice_date_key'] = date_key(data.invoice_date) or 0
     
     amt_paid = existing.get('amount_paid', 0)
     update_data['balance_due'] = max(0, data.grand_total - amt_paid)
     
     await db.invoices.update_one({"id": id}, {"$set": update_data})
-    await log_action(current_user.id, "update", "invoice", f"Updated invoice {existing['invoice_number']}", id)
+    await log_action(
+        current_user.id, "update", "invoice", f"Updated invoice {existing['invoice_number']}", id,
+        [existing.get("client_id"), update_data.get("client_id")]
+    )
     
     return await db.invoices.find_one({"id": id}, {"_id": 0})
 
@@ -2906,8 +3899,16 @@ async def record_payment(id: str, data: dict, current_user: User = Depends(get_c
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.transactions.insert_one(payment_txn)
+    stamp_ledger_fields(payment_txn)
+    written, _ = await insert_ledger_rows([payment_txn])
+    if not written:
+        raise DatabaseError("Failed to save the payment transaction")
     await db.accounts.update_one({"id": account_id}, {"$inc": {"balance": amount}})
+    await apply_ledger_changes(current_user.id, added=[payment_txn])
+    await log_action(
+        current_user.id, "payment", "invoice", f"Recorded payment of ₹{amount} on {invoice_full['invoice_number']}", id,
+        [invoice_full['client_id'], account_id, payment_txn["id"]]
+    )
     return {"status": "success", "balance_due": max(0, new_balance), "status_label": new_status}
 
 @api_router.post("/invoices/{id}/send")
@@ -2924,6 +3925,7 @@ async def send_invoice(id: str, current_user: User = Depends(get_current_user)):
         {"id": id, "user_id": current_user.id},
         {"$set": {"status": "sent", "sent_at": datetime.now(timezone.utc).isoformat()}}
     )
+    await log_action(current_user.id, "send", "invoice", f"Sent invoice {invoice.get('invoice_number')} to {client_email}", id, [invoice.get("client_id")])
     return {"status": "sent", "message": f"Invoice sent to {client_email}"}
 
 @api_router.delete("/invoices/{id}")
@@ -2935,406 +3937,528 @@ async def delete_invoice(id: str, current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Only draft invoices can be deleted")
     
     await db.invoices.delete_one({"id": id})
-    await log_action(current_user.id, "delete", "invoice", f"Deleted invoice ID: {id}", id)
+    await log_action(current_user.id, "delete", "invoice", f"Deleted invoice ID: {id}", id, [invoice.get("client_id")])
     return {"status": "deleted"}
 
 
-# ==================== CSV IMPORT ROUTES ====================
+# ==================== STATEMENT IMPORT ENGINE ====================
+
+# Column roles of a bank statement, in the order header_keywords are tried
+STATEMENT_COLUMN_ROLES = {
+    "date": "Date",
+    "description": "Particulars",
+    "debit": "Debit",
+    "credit": "Credit",
+    "balance": "Balance",
+    "group": "Group",
+    "ledger": "Ledger Name",
+    "account_holder": "Account Holder Name",
+    "reference": "Reference",
+    "cheque": "Cheque Number",
+    "notes": "Notes",
+}
 
-@api_router.post("/import/csv")
-async def import_csv(
-    file: UploadFile = File(...),
-    account_id: str = None,
-    force_balance: bool = False,
-    current_user: User = Depends(get_current_user)
-):
-    if not file.filename.lower().endswith(('.csv', '.pdf', '.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Only CSV, Excel, and PDF files are supported")
+# Text PDF statements: patterns are compiled once and applied line by line, page by page
+PDF_DATE_PATTERNS = [
+    re.compile(r'(\d{1,2}[-/]\d{1,2}[-/]\d{4})'),  # DD-MM-YYYY or DD/MM/YYYY
+    re.compile(r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})'),  # YYYY-MM-DD
+    re.compile(r'(\d{1,2}\s+[A-Za-z]{3}\s+\d{4})'),  # DD Mon YYYY
+]
+# Matches: 1,00,000.00 or 100000.00 or 1000.00 or 1,000
+PDF_AMOUNT_RE = re.compile(r'(\d{1,3}(?:,\d{2,3})*(?:\.\d{2})?|\d+(?:\.\d{2})?)')
+PDF_DAY_RE = re.compile(r'^\d{1,2}$')
+PDF_ZERO_AMOUNTS = ('0', '0.00', '0.0')
+PDF_STATEMENT_COLUMNS = ['Txn Date', 'Description', 'Dr Amount', 'Cr Amount', 'Balance']
+PDF_NO_TRANSACTIONS = "No transactions found in PDF. Please ensure it's a text-based PDF with transaction table. Try uploading a CSV file instead."
+# Pages decoded per parse task when a PDF is streamed into an import
+PDF_PAGES_PER_TASK = int(get_env("PDF_PAGES_PER_TASK", "10"))
+
+def parse_statement_line(line: str) -> Optional[dict]:
+    """Statement row found on one line of PDF text, if any"""
+    line = line.strip()
+    if not line:
+        return None
     
-    if not account_id:
-        raise HTTPException(status_code=400, detail="Account ID is required")
+    # Try each date pattern
+    date_match = None
+    for pattern in PDF_DATE_PATTERNS:
+        date_match = pattern.search(line)
+        if date_match:
+            break
+    if not date_match:
+        return None
+    date_str = date_match.group(1)
     
-    # Verify account belongs to user
-    account = await db.accounts.find_one({"id": account_id, "user_id": current_user.id})
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+    # Extract all numbers (potential amounts) after the date, so its digits are never taken for one
+    rest = line[date_match.end():]
+    amounts = [amt for amt in PDF_AMOUNT_RE.findall(rest) if not PDF_DAY_RE.match(amt)]
+    if not amounts:
+        return None
+    
+    # Get description (text between date and first amount), without extra spaces
+    description = ' '.join(rest[:rest.find(amounts[0])].split())
+    if not description or len(description) <= 2:
+        return None
     
+    # Look for the last 2-3 amounts (likely debit, credit, balance)
+    # Skip balance (last amount) and use previous ones
+    relevant_amounts = amounts[:-1] if len(amounts) > 2 else amounts
+    
+    dr_amount = ''
+    cr_amount = ''
+    if len(relevant_amounts) >= 2:
+        # Has both debit and credit
+        dr_amount = relevant_amounts[0] if relevant_amounts[0] not in PDF_ZERO_AMOUNTS else ''
+        cr_amount = relevant_amounts[1] if relevant_amounts[1] not in PDF_ZERO_AMOUNTS else ''
+    elif len(relevant_amounts) == 1:
+        # Single amount - assume debit for now
+        dr_amount = relevant_amounts[0]
+    
+    if not (dr_amount or cr_amount):
+        return None
+    return {
+        'Txn Date': normalize_date(date_str),
+        'Description': description,
+        'Dr Amount': dr_amount,
+        'Cr Amount': cr_amount,
+        'Balance': amounts[-1] if len(amounts) > 2 else None
+    }
+
+def pdf_page_count(contents: bytes) -> int:
+    return len(PyPDF2.PdfReader(io.BytesIO(contents)).pages)
+
+def parse_pdf_pages(contents: bytes, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+    """Statement rows on pages [start, stop) of a text PDF; only one page's text is held at a time"""
+    reader = PyPDF2.PdfReader(io.BytesIO(contents))
+    rows = []
+    for page in reader.pages[start:stop]:
+        for line in (page.extract_text() or "").split('\n'):
+            row = parse_statement_line(line)
+            if row:
+                rows.append(row)
+    return rows
+
+async def stream_pdf_statement(contents: bytes):
+    """
+    Yield a PDF statement's rows as DataFrames, PDF_PAGES_PER_TASK pages at a time
+    and in page order. Up to IMPORT_PROCESS_WORKERS page ranges decode in parallel.
+    """
     try:
-        contents = await file.read()
-        
-        # Handle PDF files
-        if file.filename.endswith('.pdf'):
+        page_count = await run_parser(pdf_page_count, contents)
+    except Exception as e:
+        raise ValueError(f"Error parsing PDF: {str(e)}")
+    
+    window = max(1, IMPORT_PROCESS_WORKERS)
+    pending = deque()
+    ranges = iter(range(0, page_count, PDF_PAGES_PER_TASK))
+    try:
+        while True:
+            for start in ranges:
+                stop = min(start + PDF_PAGES_PER_TASK, page_count)
+                pending.append(asyncio.ensure_future(run_parser(parse_pdf_pages, contents, start, stop)))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return
             try:
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(contents))
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                
-                logging.info(f"Extracted text from PDF (first 500 chars): {text[:500]}")
-                
-                # Parse text to extract transactions
-                lines = text.split('\n')
-                transactions_data = []
-                
-                # Try multiple date patterns
-                date_patterns = [
-                    r'(\d{1,2}[-/]\d{1,2}[-/]\d{4})',  # DD-MM-YYYY or DD/MM/YYYY
-                    r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})',  # YYYY-MM-DD
-                    r'(\d{1,2}\s+[A-Za-z]{3}\s+\d{4})',  # DD Mon YYYY
-                ]
-                
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Try each date pattern
-                    date_match = None
-                    for pattern in date_patterns:
-                        date_match = re.search(pattern, line)
-                        if date_match:
-                            break
-                    
-                    if date_match:
-                        date_str = date_match.group(1)
-                        
-                        # Extract all numbers (potential amounts) - more flexible pattern
-                        # Matches: 1,00,000.00 or 100000.00 or 1000.00 or 1,000
-                        amounts = re.findall(r'(\d{1,3}(?:,\d{2,3})*(?:\.\d{2})?|\d+(?:\.\d{2})?)', line)
-                        
-                        # Filter out dates from amounts
-                        amounts = [amt for amt in amounts if not re.match(r'^\d{1,2}$', amt) and amt != date_str]
-                        
-                        if amounts:
-                            # Get description (text between date and first amount)
-                            desc_start = line.find(date_str) + len(date_str)
-                            first_amount_pos = line.find(amounts[0])
-                            description = line[desc_start:first_amount_pos].strip()
-                            
-                            # Clean description - remove extra spaces and special chars
-                            description = ' '.join(description.split())
-                            
-                            if description and len(description) > 2:
-                                # Look for the last 2-3 amounts (likely debit, credit, balance)
-                                # Skip balance (last amount) and use previous ones
-                                relevant_amounts = amounts[:-1] if len(amounts) > 2 else amounts
-                                
-                                dr_amount = ''
-                                cr_amount = ''
-                                
-                                if len(relevant_amounts) >= 2:
-                                    # Has both debit and credit
-                                    dr_amount = relevant_amounts[0] if relevant_amounts[0] not in ['0', '0.00', '0.0'] else ''
-                                    cr_amount = relevant_amounts[1] if relevant_amounts[1] not in ['0', '0.00', '0.0'] else ''
-                                elif len(relevant_amounts) == 1:
-                                    # Single amount - assume debit for now
-                                    dr_amount = relevant_amounts[0]
-                                
-                                if dr_amount or cr_amount:
-                                    balance_val = amounts[-1] if len(amounts) > 2 else None
-                                    transactions_data.append({
-                                        'Txn Date': normalize_date(date_str),
-                                        'Description': description,
-                                        'Dr Amount': dr_amount,
-                                        'Cr Amount': cr_amount,
-                                        'Balance': balance_val
-                                    })
-                                    logging.debug(f"Found transaction: {date_str} | {description} | Dr:{dr_amount} | Cr:{cr_amount}")
-                
-                logging.info(f"Total transactions found: {len(transactions_data)}")
-                
-                if not transactions_data:
-                    # Log some sample lines for debugging
-                    valid_lines: List[str] = [l for l in lines if l.strip()]
-                    sample_lines = [valid_lines[i] for i in range(min(10, len(valid_lines)))]
-                    logging.error(f"No transactions found. Sample lines: {sample_lines}")
-                    raise HTTPException(status_code=400, detail="No transactions found in PDF. Please ensure it's a text-based PDF with transaction table. Try uploading a CSV file instead.")
-                
-                # Convert to DataFrame
-                df = pd.DataFrame(transactions_data)
-                logging.info(f"Successfully extracted {len(df)} transactions from PDF")
-                
-            except HTTPException:
+                rows = await pending.popleft()
+            except ValueError:
                 raise
             except Exception as e:
-                logging.error(f"Error parsing PDF: {e}")
-                raise HTTPException(status_code=400, detail=f"Error parsing PDF: {str(e)}")
-        elif file.filename.lower().endswith(('.xlsx', '.xls')):
-            # Handle Excel files
-            df = pd.read_excel(io.BytesIO(contents))
-        else:
-            # Handle CSV files
-            try:
-                # Try UTF-8 first
-                df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-            except UnicodeDecodeError:
-                # Fallback to latin-1
-                df = pd.read_csv(io.StringIO(contents.decode('latin-1')))
+                raise ValueError(f"Error parsing PDF: {str(e)}")
+            if rows:
+                yield pd.DataFrame(rows, columns=PDF_STATEMENT_COLUMNS)
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _single_frame(df: pd.DataFrame):
+    yield df
+
+def statement_movement(df: pd.DataFrame, columns: Dict[str, Optional[str]]) -> float:
+    """Net credits minus debits of a chunk of statement rows"""
+    delta = 0.0
+    if columns["credit"]:
+        delta += parse_amount_column(df[columns["credit"]]).sum()
+    if columns["debit"]:
+        delta -= parse_amount_column(df[columns["debit"]]).sum()
+    return float(delta)
+
+def statement_closing_balance(df: pd.DataFrame, columns: Dict[str, Optional[str]]) -> float:
+    """Balance column of the chunk's last row (NaN when blank)"""
+    return float(pd.to_numeric(str(df[columns["balance"]].iloc[-1]).replace(',', ''), errors="coerce"))
+
+async def statement_balance_mismatch(chunks, columns: Dict[str, Optional[str]], opening: float) -> Optional[dict]:
+    """
+    Compare the statement's closing balance with the account balance plus the statement's
+    net movement. Only running totals are kept, so a streamed statement stays streamed.
+    """
+    delta = 0.0
+    provided_final = None
+    async for chunk in chunks:
+        if chunk.empty:
+            continue
+        delta += statement_movement(chunk, columns)
+        provided_final = statement_closing_balance(chunk, columns)
+    if provided_final is None:
+        return None
+    
+    expected_final = float(opening) + delta
+    if abs(expected_final - provided_final) > 0.01:
+        return {"calculated": expected_final, "provided": provided_final}
+    return None
+
+def parse_statement_file(contents: bytes, filename: str) -> pd.DataFrame:
+    """
+    Read an uploaded bank statement (CSV, Excel or text PDF) into a DataFrame.
+    May run in the parse process pool, so failures are raised as ValueError.
+    """
+    # Handle PDF files
+    if filename.lower().endswith('.pdf'):
+        try:
+            transactions_data = parse_pdf_pages(contents)
+        except Exception as e:
+            logging.error(f"Error parsing PDF: {e}")
+            raise ValueError(f"Error parsing PDF: {str(e)}")
+        if not transactions_data:
+            raise ValueError(PDF_NO_TRANSACTIONS)
+        df = pd.DataFrame(transactions_data, columns=PDF_STATEMENT_COLUMNS)
+        logging.info(f"Successfully extracted {len(df)} transactions from PDF")
+    elif filename.lower().endswith(('.xlsx', '.xls')):
+        # Handle Excel files
+        df = pd.read_excel(io.BytesIO(contents))
+    else:
+        # Handle CSV files
+        try:
+            # Try UTF-8 first
+            df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
+        except UnicodeDecodeError:
+            # Fallback to latin-1
+            df = pd.read_csv(io.StringIO(contents.decode('latin-1')))
+    
+    return df
+
+def detect_statement_columns(columns) -> Dict[str, Optional[str]]:
+    """Map statement columns to their roles; the last matching column wins"""
+    detected = dict.fromkeys(STATEMENT_COLUMN_ROLES)
+    for col in columns:
+        col_lower = str(col).lower().strip()
+        for role, header in STATEMENT_COLUMN_ROLES.items():
+            if any(k in col_lower for k in header_keywords[header]):
+                detected[role] = col
+                break
+    return detected
+
+def parse_amount_column(series: pd.Series) -> pd.Series:
+    """Vectorised amount parsing: strips thousands separators, blanks and junk become 0"""
+    cleaned = series.astype(str).str.strip().str.replace(',', '', regex=False)
+    return pd.to_numeric(cleaned, errors="coerce").fillna(0.0).astype(float)
+
+def _text_column(df: pd.DataFrame, col: Optional[str]) -> List[Optional[str]]:
+    if not col:
+        return [None] * len(df)
+    present = df[col].notna().tolist()
+    values = df[col].astype(str).str.strip().tolist()
+    return [v if ok else None for v, ok in zip(values, present)]
+
+def _legacy_category(categories: List[dict], desc_lower: str) -> Optional[str]:
+    # Simple hardcoded keyword match kept for statements without rules or groups
+    for cat in categories:
+        if cat['type'] == 'expense' and any(keyword in desc_lower for keyword in ['rent', 'utilities', 'electricity', 'water']):
+            if 'rent' in cat['name'].lower() or 'utility' in cat['name'].lower():
+                return cat['id']
+        elif cat['type'] == 'income' and any(keyword in desc_lower for keyword in ['salary', 'payment received', 'sales']):
+            if 'salary' in cat['name'].lower() or 'sales' in cat['name'].lower():
+                return cat['id']
+    return None
+
+class StatementImporter:
+    """
+    Batched import of bank statement rows into one account.
+    Parsed DataFrame chunks are fed to add(); each chunk costs chunked
+    insert_many calls plus one balance $inc per batch, whatever its size.
+    Duplicates are skipped by the unique dedup_hash index, not looked up.
+    """
+
+    def __init__(self, user_id: str, account_id: str, columns: Dict[str, Optional[str]],
+                 categories: List[dict], rule_matcher: "RuleMatcher", chunk_size: int = IMPORT_CHUNK_SIZE,
+                 job: Optional[ImportJob] = None):
+        self.user_id = user_id
+        self.account_id = account_id
+        self.columns = columns
+        self.categories = categories
+        self.rule_matcher = rule_matcher
+        self.chunk_size = max(1, chunk_size)
+        self.job = job
+        self.rows_processed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.empty_rows = 0
+        self._started = time.perf_counter()
+        self._category_by_name: Dict[str, str] = {}
+        for cat in categories:
+            self._category_by_name.setdefault(cat['name'].lower(), cat['id'])
+        self._category_cache: Dict[tuple, Optional[str]] = {}
+        # Content hashes seen earlier in this file
+        self._file_hashes: set = set()
+
+    def categorize(self, description: str, group: Optional[str]) -> Optional[str]:
+        """Group column first, then automation rules, then the legacy keyword match"""
+        key = (group, description)
+        if key in self._category_cache:
+            return self._category_cache[key]
+        category_id = None
+        if group is not None:
+            category_id = self._category_by_name.get(group.lower())
+        if not category_id:
+            category_id = self.rule_matcher.match(description)
+        if not category_id:
+            category_id = _legacy_category(self.categories, description.lower())
+        self._category_cache[key] = category_id
+        return category_id
+
+    def prepare(self, df: pd.DataFrame) -> List[dict]:
+        """Turn a statement chunk into transaction documents, skipping rows without an amount"""
+        cols = self.columns
+        zeros = pd.Series(0.0, index=df.index)
+        debit = parse_amount_column(df[cols["debit"]]) if cols["debit"] else zeros
+        credit = parse_amount_column(df[cols["credit"]]) if cols["credit"] else zeros
         
-        # Expected columns: Date, Description, Debit, Credit
-        # Flexible column matching
-        date_col = None
-        desc_col = None
-        debit_col = None
-        credit_col = None
-        balance_col = None
-        group_col = None
-        ledger_col = None
-        account_holder_col = None
-        ref_col = None
-        cheque_col = None
-        notes_col = None
+        has_amount = (debit != 0) | (credit != 0)
+        self.empty_rows += int((~has_amount).sum())
+        df, debit, credit = df[has_amount], debit[has_amount], credit[has_amount]
+        if df.empty:
+            return []
         
-        for col in df.columns:
-            col_lower = col.lower().strip()
-            
-            # Use header_keywords for robust matching
-            if any(k in col_lower for k in header_keywords["Date"]):
-                date_col = col
-            elif any(k in col_lower for k in header_keywords["Particulars"]):
-                desc_col = col
-            elif any(k in col_lower for k in header_keywords["Debit"]):
-                debit_col = col
-            elif any(k in col_lower for k in header_keywords["Credit"]):
-                credit_col = col
-            elif any(k in col_lower for k in header_keywords["Balance"]):
-                balance_col = col
-            elif any(k in col_lower for k in header_keywords["Group"]):
-                group_col = col
-            elif any(k in col_lower for k in header_keywords["Ledger Name"]):
-                ledger_col = col
-            elif any(k in col_lower for k in header_keywords["Account Holder Name"]):
-                account_holder_col = col
-            elif any(k in col_lower for k in header_keywords["Reference"]):
-                ref_col = col
-            elif any(k in col_lower for k in header_keywords["Cheque Number"]):
-                cheque_col = col
-            elif any(k in col_lower for k in header_keywords["Notes"]):
-                notes_col = col
+        is_credit = credit > 0
+        amounts = credit.where(is_credit, debit).tolist()
+        types = ["credit" if c else "debit" for c in is_credit.tolist()]
         
-        if not date_col:
-            raise HTTPException(status_code=400, detail=f"CSV must have a Date column. Found columns: {list(df.columns)}")
-        if not desc_col:
-            raise HTTPException(status_code=400, detail=f"CSV must have a Particulars column. Found columns: {list(df.columns)}")
+        # Statements repeat a handful of dates, so normalise each distinct value once
+        raw_dates = df[cols["date"]].astype(str).str.strip()
+        normalized = {raw: normalize_date(raw) for raw in raw_dates.unique()}
+        date_keys = {d: date_key(d) or 0 for d in set(normalized.values())}
+        dates = raw_dates.map(normalized).tolist()
+        descriptions = df[cols["description"]].astype(str).str.strip().tolist()
+        
+        groups = _text_column(df, cols["group"])
+        ledgers = _text_column(df, cols["ledger"])
+        holders = _text_column(df, cols["account_holder"])
+        refs = _text_column(df, cols["reference"])
+        cheques = _text_column(df, cols["cheque"])
+        notes = _text_column(df, cols["notes"])
+        
+        created_at = datetime.now(timezone.utc).isoformat()
+        docs = []
+        for i in range(len(dates)):
+            metadata = {}
+            if holders[i] is not None:
+                metadata["account_holder"] = holders[i]
+            if ledgers[i]:
+                metadata["ledger_name_legacy"] = ledgers[i]  # keep it for compatibility
+            docs.append({
+                "id": str(uuid.uuid4()),
+                "user_id": self.user_id,
+                "account_id": self.account_id,
+                "date": dates[i],
+                "description": descriptions[i],
+                "amount": float(amounts[i]),
+                "type": types[i],
+                "category_id": self.categorize(descriptions[i], groups[i]),
+                "ledger_name": ledgers[i],
+                "group_name": groups[i],
+                "reference_number": refs[i],
+                "cheque_number": cheques[i],
+                "notes": notes[i],
+                "metadata": metadata or None,
+                "created_at": created_at,
+                # Same ledger fields stamp_ledger_fields derives, from the per-date lookup
+                "txn_date": date_keys[dates[i]],
+                "sort_prio": 1,
+                "dedup_hash": txn_content_hash(dates[i], amounts[i], types[i], descriptions[i]),
+            })
+        return docs
+
+    def _drop_repeats(self, docs: List[dict]) -> List[dict]:
+        # Repeated lines within the file; repeats of stored rows are left to the unique index
+        fresh = []
+        for doc in docs:
+            if doc["dedup_hash"] in self._file_hashes:
+                self.duplicates += 1
+                continue
+            self._file_hashes.add(doc["dedup_hash"])
+            fresh.append(doc)
+        return fresh
+
+    async def _write(self, batch: List[dict]):
+        written, duplicates = await insert_ledger_rows(batch, skip_duplicates=True)
+        self.duplicates += duplicates
+        self.errors += len(batch) - len(written) - duplicates
+        if written:
+            delta = sum(signed_amount(doc) for doc in written)
+            await db.accounts.update_one({"id": self.account_id}, {"$inc": {"balance": delta}})
+            await apply_ledger_changes(self.user_id, added=written)
+            self.imported += len(written)
+        if self.job:
+            await self.job.report(inserted=self.imported, duplicates=self.duplicates, errors=self.errors)
+
+    async def add(self, df: pd.DataFrame):
+        """Import one chunk of statement rows"""
+        self.rows_processed += len(df)
+        docs = self._drop_repeats(self.prepare(df))
+        for i in range(0, len(docs), self.chunk_size):
+            await self._write(docs[i:i + self.chunk_size])
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "count": self.imported,
+            "rows_processed": self.rows_processed,
+            "duplicates_skipped": self.duplicates,
+            "errors": self.errors,
+            "empty_rows_skipped": self.empty_rows,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_processed / elapsed, 1) if elapsed > 0 else None
+        }
+
 
+# ==================== CSV IMPORT ROUTES ====================
+
+async def import_statement_file(contents: bytes, filename: str, current_user: User, job: Optional[ImportJob] = None,
+                                account_id: str = None, force_balance: bool = False):
+    """Import a bank statement into one of the user's accounts"""
+    account = await db.accounts.find_one({"id": account_id, "user_id": current_user.id})
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    try:
+        if filename.lower().endswith('.pdf'):
+            # PDFs are streamed: rows are imported as their pages are decoded
+            found_columns = PDF_STATEMENT_COLUMNS
+            statement_chunks = lambda: stream_pdf_statement(contents)
+        else:
+            df = await run_parser(parse_statement_file, contents, filename)
+            found_columns = list(df.columns)
+            statement_chunks = lambda: _single_frame(df)
         
-        imported_count = 0
-        categories = await db.categories.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
+        # Expected columns: Date, Description, Debit, Credit
+        # Flexible column matching
+        columns = detect_statement_columns(found_columns)
+        if not columns["date"]:
+            raise HTTPException(status_code=400, detail=f"CSV must have a Date column. Found columns: {found_columns}")
+        if not columns["description"]:
+            raise HTTPException(status_code=400, detail=f"CSV must have a Particulars column. Found columns: {found_columns}")
         
         # Log detected columns for debugging
-        logging.info(f"Detected columns - Date: {date_col}, Desc: {desc_col}, Debit: {debit_col}, Credit: {credit_col}, Balance: {balance_col}")
+        logging.info(f"Detected columns - Date: {columns['date']}, Desc: {columns['description']}, Debit: {columns['debit']}, Credit: {columns['credit']}, Balance: {columns['balance']}")
         
         # Balance Verification Logic
-        if balance_col and not force_balance and not df.empty:
-            provided_final = float(df.iloc[-1][balance_col])
-            
-            # Calculate expected delta
-            delta = 0
-            for _, row in df.iterrows():
-                row_debit = float(row[debit_col]) if debit_col and pd.notnull(row[debit_col]) else 0
-                row_credit = float(row[credit_col]) if credit_col and pd.notnull(row[credit_col]) else 0
-                delta += (row_credit - row_debit)
-            
-            expected_final = float(account['balance']) + delta
-            if abs(expected_final - provided_final) > 0.01:
+        if columns["balance"] and not force_balance:
+            # Checked before anything is written; a PDF is decoded twice (totals only, then the
+            # import) rather than held in memory
+            mismatch = await statement_balance_mismatch(statement_chunks(), columns, account['balance'])
+            if mismatch:
                 return JSONResponse(
                     status_code=409,
                     content={
                         "detail": "Balance Mismatch detected in import statement",
-                        "calculated": expected_final,
-                        "provided": provided_final
+                        **mismatch
                     }
                 )
         
-        # Fetch automation rules before the loop for efficiency
-        automation_rules = await db.automation_rules.find({"user_id": current_user.id, "is_active": True}).to_list(100)
-
-        for _, row in df.iterrows():
-            try:
-                date_str = str(row[date_col]).strip()
-                description = str(row[desc_col]).strip()
-                
-                debit = 0
-                credit = 0
-                
-                if debit_col and pd.notna(row.get(debit_col)):
-                    debit_val = str(row[debit_col]).strip().replace(',', '')
-                    if debit_val and debit_val != '':
-                        try:
-                            debit = float(debit_val)
-                        except:
-                            logging.warning(f"Could not parse debit value: {debit_val}")
-                
-                if credit_col and pd.notna(row.get(credit_col)):
-                    credit_val = str(row[credit_col]).strip().replace(',', '')
-                    if credit_val and credit_val != '':
-                        try:
-                            credit = float(credit_val)
-                        except:
-                            logging.warning(f"Could not parse credit value: {credit_val}")
-                
-                if debit == 0 and credit == 0:
-                    logging.debug(f"Skipping row - both debit and credit are 0: {description}")
-                    continue
-                
-                # Auto-categorize based on Group column if available, else keywords
-                category_id = None
-                
-                # Fetch automation rules before the loop for efficiency
-
-                if group_col and pd.notna(row.get(group_col)):
-                    group_val = str(row[group_col]).lower().strip()
-                    for cat in categories:
-                        if cat['name'].lower() == group_val:
-                            category_id = cat['id']
-                            break
-                            
-                if not category_id:
-                    desc_lower = description.lower()
-                    for rule in automation_rules:
-                        if rule['keyword'].lower() in desc_lower:
-                            category_id = rule['category_id']
-                            break
-                
-                # Fallback to simple hardcoded match if still no category (legacy support)
-                if not category_id:
-                    desc_lower = description.lower()
-                    for cat in categories:
-                        if cat['type'] == 'expense' and any(keyword in desc_lower for keyword in ['rent', 'utilities', 'electricity', 'water']):
-                            if 'rent' in cat['name'].lower() or 'utility' in cat['name'].lower():
-                                category_id = cat['id']
-                                break
-                        elif cat['type'] == 'income' and any(keyword in desc_lower for keyword in ['salary', 'payment received', 'sales']):
-                            if 'salary' in cat['name'].lower() or 'sales' in cat['name'].lower():
-                                category_id = cat['id']
-                                break
-                
-                transaction_type = "credit" if credit > 0 else "debit"
-                amount = float(credit) if credit > 0 else float(debit)
-                
-                ledger_name = None
-                if ledger_col and pd.notna(row.get(ledger_col)):
-                    ledger_name = str(row[ledger_col]).strip()
-                
-                group_name = None
-                if group_col and pd.notna(row.get(group_col)):
-                    group_name = str(row[group_col]).strip()
-                
-                ref_no = None
-                if ref_col and pd.notna(row.get(ref_col)):
-                    ref_no = str(row[ref_col]).strip()
-                
-                cheque_no = None
-                if cheque_col and pd.notna(row.get(cheque_col)):
-                    cheque_no = str(row[cheque_col]).strip()
-
-                txn_notes = None
-                if notes_col and pd.notna(row.get(notes_col)):
-                    txn_notes = str(row[notes_col]).strip()
-
-                metadata = {}
-                if account_holder_col and pd.notna(row.get(account_holder_col)):
-                    metadata["account_holder"] = str(row[account_holder_col]).strip()
-                if ledger_name: metadata["ledger_name_legacy"] = ledger_name # keep it for compatibility
-
-                txn_kwargs = {
-                    "user_id": current_user.id,
-                    "account_id": account_id,
-                    "date": normalize_date(date_str),
-                    "description": description,
-                    "amount": amount,
-                    "type": transaction_type,
-                    "category_id": category_id,
-                    "ledger_name": ledger_name,
-                    "group_name": group_name,
-                    "reference_number": ref_no,
-                    "cheque_number": cheque_no,
-                    "notes": txn_notes,
-                    "metadata": metadata if metadata else None
-                }
-                transaction = Transaction(**txn_kwargs)
-                
-                if transaction.date:
-                    transaction.date = normalize_date(transaction.date)
-                
-                # Check for duplicates
-                existing = await db.transactions.find_one({
-                    "user_id": current_user.id,
-                    "account_id": txn_kwargs["account_id"],
-                    "date": transaction.date,
-                    "amount": txn_kwargs["amount"],
-                    "type": txn_kwargs["type"],
-                    "description": txn_kwargs["description"]
-                })
-                if existing:
-                    logging.info(f"Skipping duplicate transaction: {description}")
-                    continue
-                
-                transaction_dict = transaction.model_dump()
-                transaction_dict['created_at'] = transaction_dict['created_at'].isoformat()
-                
-                await db.transactions.insert_one(transaction_dict)
-                
-                # Update account balance
-                if transaction_type == "credit":
-                    await db.accounts.update_one(
-                        {"id": account_id},
-                        {"$inc": {"balance": amount}}
-                    )
-                else:
-                    await db.accounts.update_one(
-                        {"id": account_id},
-                        {"$inc": {"balance": -amount}}
-                    )
-                
-                imported_count += 1
-            except Exception as e:
-                logging.error(f"Error importing row: {e}")
-                continue
+        categories = await db.categories.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
+        rule_matcher = await get_rule_matcher(current_user.id)
+        
+        importer = StatementImporter(current_user.id, account_id, columns, categories, rule_matcher, job=job)
+        async for chunk in statement_chunks():
+            if job:
+                await job.report(rows_parsed=importer.rows_processed + len(chunk))
+            await importer.add(chunk)
+        if filename.lower().endswith('.pdf') and not importer.rows_processed:
+            raise ValueError(PDF_NO_TRANSACTIONS)
+        result = importer.summary()
+        logging.info(f"Statement import into {account_id}: {result}")
         
         return {
-            "message": f"Successfully imported {imported_count} transactions",
-            "count": imported_count
+            "message": f"Successfully imported {result['count']} transactions",
+            **result
         }
     
     except Exception as e:
         logging.error(f"Error processing CSV: {e}")
         raise HTTPException(status_code=400, detail=f"Error processing CSV: {str(e)}")
 
+@api_router.post("/import/csv")
+async def import_csv(
+    file: UploadFile = File(...),
+    account_id: str = None,
+    force_balance: bool = False,
+    background: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    if not file.filename.lower().endswith(('.csv', '.pdf', '.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Only CSV, Excel, and PDF files are supported")
+    
+    if not account_id:
+        raise HTTPException(status_code=400, detail="Account ID is required")
+    
+    # Verify account belongs to user
+    account = await db.accounts.find_one({"id": account_id, "user_id": current_user.id})
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    contents = await file.read()
+    return await submit_import(
+        "statement", import_statement_file, contents, file.filename, current_user, background,
+        account_id=account_id, force_balance=force_balance
+    )
+
+@api_router.get("/import/jobs/{job_id}")
+async def get_import_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await db.import_jobs.find_one({"id": job_id, "user_id": current_user.id}, {"_id": 0})
+    if not job:
+        raise NotFoundError("Import job")
+    
+    if job["status"] in ("queued", "running"):
+        last_seen = datetime.fromisoformat(job["updated_at"])
+        if (datetime.now(timezone.utc) - last_seen).total_seconds() > IMPORT_JOB_STALE_SECONDS:
+            job["status"] = "failed"
+            job["error"] = "Import was interrupted before it finished. Please upload the file again."
+            await db.import_jobs.update_one({"id": job_id}, {"$set": {"status": job["status"], "error": job["error"]}})
+    return job
+
 
 # ==================== REPORTS ROUTES ====================
 
 @api_router.get("/reports/summary")
 async def get_summary_report(current_user: User = Depends(get_current_user)):
     # Exclude opening balance transactions from reports
-    transactions = await db.transactions.find(
-        {"user_id": current_user.id, "type": {"$ne": "opening"}}, 
-        {"_id": 0}
-    ).to_list(10000)
+    rollups = await monthly_rollups(current_user.id, {"type": {"$ne": "opening"}})
     
-    total_income = sum(t['amount'] for t in transactions if t['type'] == 'credit')
-    total_expense = sum(t['amount'] for t in transactions if t['type'] == 'debit')
+    total_income = sum(r['total'] for r in rollups if r['type'] == 'credit')
+    total_expense = sum(r['total'] for r in rollups if r['type'] == 'debit')
     net_balance = total_income - total_expense
     
     return {
         "total_income": total_income,
         "total_expense": total_expense,
         "net_balance": net_balance,
-        "transaction_count": len(transactions)
+        "transaction_count": sum(r['count'] for r in rollups)
     }
 
 @api_router.get("/reports/category-breakdown")
 async def get_category_breakdown(current_user: User = Depends(get_current_user)):
-    transactions = await db.transactions.find({"user_id": current_user.id}, {"_id": 0}).to_list(10000)
+    rollups = await monthly_rollups(current_user.id, {"category_id": {"$ne": None}})
     categories = await db.categories.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
     
     category_map = {cat['id']: cat for cat in categories}
     
     breakdown = {}
     
-    for txn in transactions:
-        cat_id = txn.get('category_id')
-        if cat_id and cat_id in category_map:
+    for rollup in rollups:
+        cat_id = rollup['category_id']
+        if cat_id in category_map:
             cat_name = category_map[cat_id]['name']
             if cat_name not in breakdown:
                 breakdown[cat_name] = {
@@ -3344,39 +4468,27 @@ async def get_category_breakdown(current_user: User = Depends(get_current_user))
                     "total": 0,
                     "count": 0
                 }
-            breakdown[cat_name]['total'] += txn['amount']
-            breakdown[cat_name]['count'] += 1
+            breakdown[cat_name]['total'] += rollup['total']
+            breakdown[cat_name]['count'] += rollup['count']
     
     return list(breakdown.values())
 
 @api_router.get("/reports/monthly-trend")
 async def get_monthly_trend(current_user: User = Depends(get_current_user)):
-    transactions = await db.transactions.find({"user_id": current_user.id, "type": {"$ne": "opening"}}, {"_id": 0}).to_list(10000)
+    # Rows whose date could not be parsed (yyyymm 0) have no month to go in
+    rollups = await monthly_rollups(current_user.id, {"type": {"$ne": "opening"}, "yyyymm": {"$gt": 0}})
     
     monthly_data = {}
     
-    for txn in transactions:
-        try:
-            # Parse different date formats
-            date_str = txn['date']
-            if '-' in date_str:
-                parts = date_str.split('-')
-                if len(parts[0]) == 4:  # YYYY-MM-DD
-                    month_key = f"{parts[0]}-{parts[1]}"
-                else:  # DD-MM-YYYY
-                    month_key = f"{parts[2]}-{parts[1]}"
-            else:
-                continue
-            
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {"month": month_key, "income": 0, "expense": 0}
-            
-            if txn['type'] == 'credit':
-                monthly_data[month_key]['income'] += txn['amount']
-            else:
-                monthly_data[month_key]['expense'] += txn['amount']
-        except:
-            continue
+    for rollup in rollups:
+        month_key = f"{rollup['yyyymm'] // 100:04d}-{rollup['yyyymm'] % 100:02d}"
+        if month_key not in monthly_data:
+            monthly_data[month_key] = {"month": month_key, "income": 0, "expense": 0}
+        
+        if rollup['type'] == 'credit':
+            monthly_data[month_key]['income'] += rollup['total']
+        else:
+            monthly_data[month_key]['expense'] += rollup['total']
     
     return sorted(monthly_data.values(), key=lambda x: x['month'])
 
@@ -3388,16 +4500,19 @@ async def get_balance_sheet(
     if not as_of_date:
         as_of_date = datetime.now().strftime('%d-%m-%Y')
     
-    # Utility to compare dates
-    def get_date_obj(date_str):
-        try: return datetime.strptime(date_str, '%d-%m-%Y')
-        except: return datetime.min
-        
-    as_of_obj = get_date_obj(as_of_date)
-    
-    # Fetch accounts & transactions
+    # Fetch accounts, their balances as of the date & income/expense totals up to the date
+    as_of_key = date_key(as_of_date) or 0
     accounts = await db.accounts.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
-    transactions = await db.transactions.find({"user_id": current_user.id}, {"_id": 0}).to_list(100000)
+    snapshots = await balances_as_of(current_user.id, [acc["id"] for acc in accounts], as_of_key)
+    type_totals = await db.transactions.aggregate([
+        {"$match": {
+            "user_id": current_user.id,
+            "txn_date": {"$lte": as_of_key},
+            "type": {"$in": ["credit", "debit"]}
+        }},
+        {"$group": {"_id": "$type", "total": {"$sum": "$amount"}}}
+    ]).to_list(None)
+    type_totals = {row["_id"]: row["total"] for row in type_totals}
     
     # Structure for response
     results = {
@@ -3428,18 +4543,7 @@ async def get_balance_sheet(
     
     # 1. Calculate Account Balances as of Date
     for acc in accounts:
-        # Start with opening balance
-        balance = acc.get('opening_balance', 0)
-        
-        # Add historical transactions up to as_of_date
-        acc_txns = [t for t in transactions if t['account_id'] == acc['id'] and get_date_obj(t['date']) <= as_of_obj and t['type'] != 'opening']
-        
-        for txn in acc_txns:
-            if txn['type'] == 'credit':
-                balance += txn['amount']
-            else:
-                balance -= txn['amount']
-                
+        balance = snapshot_balance(acc, snapshots)
         account_entry = {"name": acc['account_name'], "balance": balance, "bank": acc.get('bank_name')}
         
         # Categorize by type
@@ -3460,9 +4564,8 @@ async def get_balance_sheet(
     results["liabilities"]["total_liabilities"] = results["liabilities"]["current_liabilities"]["total"]
     
     # 2. Calculate Equity (Net Income = Total Income - Total Expense up to date)
-    relevant_txns = [t for t in transactions if get_date_obj(t['date']) <= as_of_obj and t['type'] != 'opening']
-    total_income = sum(t['amount'] for t in relevant_txns if t['type'] == 'credit')
-    total_expense = sum(t['amount'] for t in relevant_txns if t['type'] == 'debit')
+    total_income = type_totals.get('credit', 0)
+    total_expense = type_totals.get('debit', 0)
     
     results["equity"]["net_income"] = total_income - total_expense
     results["equity"]["retained_earnings"] = results["equity"]["net_income"]
@@ -3476,145 +4579,346 @@ async def get_balance_sheet(
     
     return results
 
+def _cash_flow_items(rows: List[dict], cat_map: Dict[str, dict]) -> List[dict]:
+    """Operating activity lines from (category_id, type) totals, merged by category name"""
+    op_items = {}
+    for row in rows:
+        cat = cat_map.get(row['_id']['category_id'])
+        txn_type = row['_id']['type']
+        name = cat['name'] if cat else ("Other Income" if txn_type == 'credit' else "Other Expense")
+        
+        if name not in op_items:
+            op_items[name] = {"name": name, "category_type": cat['type'] if cat else txn_type, "amount": 0}
+        
+        if txn_type == 'credit': op_items[name]['amount'] += row['total']
+        else: op_items[name]['amount'] -= row['total']
+    return list(op_items.values())
+
+def _cash_flow_statement(date_from: str, date_to: str, items: List[dict], opening_cash: float) -> dict:
+    net_operating = sum(i['amount'] for i in items)
+    return {
+        "period": {"from": date_from, "to": date_to},
+        "operating_activities": {
+            "items": items,
+            "net_cash": net_operating
+        },
+        "investing_activities": {"items": [], "net_cash": 0, "note": "Asset tracking not yet implemented"},
+        "financing_activities": {"items": [], "net_cash": 0, "note": "Loan tracking not yet implemented"},
+        "net_change_in_cash": net_operating,
+        "opening_cash_balance": opening_cash,
+        "closing_cash_balance": opening_cash + net_operating
+    }
+
+def _month_ranges(from_key: int, to_key: int) -> List[tuple]:
+    """(yyyymm, first day key, last day key) for each calendar month in the range, clipped to it"""
+    months = []
+    year, month = from_key // 10000, from_key // 100 % 100
+    while year * 100 + month <= to_key // 100:
+        yyyymm = year * 100 + month
+        months.append((yyyymm, max(yyyymm * 100 + 1, from_key), min(month_end_key(yyyymm), to_key)))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
 @api_router.get("/reports/cash-flow")
 async def get_cash_flow(
     date_from: Optional[str] = None,  # DD-MM-YYYY
     date_to: Optional[str] = None,    # DD-MM-YYYY
+    fiscal_year: Optional[int] = None,  # e.g. 2024 for Apr 2024 - Mar 2025
+    monthly: bool = False,
     current_user: User = Depends(get_current_user)
 ):
     # Default to current Indian Fiscal Year (Apr 1 - Mar 31)
     today = datetime.now()
-    if not date_from or not date_to:
-        if today.month < 4:
-            df = f"01-04-{today.year - 1}"
-            dt = f"31-03-{today.year}"
-        else:
-            df = f"01-04-{today.year}"
-            dt = f"31-03-{today.year + 1}"
-        date_from = date_from or df
-        date_to = date_to or dt
-
-    def get_date_obj(date_str):
-        try: return datetime.strptime(date_str, '%d-%m-%Y')
-        except: return datetime.min
+    if fiscal_year is None:
+        fiscal_year = today.year - 1 if today.month < 4 else today.year
+    date_from = date_from or f"01-04-{fiscal_year}"
+    date_to = date_to or f"31-03-{fiscal_year + 1}"
 
-    from_obj = get_date_obj(date_from)
-    to_obj = get_date_obj(date_to)
+    from_key = date_key(date_from) or 0
+    to_key = date_key(date_to) or 0
 
     # 1. Fetch Data
     accounts = await db.accounts.find({"user_id": current_user.id, "account_type": {"$in": ["Bank", "Cash"]}}, {"_id": 0}).to_list(1000)
-    transactions = await db.transactions.find({"user_id": current_user.id}, {"_id": 0}).to_list(100000)
+    account_ids = [a['id'] for a in accounts]
     categories = await db.categories.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
     cat_map = {c['id']: c for c in categories}
 
-    # 2. Opening Cash Balance (Bank + Cash accounts only)
-    opening_cash = 0
-    account_ids = [a['id'] for a in accounts]
-    
-    for acc in accounts:
-        bal = acc.get('opening_balance', 0)
-        # Add credits/debits before date_from
-        historical = [t for t in transactions if t['account_id'] == acc['id'] and get_date_obj(t['date']) < from_obj and t['type'] != 'opening']
-        for txn in historical:
-            if txn['type'] == 'credit': bal += txn['amount']
-            else: bal -= txn['amount']
-        opening_cash += bal
-
-    # 3. Operating Activities (categorized income/expense within range)
-    op_items = {}
-    range_txns = [t for t in transactions if t['account_id'] in account_ids and from_obj <= get_date_obj(t['date']) <= to_obj and t['type'] != 'opening']
-    
-    for txn in range_txns:
-        cat_id = txn.get('category_id')
-        cat = cat_map.get(cat_id)
-        name = cat['name'] if cat else ("Other Income" if txn['type'] == 'credit' else "Other Expense")
-        
-        if name not in op_items:
-            op_items[name] = {"name": name, "category_type": cat['type'] if cat else txn['type'], "amount": 0}
-        
-        amt = txn['amount']
-        if txn['type'] == 'credit': op_items[name]['amount'] += amt
-        else: op_items[name]['amount'] -= amt
+    # 2. Operating Activities: income/expense within range per category, type and month
+    rows = await db.transactions.aggregate([
+        {"$match": {
+            "user_id": current_user.id,
+            "account_id": {"$in": account_ids},
+            "type": {"$ne": "opening"},
+            "txn_date": {"$gte": from_key, "$lte": to_key}
+        }},
+        {"$group": {
+            "_id": {"category_id": {"$ifNull": ["$category_id", None]}, "type": "$type", "yyyymm": YYYYMM_EXPR},
+            "total": {"$sum": "$amount"}
+        }}
+    ]).to_list(None)
+
+    def items_between(start_yyyymm: int, end_yyyymm: int) -> List[dict]:
+        totals = {}
+        for row in rows:
+            if start_yyyymm <= row['_id']['yyyymm'] <= end_yyyymm:
+                key = (row['_id']['category_id'], row['_id']['type'])
+                totals[key] = totals.get(key, 0) + row['total']
+        return _cash_flow_items(
+            [{"_id": {"category_id": cid, "type": t}, "total": total} for (cid, t), total in totals.items()],
+            cat_map
+        )
 
-    net_operating = sum(i['amount'] for i in op_items.values())
+    # 3. Opening Cash Balance (Bank + Cash accounts only), as of the day before each period
+    months = _month_ranges(from_key, to_key) if monthly and from_key and to_key else []
+    period_starts = [from_key] + [start for _, start, _ in months]
+    balances = await asyncio.gather(*(balances_as_of(current_user.id, account_ids, start - 1) for start in period_starts))
+    opening_cash = [sum(snapshot_balance(acc, snapshots) for acc in accounts) for snapshots in balances]
+
+    result = _cash_flow_statement(date_from, date_to, items_between(0, LATEST_DATE_KEY), opening_cash[0])
+    if monthly:
+        result["periods"] = [
+            {
+                "month": f"{yyyymm // 100:04d}-{yyyymm % 100:02d}",
+                **_cash_flow_statement(
+                    key_date(start), key_date(end), items_between(yyyymm, yyyymm), opening
+                )
+            }
+            for (yyyymm, start, end), opening in zip(months, opening_cash[1:])
+        ]
+    return result
 
-    return {
-        "period": {"from": date_from, "to": date_to},
-        "operating_activities": {
-            "items": list(op_items.values()),
-            "net_cash": net_operating
-        },
-        "investing_activities": {"items": [], "net_cash": 0, "note": "Asset tracking not yet implemented"},
-        "financing_activities": {"items": [], "net_cash": 0, "note": "Loan tracking not yet implemented"},
-        "net_change_in_cash": net_operating,
-        "opening_cash_balance": opening_cash,
-        "closing_cash_balance": opening_cash + net_operating
-    }
+def gst_period(year: int, month: Optional[int] = None, quarter: Optional[int] = None) -> tuple:
+    """
+    (label, first day key, last day key) of a GST return period: a calendar month,
+    a quarter of the April-March fiscal year starting in `year`, or that whole fiscal year.
+    """
+    if month is not None:
+        if not 1 <= month <= 12:
+            raise ValidationError("month must be between 1 and 12", "INVALID_PERIOD")
+        yyyymm = year * 100 + month
+        return f"{str(month).zfill(2)}/{year}", yyyymm * 100 + 1, month_end_key(yyyymm)
+    if quarter is not None:
+        if not 1 <= quarter <= 4:
+            raise ValidationError("quarter must be between 1 and 4", "INVALID_PERIOD")
+        first = (year + (quarter == 4)) * 100 + (quarter * 3 + 1) % 12
+        return f"Q{quarter} FY{year}-{str(year + 1)[-2:]}", first * 100 + 1, month_end_key(first + 2)
+    return f"FY{year}-{str(year + 1)[-2:]}", year * 10000 + 401, (year + 1) * 10000 + 331
 
 @api_router.get("/reports/gst-summary")
-async def get_gst_summary(month: int, year: int, current_user: User = Depends(get_current_user)):
-    match_pattern = f"-{str(month).zfill(2)}-{year}"
+async def get_gst_summary(
+    year: int,
+    month: Optional[int] = None,
+    quarter: Optional[int] = None,  # 1-4 of the fiscal year starting April `year`
+    current_user: User = Depends(get_current_user)
+):
+    """
+    GSTR-1 / GSTR-3B summary for a month, a fiscal quarter or (with neither) a fiscal year.
+    """
+    period, from_key, to_key = gst_period(year, month, quarter)
     
-    invoices = await db.invoices.find({
-        "user_id": current_user.id,
-        "invoice_date": {"$regex": match_pattern},
-        "status": {"$in": ["paid", "sent", "overdue"]}
-    }).to_list(1000)
-
-    total_output_gst = 0
-    total_taxable_sales = 0
+    # 1. Outward supplies: invoice totals plus the stored HSN summaries by rate, HSN and supply type
+    tax_part = lambda field: {"$ifNull": [f"$hsn_summary.{field}", 0]}
+    has_split = {"$gt": [{"$add": [tax_part("cgst_amount"), tax_part("sgst_amount"), tax_part("igst_amount")]}, 0]}
+    inter_state = {"$gt": [{"$ifNull": ["$igst_total", 0]}, 0]}
+    line_tax = tax_part("total_tax")
     
-    for inv in invoices:
-        tax_amt = inv.get('total_tax', 0)
-        total_output_gst += tax_amt
-        # Taxable value = subtotal
-        total_taxable_sales += inv.get('subtotal', 0)
+    facets = await db.invoices.aggregate([
+        {"$match": {
+            "user_id": current_user.id,
+            "invoice_date_key": {"$gte": from_key, "$lte": to_key},
+            "status": {"$in": ["paid", "sent", "overdue"]}
+        }},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "taxable": {"$sum": {"$ifNull": ["$subtotal", 0]}},
+                "tax": {"$sum": {"$ifNull": ["$total_tax", 0]}},
+                "count": {"$sum": 1}
+            }}],
+            "breakdown": [
+                {"$unwind": "$hsn_summary"},
+                # Summaries written by the bulk import only carry total_tax; split it by supply type
+                {"$project": {
+                    "invoice_id": "$_id",
+                    "tax_rate": "$hsn_summary.tax_rate",
+                    "hsn_sac": "$hsn_summary.hsn_sac",
+                    "inter_state": inter_state,
+                    "taxable_value": {"$ifNull": ["$hsn_summary.taxable_value", 0]},
+                    "cgst": {"$cond": [has_split, tax_part("cgst_amount"), {"$cond": [inter_state, 0, {"$divide": [line_tax, 2]}]}]},
+                    "sgst": {"$cond": [has_split, tax_part("sgst_amount"), {"$cond": [inter_state, 0, {"$divide": [line_tax, 2]}]}]},
+                    "igst": {"$cond": [has_split, tax_part("igst_amount"), {"$cond": [inter_state, line_tax, 0]}]}
+                }},
+                {"$group": {
+                    "_id": {"tax_rate": "$tax_rate", "hsn_sac": "$hsn_sac", "inter_state": "$inter_state"},
+                    "taxable_value": {"$sum": "$taxable_value"},
+                    "cgst": {"$sum": "$cgst"},
+                    "sgst": {"$sum": "$sgst"},
+                    "igst": {"$sum": "$igst"},
+                    "invoices": {"$addToSet": "$invoice_id"}
+                }},
+                {"$sort": {"_id.tax_rate": 1, "_id.hsn_sac": 1, "_id.inter_state": 1}}
+            ]
+        }}
+    ], allowDiskUse=True).to_list(None)
+    totals = (facets[0]["totals"] or [{}])[0] if facets else {}
+    breakdown = facets[0]["breakdown"] if facets else []
+    
+    total_output_gst = totals.get("tax", 0)
+    total_taxable_sales = totals.get("taxable", 0)
+    
+    rows = []
+    rate_totals = {}
+    for row in breakdown:
+        key = row["_id"]
+        entry = {
+            "tax_rate": key["tax_rate"],
+            "hsn_sac": key["hsn_sac"],
+            "supply_type": "inter_state" if key["inter_state"] else "intra_state",
+            "taxable_value": round(row["taxable_value"], 2),
+            "cgst": round(row["cgst"], 2),
+            "sgst": round(row["sgst"], 2),
+            "igst": round(row["igst"], 2),
+            "total_tax": round(row["cgst"] + row["sgst"] + row["igst"], 2),
+            "invoice_count": len(row["invoices"])
+        }
+        rows.append(entry)
+        by_rate = rate_totals.setdefault(key["tax_rate"], {"tax_rate": key["tax_rate"], "taxable_value": 0, "cgst": 0, "sgst": 0, "igst": 0})
+        for field in ("taxable_value", "cgst", "sgst", "igst"):
+            by_rate[field] = round(by_rate[field] + entry[field], 2)
         
     # 2. Calculate Input Tax Credit (ITC - Expenses)
-    # Filter for 'Expense' categories for better accuracy if possible
-    transactions = await db.transactions.find({
-        "user_id": current_user.id,
-        "date": {"$regex": match_pattern},
-        "type": "debit"
-    }).to_list(10000)
-    
-    total_taxable_purchases = 0
-    total_itc = 0
+    # Debits carry their GST in metadata.gst_amount; otherwise assume 18% GST inclusive
+    # Amount = Base + 18% Base = 1.18 * Base, Tax = Amount - (Amount / 1.18)
+    gst_amount = {"$ifNull": ["$metadata.gst_amount", None]}
+    itc_rows = await db.transactions.aggregate([
+        {"$match": {
+            "user_id": current_user.id,
+            "txn_date": {"$gte": from_key, "$lte": to_key},
+            "type": "debit"
+        }},
+        {"$group": {
+            "_id": None,
+            "amount": {"$sum": {"$ifNull": ["$amount", 0]}},
+            "itc": {"$sum": {"$cond": [
+                {"$ne": [gst_amount, None]},
+                {"$toDouble": gst_amount},
+                {"$subtract": ["$amount", {"$divide": ["$amount", 1.18]}]}
+            ]}}
+        }}
+    ]).to_list(None)
+    itc_totals = itc_rows[0] if itc_rows else {}
+    total_itc = itc_totals.get("itc", 0)
+    total_taxable_purchases = itc_totals.get("amount", 0) - total_itc
     
-    for txn in transactions:
-        # For prototype: Assume 18% GST if not specified in metadata
-        amt = txn.get('amount', 0)
-        metadata = txn.get('metadata', {})
-        
-        gst_amt = metadata.get('gst_amount')
-        if gst_amt is not None:
-            itc = float(gst_amt)
-        else:
-            # Reverse calculate from 18%
-            # Amount = Base + 18% Base = 1.18 * Base
-            # Tax = Amount - (Amount / 1.18)
-            itc = amt - (amt / 1.18)
-            
-        total_itc += itc
-        total_taxable_purchases += (amt - itc)
-        
-    month_str = str(month).zfill(2)
-    year_str = str(year)
     return {
-        "period": f"{month_str}/{year_str}",
+        "period": period,
+        "date_range": {"from": key_date(from_key), "to": key_date(to_key)},
         "gstr1": {
             "total_taxable_value": round(total_taxable_sales, 2),
             "total_gst_collected": round(total_output_gst, 2),
-            "invoice_count": len(invoices)
+            "invoice_count": totals.get("count", 0),
+            "rate_wise": list(rate_totals.values()),
+            "hsn_summary": rows
         },
         "gstr3b": {
             "output_tax": round(total_output_gst, 2),
             "input_tax_credit": round(total_itc, 2),
+            "taxable_purchases": round(total_taxable_purchases, 2),
             "net_gst_payable": round(max(0, total_output_gst - total_itc), 2),
             "excess_itc": round(max(0, total_itc - total_output_gst), 2)
         }
     }
 
+# ==================== AUTOMATION RULE MATCHER ====================
+
+class RuleMatcher:
+    """
+    Aho-Corasick automaton over the lower-cased keywords of a user's active rules.
+    match() returns the category of the first rule, in rule order, whose keyword occurs
+    in the text - the same answer as testing each rule with `in` - in a single pass
+    over the text, however many rules there are.
+    """
+
+    NO_MATCH = float("inf")
+    # Up to this many rules, C-level `in` tests over pre-lowered keywords beat a Python-level scan
+    LINEAR_MAX_RULES = 32
+
+    def __init__(self, rules: List[dict]):
+        self.categories = [rule['category_id'] for rule in rules]
+        self.keywords = [rule['keyword'].lower() for rule in rules] if len(rules) <= self.LINEAR_MAX_RULES else None
+        # An empty keyword is contained in every text
+        self.always = min((i for i, rule in enumerate(rules) if not rule['keyword']), default=self.NO_MATCH)
+        
+        # Trie of keywords; best[node] is the earliest rule whose keyword ends at node
+        goto: List[Dict[str, int]] = [{}]
+        best: List[float] = [self.NO_MATCH]
+        for i, rule in enumerate(rules):
+            if not rule['keyword'] or i > self.always:
+                continue
+            node = 0
+            for ch in rule['keyword'].lower():
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    best.append(self.NO_MATCH)
+                node = nxt
+            best[node] = min(best[node], i)
+        
+        # Breadth-first: failure links, inherited matches and the full transition table
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            best[node] = min(best[node], best[fail[node]])
+            delta[node] = {**delta[fail[node]], **goto[node]}
+            for ch, child in goto[node].items():
+                fail[child] = delta[fail[node]].get(ch, 0)
+                queue.append(child)
+        self.delta = delta
+        self.best = best
+
+    def __len__(self):
+        return len(self.categories)
+
+    def match(self, text: str) -> Optional[str]:
+        if self.keywords is not None:
+            text = text.lower()
+            for keyword, category_id in zip(self.keywords, self.categories):
+                if keyword in text:
+                    return category_id
+            return None
+        first = self.always
+        if first == 0:
+            return self.categories[0]
+        delta, best = self.delta, self.best
+        node = 0
+        for ch in text.lower():
+            node = delta[node].get(ch, 0)
+            if best[node] < first:
+                first = best[node]
+                if first == 0:
+                    break
+        return None if first == self.NO_MATCH else self.categories[first]
+
+rule_matcher_cache = TTLCache(USER_CACHE_MAX_SIZE, RULE_MATCHER_CACHE_TTL_SECONDS)
+
+async def get_rule_matcher(user_id: str) -> RuleMatcher:
+    matcher = rule_matcher_cache.get(user_id)
+    if matcher is None:
+        rules = await db.automation_rules.find(
+            {"user_id": user_id, "is_active": True}, {"_id": 0, "keyword": 1, "category_id": 1}
+        ).to_list(None)
+        matcher = RuleMatcher(rules)
+        rule_matcher_cache.set(user_id, matcher)
+    return matcher
+
+def invalidate_rule_matcher(user_id: str):
+    """Drop the compiled matcher; call after any change to the user's automation rules"""
+    rule_matcher_cache.invalidate(user_id)
+
 # ==================== AUDIT & AUTOMATION ROUTES ====================
 
 @api_router.get("/audit-logs", response_model=List[AuditLog])
@@ -3636,13 +4940,14 @@ async def create_automation_rule(rule_data: AutomationRuleCreate, current_user:
     rule_dict = rule.model_dump()
     rule_dict['created_at'] = rule_dict['created_at'].isoformat()
     await db.automation_rules.insert_one(rule_dict)
+    invalidate_rule_matcher(current_user.id)
     
     await log_action(current_user.id, "create", "automation_rule", f"Created rule for keyword: {rule.keyword}")
     return rule
 
 @api_router.get("/automation-rules", response_model=List[AutomationRule])
 async def get_automation_rules(current_user: User = Depends(get_current_user)):
-    rules = await db.automation_rules.find({"user_id": current_user.id}).to_list(100)
+    rules = await db.automation_rules.find({"user_id": current_user.id}).to_list(None)
     for r in rules:
         r.pop("_id", None)
         if isinstance(r.get('created_at'), str):
@@ -3652,55 +4957,174 @@ async def get_automation_rules(current_user: User = Depends(get_current_user)):
 @api_router.delete("/automation-rules/{rule_id}")
 async def delete_automation_rule(rule_id: str, current_user: User = Depends(get_current_user)):
     await db.automation_rules.delete_one({"id": rule_id, "user_id": current_user.id})
+    invalidate_rule_matcher(current_user.id)
     await log_action(current_user.id, "delete", "automation_rule", f"Deleted rule: {rule_id}")
     return {"message": "Rule deleted"}
 
-@api_router.post("/automation-rules/apply-bulk")
-async def bulk_apply_rules(current_user: User = Depends(get_current_user)):
-    rules = await db.automation_rules.find({"user_id": current_user.id, "is_active": True}).to_list(100)
-    if not rules:
+async def apply_automation_rules(current_user: User, job: Optional[ImportJob] = None,
+                                 batch_size: int = IMPORT_CHUNK_SIZE):
+    """
+    Categorise every uncategorised transaction that an active rule matches. Transactions are
+    streamed in batches; each batch is written as one bulk_write of update_many calls (one per
+    target category, on an $in list of ids that are still uncategorised).
+    """
+    matcher = await get_rule_matcher(current_user.id)
+    if not len(matcher):
         return {"message": "No active rules found"}
     
-    # Fetch past uncategorized transactions
-    transactions = await db.transactions.find({
-        "user_id": current_user.id, 
-        "category_id": None
-    }).to_list(5000)
-    
+    cursor = db.transactions.find(
+        {"user_id": current_user.id, "category_id": None},
+        {"_id": 0, "id": 1, "description": 1, "account_id": 1, "txn_date": 1, "type": 1, "amount": 1, "category_id": 1},
+        batch_size=batch_size
+    )
+    matches: Dict[str, Optional[str]] = {}  # description -> category, memoised across batches
+    scanned = 0
     updated_count = 0
-    for txn in transactions:
-        desc_lower = txn['description'].lower()
-        for rule in rules:
-            if rule['keyword'].lower() in desc_lower:
-                await db.transactions.update_one(
-                    {"id": txn['id']},
-                    {"$set": {"category_id": rule['category_id']}}
-                )
-                updated_count += 1
-                break
-                
+    
+    async def flush(batch: List[dict]):
+        nonlocal updated_count
+        by_category: Dict[str, List[dict]] = {}
+        for txn in batch:
+            description = txn.get('description') or ''
+            if description not in matches:
+                matches[description] = matcher.match(description)
+            if matches[description]:
+                by_category.setdefault(matches[description], []).append(txn)
+        if by_category:
+            result = await db.transactions.bulk_write([
+                UpdateMany(
+                    {"user_id": current_user.id, "id": {"$in": [t['id'] for t in txns]}, "category_id": None},
+                    {"$set": {"category_id": category_id}}
+                ) for category_id, txns in by_category.items()
+            ], ordered=False)
+            if result.modified_count < sum(len(txns) for txns in by_category.values()):
+                # Rows categorised elsewhere since the read were skipped by the category_id filter;
+                # keep only the rows this pass changed so the rollups follow the writes
+                ids = [t['id'] for txns in by_category.values() for t in txns]
+                current = {
+                    t['id']: t.get('category_id')
+                    for t in await db.transactions.find(
+                        {"user_id": current_user.id, "id": {"$in": ids}}, {"_id": 0, "id": 1, "category_id": 1}
+                    ).to_list(None)
+                }
+                by_category = {
+                    category_id: kept for category_id, txns in by_category.items()
+                    if (kept := [t for t in txns if current.get(t['id']) == category_id])
+                }
+            previous = [t for txns in by_category.values() for t in txns]
+            await apply_ledger_changes(
+                current_user.id,
+                added=[{**t, "category_id": category_id} for category_id, txns in by_category.items() for t in txns],
+                removed=previous
+            )
+            updated_count += result.modified_count
+        if job:
+            await job.report(rows_parsed=scanned, inserted=updated_count)
+    
+    batch = []
+    async for txn in cursor:
+        batch.append(txn)
+        scanned += 1
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    
     await log_action(current_user.id, "bulk_apply", "automation", f"Applied rules to {updated_count} transactions")
-    return {"message": f"Successfully categorized {updated_count} transactions"}
+    return {
+        "message": f"Successfully categorized {updated_count} transactions",
+        "scanned": scanned,
+        "updated": updated_count
+    }
+
+@api_router.post("/automation-rules/apply-bulk")
+async def bulk_apply_rules(background: bool = False, current_user: User = Depends(get_current_user)):
+    return await submit_job("automation_rules", apply_automation_rules, current_user, background)
 
 # ==================== DATA EXPORT & BACKUP ROUTES ====================
 
-@api_router.get("/export/all")
-async def export_all_data(current_user: User = Depends(get_current_user)):
-    # Fetch all collections for this user
-    clients = await db.clients.find({"user_id": current_user.id}, {"_id": 0}).to_list(10000)
-    accounts = await db.accounts.find({"user_id": current_user.id}, {"_id": 0}).to_list(10000)
-    categories = await db.categories.find({"user_id": current_user.id}, {"_id": 0}).to_list(10000)
-    transactions = await db.transactions.find({"user_id": current_user.id}, {"_id": 0}).to_list(100000)
-    invoices = await db.invoices.find({"user_id": current_user.id}, {"_id": 0}).to_list(10000)
-    
-    # Audit Logs (Bonus for comprehensive backup)
-    audit_logs = await db.audit_logs.find({"user_id": current_user.id}, {"_id": 0}).to_list(5000)
-    automation_rules = await db.automation_rules.find({"user_id": current_user.id}, {"_id": 0}).to_list(200)
+BACKUP_COLLECTIONS = ["clients", "accounts", "categories", "transactions", "invoices", "audit_logs", "automation_rules"]
+
+async def _backup_chunks(collection: str, user_id: str):
+    """Walk one collection of the user's data with a cursor, EXPORT_CHUNK_SIZE documents at a time"""
+    chunk = []
+    async for doc in db[collection].find({"user_id": user_id}, {"_id": 0}, batch_size=EXPORT_CHUNK_SIZE):
+        chunk.append(doc)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def backup_json_stream(header: dict, user_id: str):
+    """The backup as one JSON document ({...header, "data": {...}, "counts": {...}}), written piecewise"""
+    counts = {}
+    yield (json.dumps(header, default=str)[:-1] + ', "data": {').encode()
+    for i, collection in enumerate(BACKUP_COLLECTIONS):
+        yield f'{", " if i else ""}"{collection}": ['.encode()
+        count = 0
+        async for chunk in _backup_chunks(collection, user_id):
+            yield ((", " if count else "") + ", ".join(json.dumps(doc, default=str) for doc in chunk)).encode()
+            count += len(chunk)
+        counts[collection] = count
+        yield b"]"
+    yield ('}, "counts": ' + json.dumps(counts) + "}").encode()
+
+async def backup_ndjson_stream(header: dict, user_id: str):
+    """The backup as NDJSON: a header line, one {"collection", "doc"} line per document, then the counts"""
+    counts = {}
+    yield (json.dumps({**header, "format": "ndjson"}, default=str) + "\n").encode()
+    for collection in BACKUP_COLLECTIONS:
+        count = 0
+        async for chunk in _backup_chunks(collection, user_id):
+            yield "".join(json.dumps({"collection": collection, "doc": doc}, default=str) + "\n" for doc in chunk).encode()
+            count += len(chunk)
+        counts[collection] = count
+    yield (json.dumps({"counts": counts}) + "\n").encode()
+
+async def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    async for chunk in chunks:
+        data = await asyncio.to_thread(compressor.compress, chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def parse_backup(contents: bytes) -> dict:
+    """Read a backup in any export format (JSON or NDJSON, optionally gzipped) into the JSON layout"""
+    if contents[:2] == b"\x1f\x8b":
+        contents = gzip.decompress(contents)
+    try:
+        return json.loads(contents)
+    except json.JSONDecodeError:
+        pass
+    lines = (json.loads(line) for line in contents.splitlines() if line.strip())
+    backup = next(lines)
+    if backup.get("format") != "ndjson":
+        raise ValueError("Unrecognised backup format")
+    backup["data"] = {}
+    for line in lines:
+        if "collection" in line:
+            backup["data"].setdefault(line["collection"], []).append(line["doc"])
+    return backup
 
+@api_router.get("/export/all")
+async def export_all_data(
+    format: str = "json",  # "json" or "ndjson"
+    compress: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Full backup of the user's data, streamed collection by collection with cursors so memory
+    stays flat however large the ledger is. compress gzips the stream on the fly.
+    """
+    if format not in ("json", "ndjson"):
+        raise ValidationError("format must be json or ndjson", "INVALID_EXPORT_FORMAT")
+    
     # User basic info
-    user_data = await db.users.find_one({"id": current_user.id}, {"_id": 0, "password_hash": 0})
-
-    export_data = {
+    user_data = await db.users.find_one({"id": current_user.id}, {"_id": 0, "password_hash": 0}) or {}
+    header = {
         "export_version": "1.0",
         "export_date": datetime.now(timezone.utc).isoformat(),
         "app": "Vitta",
@@ -3709,33 +5133,26 @@ async def export_all_data(current_user: User = Depends(get_current_user)):
             "name": user_data.get("name"),
             "email": user_data.get("email"),
             "business_name": user_data.get("business_name")
-        },
-        "data": {
-            "clients": clients,
-            "accounts": accounts,
-            "categories": categories,
-            "transactions": transactions,
-            "invoices": invoices,
-            "audit_logs": audit_logs,
-            "automation_rules": automation_rules
-        },
-        "counts": {
-            "clients": len(clients),
-            "accounts": len(accounts),
-            "categories": len(categories),
-            "transactions": len(transactions),
-            "invoices": len(invoices)
         }
     }
-
-    content = json.dumps(export_data, default=str, indent=2)
-    filename = f"vitta_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
-    await log_action(current_user.id, "export", "backup", "Full JSON backup exported")
+    if format == "ndjson":
+        body = backup_ndjson_stream(header, current_user.id)
+        media_type = "application/x-ndjson"
+    else:
+        body = backup_json_stream(header, current_user.id)
+        media_type = "application/json"
+    filename = f"vitta_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    if compress:
+        body = gzip_stream(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+    
+    await log_action(current_user.id, "export", "backup", f"Full {format.upper()} backup exported")
     
     return StreamingResponse(
-        io.BytesIO(content.encode()),
-        media_type="application/json",
+        body,
+        media_type=media_type,
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
@@ -3803,7 +5220,7 @@ async def restore_from_backup(
 ):
     try:
         contents = await file.read()
-        import_data = json.loads(contents)
+        import_data = parse_backup(contents)
         
         if import_data.get("app") != "Vitta" or "data" not in import_data:
             raise HTTPException(status_code=400, detail="Invalid Vitta backup file")
@@ -3816,6 +5233,8 @@ async def restore_from_backup(
             cols = ["clients", "accounts", "categories", "transactions", "invoices", "automation_rules"]
             for col in cols:
                 await db[col].delete_many({"user_id": current_user.id})
+            # Invoice numbering restarts after the restored invoices
+            await db.invoice_counters.delete_many({"user_id": current_user.id})
             
         # Target collections
         collections = {
@@ -3832,6 +5251,10 @@ async def restore_from_backup(
             for item in items:
                 # Ensure the data belongs to the current user
                 item["user_id"] = current_user.id
+                if col_name == "transactions":
+                    stamp_ledger_fields(item)
+                elif col_name == "invoices":
+                    item["invoice_date_key"] = date_key(item.get("invoice_date")) or 0
                 
                 if mode == "merge":
                     # Check for existing ID
@@ -3839,10 +5262,18 @@ async def restore_from_backup(
                     if exists: continue
                 
                 # Insert
-                await db[col_name].insert_one(item)
-                inserted += 1
+                if col_name == "transactions":
+                    written, _ = await insert_ledger_rows([item])
+                    inserted += len(written)
+                else:
+                    await db[col_name].insert_one(item)
+                    inserted += 1
             results[col_name] = inserted
             
+        invalidate_rule_matcher(current_user.id)
+        if mode == "replace" or results.get("transactions"):
+            await rebuild_balance_snapshots(user_id=current_user.id)
+            await rebuild_monthly_rollups(user_id=current_user.id)
         await log_action(current_user.id, "import", "restore", f"Data restored using {mode} mode")
         return {"message": "Data restored successfully", "results": results}
         
@@ -3850,6 +5281,213 @@ async def restore_from_backup(
         logger.error(f"Restore error: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Restore failed: {str(e)}")
 
+# ==================== DATABASE INDEXES & MIGRATIONS ====================
+
+async def ensure_indexes():
+    """Create the indexes the query paths rely on (no-op when they already exist)"""
+    await db.schema_migrations.create_index([("id", 1)], unique=True)
+    await db.snapshot_locks.create_index([("id", 1)], unique=True)
+    # The ledger indexes used to end in the random `id`; LEDGER_SORT breaks ties on _id
+    existing = await db.transactions.index_information()
+    for name in ("user_id_1_account_id_1_txn_date_1_sort_prio_1_id_1", "user_id_1_txn_date_1_sort_prio_1_id_1"):
+        if name in existing:
+            await db.transactions.drop_index(name)
+    await db.transactions.create_index([("user_id", 1), ("account_id", 1)] + LEDGER_SORT)
+    await db.transactions.create_index([("user_id", 1)] + LEDGER_SORT)
+    await db.transactions.create_index(
+        [("user_id", 1), ("account_id", 1), ("dedup_hash", 1)],
+        unique=True,
+        partialFilterExpression={"dedup_hash": {"$type": "string"}}
+    )
+    await db.account_balance_snapshots.create_index([("account_id", 1), ("date", -1)], unique=True)
+    await db.account_balance_snapshots.create_index([("user_id", 1)])
+    await db.categories.create_index([("id", 1)])
+    for collection, weights in SEARCH_FIELDS.items():
+        await db[collection].create_index(
+            [("user_id", 1)] + [(field, "text") for field in weights],
+            weights=weights,
+            name=f"{collection}_search",
+            default_language="none"
+        )
+    await db.invoice_counters.create_index([("user_id", 1), ("fiscal_year", 1)], unique=True)
+    await db.invoices.create_index([("user_id", 1), ("invoice_date_key", 1)])
+    await db.import_jobs.create_index([("id", 1)], unique=True)
+    await db.monthly_rollups.create_index([("user_id", 1), ("yyyymm", 1), ("category_id", 1), ("type", 1)], unique=True)
+    await db.audit_logs.create_index([("user_id", 1), ("related_ids", 1), ("timestamp", -1), ("id", -1)])
+
+async def backfill_txn_date(batch_size: int = 1000):
+    """Stamp txn_date on transactions written before the field existed"""
+    cursor = db.transactions.find({"txn_date": {"$exists": False}}, {"_id": 1, "date": 1})
+    ops = []
+    updated = 0
+    async for doc in cursor:
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"txn_date": date_key(doc.get("date"))}}))
+        if len(ops) >= batch_size:
+            await db.transactions.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.transactions.bulk_write(ops, ordered=False)
+        updated += len(ops)
+    logger.info(f"Backfilled txn_date on {updated} transactions")
+
+async def backfill_invoice_date_key(batch_size: int = 1000):
+    """Stamp invoice_date_key on invoices written before the field existed"""
+    cursor = db.invoices.find({"invoice_date_key": {"$exists": False}}, {"_id": 1, "invoice_date": 1})
+    ops = []
+    updated = 0
+    async for doc in cursor:
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"invoice_date_key": date_key(doc.get("invoice_date")) or 0}}))
+        if len(ops) >= batch_size:
+            await db.invoices.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.invoices.bulk_write(ops, ordered=False)
+        updated += len(ops)
+    logger.info(f"Backfilled invoice_date_key on {updated} invoices")
+
+async def backfill_audit_related_ids(batch_size: int = 1000):
+    """Derive related_ids on older audit entries from resource_id, plus the client of invoice entries"""
+    cursor = db.audit_logs.find({"related_ids": {"$exists": False}}, {"_id": 1, "resource": 1, "resource_id": 1})
+    
+    async def flush(batch: List[dict]):
+        invoice_ids = [doc["resource_id"] for doc in batch if doc.get("resource") == "invoice" and doc.get("resource_id")]
+        invoice_clients = {
+            inv["id"]: inv.get("client_id")
+            for inv in await db.invoices.find({"id": {"$in": invoice_ids}}, {"_id": 0, "id": 1, "client_id": 1}).to_list(None)
+        } if invoice_ids else {}
+        await db.audit_logs.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"related_ids": [
+                i for i in (doc.get("resource_id"), invoice_clients.get(doc.get("resource_id"))) if i
+            ]}})
+            for doc in batch
+        ], ordered=False)
+    
+    batch = []
+    updated = 0
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+        updated += len(batch)
+    logger.info(f"Backfilled related_ids on {updated} audit log entries")
+
+async def backfill_ledger_sort_keys():
+    """Add sort_prio and replace null txn_date values so every row can take part in keyset paging"""
+    await db.transactions.update_many({"txn_date": None}, {"$set": {"txn_date": 0}})
+    await db.transactions.update_many({"type": "opening"}, {"$set": {"sort_prio": 0}})
+    await db.transactions.update_many({"type": {"$ne": "opening"}}, {"$set": {"sort_prio": 1}})
+
+async def backfill_dedup_hash(batch_size: int = 1000):
+    """
+    Stamp dedup_hash on older transactions. Identical rows already in an account
+    keep the plain hash on the first one and a repeat hash on the others.
+    """
+    cursor = db.transactions.find(
+        {}, {"_id": 1, "id": 1, "user_id": 1, "account_id": 1, "dedup_hash": 1, **{k: 1 for k in DEDUP_FIELDS}}
+    ).sort([("user_id", 1), ("account_id", 1)] + LEDGER_SORT)
+    ops = []
+    updated = 0
+    current_account = None
+    seen = set()
+    async for doc in cursor:
+        if (doc.get("user_id"), doc.get("account_id")) != current_account:
+            current_account = (doc.get("user_id"), doc.get("account_id"))
+            seen = set()
+        if doc.get("dedup_hash"):
+            seen.add(doc["dedup_hash"])
+            continue
+        stamped = stamp_ledger_fields({k: doc.get(k) for k in DEDUP_FIELDS})
+        if "dedup_hash" not in stamped:
+            continue
+        if stamped["dedup_hash"] in seen:
+            stamped["dedup_hash"] = repeat_dedup_hash({"id": doc.get("id") or str(doc["_id"]), **stamped})
+        seen.add(stamped["dedup_hash"])
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"dedup_hash": stamped["dedup_hash"]}}))
+        if len(ops) >= batch_size:
+            await db.transactions.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.transactions.bulk_write(ops, ordered=False)
+        updated += len(ops)
+    logger.info(f"Backfilled dedup_hash on {updated} transactions")
+
+# Applied once each, in order, and recorded in the schema_migrations collection
+MIGRATIONS = [
+    ("0001_transactions_txn_date", backfill_txn_date),
+    ("0002_transactions_ledger_sort_keys", backfill_ledger_sort_keys),
+    ("0003_account_balance_snapshots", rebuild_balance_snapshots),
+    ("0004_transactions_dedup_hash", backfill_dedup_hash),
+    ("0005_monthly_rollups", rebuild_monthly_rollups),
+    ("0006_invoices_invoice_date_key", backfill_invoice_date_key),
+    ("0007_audit_logs_related_ids", backfill_audit_related_ids),
+]
+
+MIGRATION_LOCK_ID = "_migration_lock"
+
+async def acquire_migration_lock(owner: str, poll_seconds: float = 2):
+    """
+    Wait for the lock document in schema_migrations. A free lock (or one whose lease ran
+    out because its holder died) is taken by the update; a held one makes the upsert hit
+    the unique id index.
+    """
+    while True:
+        now = time.time()
+        try:
+            await db.schema_migrations.find_one_and_update(
+                {"id": MIGRATION_LOCK_ID, "locked_until": {"$lt": now}},
+                {"$set": {"owner": owner, "locked_until": now + MIGRATION_LOCK_SECONDS}},
+                upsert=True
+            )
+            return
+        except DuplicateKeyError:
+            logger.info("Waiting for another process to finish migrations")
+            await asyncio.sleep(poll_seconds)
+
+async def apply_migrations():
+    """Run pending migrations, one process at a time"""
+    applied = {doc["id"] for doc in await db.schema_migrations.find({}, {"_id": 0, "id": 1}).to_list(None)}
+    if all(name in applied for name, _ in MIGRATIONS):
+        return
+    
+    owner = str(uuid.uuid4())
+    await acquire_migration_lock(owner)
+    try:
+        for name, migration in MIGRATIONS:
+            # Another process may have applied it while this one waited for the lock
+            if await db.schema_migrations.find_one({"id": name}):
+                continue
+            await db.schema_migrations.update_one(
+                {"id": MIGRATION_LOCK_ID, "owner": owner},
+                {"$set": {"locked_until": time.time() + MIGRATION_LOCK_SECONDS}}
+            )
+            logger.info(f"Applying migration {name}")
+            await migration()
+            await db.schema_migrations.insert_one({
+                "id": name,
+                "applied_at": datetime.now(timezone.utc).isoformat()
+            })
+    finally:
+        await db.schema_migrations.update_one(
+            {"id": MIGRATION_LOCK_ID, "owner": owner}, {"$set": {"locked_until": 0}}
+        )
+
+@app.on_event("startup")
+async def prepare_database():
+    """Ensure indexes and run pending data migrations on startup; the app must not serve a half-migrated database"""
+    try:
+        await ensure_indexes()
+        await apply_migrations()
+    except Exception as e:
+        logger.error(f"Database preparation failed: {e}")
+        raise
+
 # ==================== GLOBAL SYSTEM CONFIG (UAC) ====================
 
 @app.on_event("startup")
@@ -3903,4 +5541,8 @@ app.include_router(api_router)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await import_queue.stop()
+    await audit_writer.stop()
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
     client.close()
\ No newline at end of file
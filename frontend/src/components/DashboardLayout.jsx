@@ -62,6 +62,8 @@ const DashboardLayout = ({ children }) => {
   const [loading, setLoading] = useState(false);
   const [isFocused, setIsFocused] = useState(false);
   const searchInputRef = React.useRef(null);
+  // Only the latest lookup may set results (typeahead replies can land after a full search)
+  const searchSeq = React.useRef(0);
 
   React.useEffect(() => {
     const down = (e) => {
@@ -74,25 +76,40 @@ const DashboardLayout = ({ children }) => {
     return () => document.removeEventListener('keydown', down);
   }, []);
 
+  const runSearch = async (path, showLoading) => {
+    const seq = ++searchSeq.current;
+    if (showLoading) setLoading(true);
+    try {
+      const res = await api.get(path, { params: { q: query } });
+      if (seq === searchSeq.current) setResults(res.data.results);
+    } catch (e) {
+      console.error(e);
+    } finally {
+      if (seq === searchSeq.current) setLoading(false);
+    }
+  };
+
+  // Keystrokes use the in-memory prefix index; Enter runs the full-text search (incl. transactions)
   React.useEffect(() => {
-    const timer = setTimeout(async () => {
+    const timer = setTimeout(() => {
       if (query.length >= 2) {
-        setLoading(true);
-        try {
-          const res = await api.get(`/search?q=${query}`);
-          setResults(res.data.results);
-        } catch (e) {
-          console.error(e);
-        } finally {
-          setLoading(false);
-        }
+        runSearch('/search/typeahead', false);
       } else {
+        searchSeq.current++;
         setResults([]);
+        setLoading(false);
       }
-    }, 300);
+    }, 120);
     return () => clearTimeout(timer);
   }, [query]);
 
+  const handleSearchKeyDown = (e) => {
+    if (e.key === 'Enter' && query.length >= 2) {
+      e.preventDefault();
+      runSearch('/search', true);
+    }
+  };
+
   const handleSelect = (item) => {
     setQuery('');
     setIsFocused(false);
@@ -100,6 +117,7 @@ const DashboardLayout = ({ children }) => {
     else if (item.type === 'client') navigate('/clients');
     else if (item.type === 'account') navigate('/accounts');
     else if (item.type === 'category') navigate('/categories');
+    else if (['ledger', 'reference', 'cheque'].includes(item.type)) navigate('/transactions');
   };
 
   const groupedResults = results.reduce((acc, curr) => {
@@ -243,6 +261,7 @@ const DashboardLayout = ({ children }) => {
                  className={`h-8 pl-9 pr-12 rounded-lg border-slate-200 bg-slate-50 text-[12.5px] font-medium text-slate-700 transition-all focus-visible:ring-0 ${isFocused ? 'bg-white border-emerald-500/50 shadow-[0_0_0_2px_rgba(16,185,129,0.1)]' : ''}`}
                  value={query}
                  onChange={(e) => {setQuery(e.target.value); setIsFocused(true);}}
+                 onKeyDown={handleSearchKeyDown}
                  onFocus={() => setIsFocused(true)}
                  onBlur={() => setTimeout(() => setIsFocused(false), 200)}
                />
@@ -312,6 +331,7 @@ const DashboardLayout = ({ children }) => {
                            <Search className="h-5 w-5 text-slate-300" />
                          </div>
                          <p className="text-slate-400 text-[12.5px] font-medium">No results for <span className="text-slate-900">"{query}"</span></p>
+                         <p className="text-slate-300 text-[10.5px] font-medium mt-1">Press Enter to search transactions</p>
                        </div>
                      )}
 
@@ -323,7 +343,7 @@ const DashboardLayout = ({ children }) => {
                              <div className="space-y-0.5">
                                {items.map(item => (
                                  <button
-                                   key={item.id}
+                                   key={`${item.type}-${item.id ?? item.title}`}
                                    onMouseDown={() => handleSelect(item)}
                                    className="w-full flex items-center gap-3 px-3 py-2.5 rounded-xl hover:bg-slate-50 text-left transition-colors group"
                                  >
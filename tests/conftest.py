@@ -0,0 +1,41 @@
+"""
+Shared fixtures. The API runs against an in-memory mongomock-motor database with
+authentication overridden, so the tests need no MongoDB server:
+
+    pip install pytest mongomock-motor
+    python -m pytest -q tests
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Takes precedence over backend/.env; the client is never used since `db` is swapped out
+os.environ["MONGO_URL"] = "mongodb://localhost:27017"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+TEST_USER = server.User(id="test-user", name="Test User", email="test@example.com")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = AsyncMongoMockClient()["vitta_test"]
+    monkeypatch.setattr(server, "db", database)
+    for cache in server.user_result_caches:
+        cache.clear()
+    server.rule_matcher_cache.clear()
+    server.typeahead_cache.clear()
+    return database
+
+
+@pytest.fixture
+def client(db):
+    server.app.dependency_overrides[server.get_current_user] = lambda: TEST_USER
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
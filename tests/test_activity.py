@@ -0,0 +1,34 @@
+"""
+Keyset pagination of a client's activity feed, including entries whose timestamp is stored as a string.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from .conftest import TEST_USER
+
+
+def test_activity_pages_through_date_and_string_timestamps(client, db):
+    start = datetime(2025, 1, 1, 9, 0)
+    entries = [
+        {
+            "id": f"entry-{i:02d}", "user_id": TEST_USER.id, "related_ids": ["client-1"],
+            "action": "update", "resource": "client", "resource_id": "client-1",
+            # The oldest entries predate datetime storage and hold ISO strings
+            "timestamp": (start + timedelta(minutes=i // 2)).isoformat() if i < 6 else start + timedelta(minutes=i // 2),
+        }
+        for i in range(15)
+    ]
+    asyncio.run(db.audit_logs.insert_many(entries))
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/clients/client-1/activity", params=params).json()
+        seen += [entry["id"] for entry in page["activity"]]
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+
+    assert seen == [f"entry-{i:02d}" for i in reversed(range(15))]
@@ -0,0 +1,35 @@
+"""
+Keyset pagination of the ledger: page order and running balances across cursors.
+"""
+
+
+def test_same_day_rows_page_in_insertion_order(client):
+    account_id = client.post("/api/accounts", json={
+        "account_name": "Main Bank", "account_type": "Bank", "opening_balance": 100,
+        "opening_balance_date": "01-04-2024"
+    }).json()["id"]
+    descriptions = [f"Entry {i}" for i in range(25)]
+    for i, description in enumerate(descriptions):
+        response = client.post("/api/transactions", json={
+            "account_id": account_id, "date": "15-04-2024", "description": description,
+            "amount": i + 1, "type": "credit" if i % 3 else "debit",
+        })
+        assert response.status_code == 200
+
+    rows, cursor = [], None
+    while True:
+        params = {"account_id": account_id, "limit": 7}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/transactions/ledger", params=params).json()
+        if rows:
+            assert page["closing_balance"] == rows[-1]["running_balance"] - (
+                rows[-1]["amount"] if rows[-1]["type"] == "credit" else -rows[-1]["amount"]
+            )
+        rows += page["transactions"]
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+
+    assert [r["description"] for r in rows] == descriptions[::-1] + ["Opening Balance"]
+    assert rows[-1]["running_balance"] == 100
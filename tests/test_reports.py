@@ -0,0 +1,159 @@
+"""
+Parity of the aggregation-based reports with the per-transaction Python computations
+they replaced, on a seeded ledger.
+"""
+import asyncio
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import server
+
+from .conftest import TEST_USER
+
+CATEGORIES = [
+    ("Sales", "income", "Revenue from Operations"),
+    ("Interest", "income", None),
+    ("Salaries", "expense", "Employee Benefits"),
+    ("Loan Interest", "expense", "Finance Costs"),
+    ("Depreciation", "expense", "Depreciation"),
+    ("Materials", "expense", "Cost of Materials"),
+    ("Rent", "expense", None),
+]
+
+ACCOUNTS = [("Main Bank", "Bank", 5000), ("Petty Cash", "Cash", 750), ("Corporate Card", "Card", 300)]
+
+
+def fetch(collection, query):
+    return asyncio.run(collection.find(query, {"_id": 0}).to_list(None))
+
+
+@pytest.fixture
+def ledger(client, db):
+    """Opening rows plus 400 transactions over Mar 2024 - Apr 2025 in three accounts"""
+    rng = random.Random(7)
+    category_ids = [None]
+    for name, type, head in CATEGORIES:
+        category_ids.append(client.post("/api/categories", json={
+            "name": name, "type": type, "color": "#000000", "schedule_iii_head": head
+        }).json()["id"])
+    account_ids = [
+        client.post("/api/accounts", json={
+            "account_name": name, "account_type": type, "opening_balance": opening,
+            "opening_balance_date": "01-02-2024"
+        }).json()["id"]
+        for name, type, opening in ACCOUNTS
+    ]
+    for i in range(400):
+        day = date(2024, 3, 1) + timedelta(days=rng.randrange(426))
+        response = client.post("/api/transactions", json={
+            "account_id": rng.choice(account_ids),
+            "date": day.strftime("%d-%m-%Y"),
+            "description": f"Seeded entry {i}",
+            "amount": round(rng.uniform(1, 5000), 2),
+            "type": rng.choice(["credit", "debit"]),
+            "category_id": rng.choice(category_ids),
+        })
+        assert response.status_code == 200
+    return {
+        "transactions": fetch(db.transactions, {"user_id": TEST_USER.id}),
+        "accounts": fetch(db.accounts, {"user_id": TEST_USER.id}),
+        "categories": fetch(db.categories, {"user_id": TEST_USER.id}),
+    }
+
+
+def previous_pnl(ledger, from_key, to_key):
+    """Schedule III buckets as get_schedule_iii_pnl computed them transaction by transaction"""
+    income_map = {c["id"]: c for c in ledger["categories"] if c["type"] == "income"}
+    expense_map = {c["id"]: c for c in ledger["categories"] if c["type"] == "expense"}
+    buckets = dict.fromkeys(["revenue_ops", "other_income", "materials", "employees", "finance", "depreciation", "other"], 0)
+    for tx in ledger["transactions"]:
+        if not from_key <= tx["txn_date"] <= to_key:
+            continue
+        cid = tx.get("category_id")
+        if cid in income_map:
+            head = income_map[cid].get("schedule_iii_head", "Other Income")
+            buckets["revenue_ops" if head == "Revenue from Operations" else "other_income"] += tx["amount"]
+        elif cid in expense_map:
+            head = expense_map[cid].get("schedule_iii_head", "Other Expenses")
+            buckets[{
+                "Employee Benefits": "employees", "Finance Costs": "finance",
+                "Depreciation": "depreciation", "Cost of Materials": "materials"
+            }.get(head, "other")] += tx["amount"]
+    return buckets
+
+
+def previous_cash_flow(ledger, from_key, to_key):
+    """Operating items and opening cash as get_cash_flow computed them transaction by transaction"""
+    cash_accounts = [a for a in ledger["accounts"] if a["account_type"] in ("Bank", "Cash")]
+    cash_ids = {a["id"] for a in cash_accounts}
+    cat_map = {c["id"]: c for c in ledger["categories"]}
+    op_items = {}
+    opening_cash = sum(a.get("opening_balance", 0) for a in cash_accounts)
+    for txn in ledger["transactions"]:
+        if txn["account_id"] not in cash_ids or txn["type"] == "opening":
+            continue
+        if txn["txn_date"] < from_key:
+            opening_cash += txn["amount"] if txn["type"] == "credit" else -txn["amount"]
+            continue
+        if txn["txn_date"] > to_key:
+            continue
+        cat = cat_map.get(txn.get("category_id"))
+        name = cat["name"] if cat else ("Other Income" if txn["type"] == "credit" else "Other Expense")
+        item = op_items.setdefault(name, {"category_type": cat["type"] if cat else txn["type"], "amount": 0})
+        item["amount"] += txn["amount"] if txn["type"] == "credit" else -txn["amount"]
+    return op_items, opening_cash
+
+
+def assert_statement_matches(statement, ledger, from_key, to_key):
+    items, opening_cash = previous_cash_flow(ledger, from_key, to_key)
+    got = {i["name"]: {"category_type": i["category_type"], "amount": pytest.approx(i["amount"])}
+           for i in statement["operating_activities"]["items"]}
+    assert got == items
+    net = sum(i["amount"] for i in items.values())
+    assert statement["opening_cash_balance"] == pytest.approx(opening_cash)
+    assert statement["net_change_in_cash"] == pytest.approx(net)
+    assert statement["closing_cash_balance"] == pytest.approx(opening_cash + net)
+
+
+@pytest.mark.parametrize("params, from_key, to_key", [
+    ({}, 0, server.LATEST_DATE_KEY),
+    ({"date_from": "01-04-2024", "date_to": "30-06-2024"}, 20240401, 20240630),
+])
+def test_pnl_matches_per_transaction_bucketing(client, ledger, params, from_key, to_key):
+    pnl = client.get("/api/reports/pnl", params=params).json()
+    expected = previous_pnl(ledger, from_key, to_key)
+    assert pnl["revenue"]["revenue_from_operations"] == pytest.approx(expected["revenue_ops"])
+    assert pnl["revenue"]["other_income"] == pytest.approx(expected["other_income"])
+    assert pnl["expenses"]["cost_of_materials"] == pytest.approx(expected["materials"])
+    assert pnl["expenses"]["employee_benefit_expenses"] == pytest.approx(expected["employees"])
+    assert pnl["expenses"]["finance_costs"] == pytest.approx(expected["finance"])
+    assert pnl["expenses"]["depreciation"] == pytest.approx(expected["depreciation"])
+    assert pnl["expenses"]["other_expenses"] == pytest.approx(expected["other"])
+
+
+def test_cash_flow_fiscal_year_months_match_per_transaction_bucketing(client, ledger):
+    cash_flow = client.get("/api/reports/cash-flow", params={"fiscal_year": 2024, "monthly": True}).json()
+    assert_statement_matches(cash_flow, ledger, 20240401, 20250331)
+
+    periods = cash_flow["periods"]
+    assert [p["month"] for p in periods] == [f"2024-{m:02d}" for m in range(4, 13)] + [f"2025-{m:02d}" for m in range(1, 4)]
+    for period in periods:
+        from_key = server.date_key(period["period"]["from"])
+        to_key = server.date_key(period["period"]["to"])
+        assert_statement_matches(period, ledger, from_key, to_key)
+    assert sum(p["net_change_in_cash"] for p in periods) == pytest.approx(cash_flow["net_change_in_cash"])
+
+
+def test_cash_flow_partial_months_are_clipped_to_the_range(client, ledger):
+    cash_flow = client.get("/api/reports/cash-flow", params={
+        "date_from": "15-03-2024", "date_to": "10-05-2024", "monthly": True
+    }).json()
+    assert [(p["period"]["from"], p["period"]["to"]) for p in cash_flow["periods"]] == [
+        ("15-03-2024", "31-03-2024"), ("01-04-2024", "30-04-2024"), ("01-05-2024", "10-05-2024")
+    ]
+    for period in cash_flow["periods"]:
+        assert_statement_matches(
+            period, ledger, server.date_key(period["period"]["from"]), server.date_key(period["period"]["to"])
+        )
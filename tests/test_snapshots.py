@@ -0,0 +1,49 @@
+"""
+Balance snapshots kept up to date incrementally must match a rebuild from the transactions,
+also when several worker processes fold in ledger changes at once.
+"""
+import asyncio
+import random
+
+import server
+
+
+def test_concurrent_workers_keep_snapshots_consistent(db, monkeypatch):
+    rng = random.Random(3)
+    snapshots = type(db.account_balance_snapshots)
+    find_one = snapshots.find_one
+
+    async def slow_find_one(self, *args, **kwargs):
+        # Widens the window between reading the previous day and seeding a new one
+        result = await find_one(self, *args, **kwargs)
+        await asyncio.sleep(rng.random() * 0.01)
+        return result
+
+    monkeypatch.setattr(snapshots, "find_one", slow_find_one)
+
+    async def worker(i):
+        # Forget this process's locks, so each call contends like a separate worker would
+        server._snapshot_locks.clear()
+        txn = {
+            "id": f"txn-{i}", "user_id": "test-user", "account_id": "bank",
+            "txn_date": 20240100 + rng.randrange(1, 29), "amount": float(rng.randrange(1, 100)),
+            "type": rng.choice(["credit", "debit"])
+        }
+        await db.transactions.insert_one(dict(txn))
+        await server.apply_ledger_changes("test-user", added=[txn])
+
+    async def closing_balances():
+        return {
+            s["date"]: round(s["closing_balance"], 2)
+            for s in await db.account_balance_snapshots.find({}).to_list(None)
+        }
+
+    async def run():
+        await server.ensure_indexes()
+        await asyncio.gather(*(worker(i) for i in range(60)))
+        live = await closing_balances()
+        await server.rebuild_balance_snapshots()
+        return live, await closing_balances()
+
+    live, rebuilt = asyncio.run(run())
+    assert live == rebuilt
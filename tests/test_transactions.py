@@ -0,0 +1,41 @@
+"""
+Transaction edits that collide with the dedup_hash index, and their effect on account balances.
+"""
+import asyncio
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def indexed(db):
+    asyncio.run(server.ensure_indexes())
+
+
+def create_account(client, name):
+    return client.post("/api/accounts", json={
+        "account_name": name, "account_type": "Bank", "opening_balance": 1000,
+        "opening_balance_date": "01-04-2024"
+    }).json()["id"]
+
+
+def balances(client):
+    return {a["id"]: a["balance"] for a in client.get("/api/accounts").json()}
+
+
+def test_moving_a_row_onto_an_identical_row_keeps_it_as_a_repeat(client, indexed):
+    bank, other = create_account(client, "Main Bank"), create_account(client, "Second Bank")
+    row = {"date": "10-05-2024", "description": "Office rent", "amount": 250, "type": "debit"}
+    client.post("/api/transactions", json={**row, "account_id": other})
+    moved = client.post("/api/transactions", json={**row, "account_id": bank}).json()
+    assert balances(client) == {bank: 750, other: 750}
+
+    response = client.put(f"/api/transactions/{moved['id']}", json={"account_id": other})
+    assert response.status_code == 200
+    assert response.json()["account_id"] == other
+    assert balances(client) == {bank: 1000, other: 500}
+
+    ledger = client.get("/api/transactions/ledger", params={"account_id": other}).json()
+    assert [t["description"] for t in ledger["transactions"]] == ["Office rent", "Office rent", "Opening Balance"]
+    assert ledger["closing_balance"] == 500